@@ -4,16 +4,18 @@ from typing import Any, Dict
 
 from langchain_core.prompts import ChatPromptTemplate
 
-from llm import llm
+from agents.notes_prefix import NOTES_PREFIX_MESSAGES
+from llm import invoke_prompt
+from agents.precritic import run as run_precritic
+from tracing import current_span
 
-CRITIC_PROMPT = ChatPromptTemplate.from_template(
-    "You are a careful scientific reviewer. Judge SUMMARY against NOTES. "
+CRITIC_TASK = (
+    "TASK: You are a careful scientific reviewer. Judge SUMMARY against NOTES. "
     "Mark as wrong any claim not supported by NOTES. Mark as wrong any number not supported by NOTES. Mark as wrong any dataset not supported by NOTES. Mark as wrong any metric not supported by NOTES. Mark as wrong any conclusion not supported by NOTES.\n\n"
     "STRICT RULES:\n\n"
-    "1) Title: Check if NOTES Title is 'not reported'. If it is not 'not reported', SUMMARY must include exact same title. If title is different, treat as error.\n"
-    "2) Quantitative results: Check if NOTES Results contains metrics. If it does, SUMMARY should include numeric outcomes from NOTES. If NOTES has no metrics, SUMMARY must not contain performance numbers. If missing expected numbers, lower Details score. State what numbers to add. Quote the exact part of NOTES that supports or contradicts.\n"
-    "3) No made-up numbers: Check if SUMMARY includes numbers not in NOTES Results. Examples: years, section numbers, invented scores. If found, lower Accuracy score. Quote the exact missing or contradicting part of NOTES, or state 'not found in NOTES'.\n"
-    "4) If NOTES says 'No quantitative metrics reported in provided text.', SUMMARY must not contain performance numbers. Results should use that exact sentence.\n\n"
+    "1) Quantitative results: Check if NOTES Results contains metrics. If it does, SUMMARY should include numeric outcomes from NOTES. If NOTES has no metrics, SUMMARY must not contain performance numbers. If missing expected numbers, lower Details score. State what numbers to add. Quote the exact part of NOTES that supports or contradicts.\n"
+    "2) No made-up numbers: Check if SUMMARY includes numbers not in NOTES Results. Examples: years, section numbers, invented scores. If found, lower Accuracy score. Quote the exact missing or contradicting part of NOTES, or state 'not found in NOTES'.\n"
+    "3) If NOTES says 'No quantitative metrics reported in provided text.', SUMMARY must not contain performance numbers. Results should use that exact sentence.\n\n"
     "SCORING (0-5 integers):\n"
     "- Makes sense: logical flow, no contradictions.\n"
     "- Accuracy: claims supported by NOTES.\n"
@@ -28,9 +30,13 @@ CRITIC_PROMPT = ChatPromptTemplate.from_template(
     "- <short fix #1>\n"
     "- <short fix #2>\n"
     "- <optional fix #3>\n\n"
-    "NOTES:\n{notes}\n\nSUMMARY:\n{summary}"
 )
 
+CRITIC_PROMPT = ChatPromptTemplate.from_messages([
+    *NOTES_PREFIX_MESSAGES,
+    ("human", CRITIC_TASK + "SUMMARY:\n{summary}"),
+])
+
 
 def _clean_output_text(raw_output: str) -> str:
     """Removes leading/trailing whitespace."""
@@ -38,6 +44,15 @@ def _clean_output_text(raw_output: str) -> str:
 
 
 def run(notes: str = "", summary: str = "", *args, **kwargs) -> Dict[str, Any]:
+    """
+    Critic mit lokalem Vor-Check.
+
+    precheck=True: Besteht Summary alle mechanischen Regeln (precritic),
+    sparen wir LLM-Call und geben lokale Bewertung zurück ("skipped").
+    Sonst LLM-Critic. Lokal gefundene Probleme hängen wir als
+    Improvements an, die sind sicher richtig.
+    """
+    precheck = bool(kwargs.pop("precheck", False))
     if args and not kwargs:
         notes_text = args[0]
         summary_text = args[1] if len(args) > 1 else ""
@@ -45,8 +60,16 @@ def run(notes: str = "", summary: str = "", *args, **kwargs) -> Dict[str, Any]:
         notes_text = kwargs.get("notes", notes) or ""
         summary_text = kwargs.get("summary", summary) or ""
     
-    prompt_chain = CRITIC_PROMPT | llm
-    llm_response = prompt_chain.invoke({"notes": notes_text, "summary": summary_text})
+    local_check = run_precritic(notes_text, summary_text)
+    parent_span = current_span()
+    if precheck and local_check["passed"]:
+        if parent_span is not None:
+            parent_span.set_attribute("critic_skipped", 1)
+        return {"critic": local_check["critic"], "critique": local_check["critic"], "skipped": True}
+    
+    llm_response = invoke_prompt(CRITIC_PROMPT, {"notes": notes_text, "summary": summary_text}, step="critic")
     critique_text = _clean_output_text(getattr(llm_response, "content", llm_response))
+    if local_check["issues"]:
+        critique_text = critique_text + "\n" + "\n".join(f"- {issue}" for issue in local_check["issues"])
     
-    return {"critic": critique_text, "critique": critique_text}
+    return {"critic": critique_text, "critique": critique_text, "skipped": False}
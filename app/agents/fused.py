@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from agents.critic import CRITIC_TASK
+from agents.integrator import INTEGRATOR_TASK
+from agents.notes_prefix import NOTES_PREFIX_MESSAGES
+from agents.precritic import run as run_precritic
+from agents.reader import READER_STRUCTURED_RULES, PaperNotes, render_notes
+from agents.summarizer import SUMMARY_TASK
+from document import extract_title
+from llm import AGENT_STEPS, get_llm, invoke_prompt
+from utils import enforce_title, read_title
+
+# Fast-Mode: vier Agents in zwei Calls. Reader+Summarizer, dann Critic+Integrator.
+# Gleiche Regeln wie einzelne Agents, nur je zwei Aufgaben in einer Antwort.
+# Erster Agent stellt Client und Modell (llm.fused_settings). Beim Review ist
+# das Integrator: er schreibt Endtext, Critic läuft evtl. auf kleinem Modell.
+FUSED_CALLS = {
+    "read": ("reader", "summarizer"),
+    "review": ("integrator", "critic"),
+}
+CALLS_SAVED = len(AGENT_STEPS) - len(FUSED_CALLS)
+
+
+class NotesAndSummary(BaseModel):
+    notes: PaperNotes
+    summary: str = Field(description="Concise scientific summary written from these notes")
+
+
+class CritiqueAndMeta(BaseModel):
+    critic: str = Field(description="Review of SUMMARY against NOTES with the four scores and Improvements")
+    meta: str = Field(description="Final Meta Summary that applies the critic")
+
+
+# Schema pro fusioniertem Call, für max_tokens (llm.fused_settings)
+FUSED_SCHEMAS = {
+    "read": NotesAndSummary,
+    "review": CritiqueAndMeta,
+}
+# Abgeschnittenes JSON: ein zweiter Versuch mit so viel mehr Budget
+TRUNCATION_RETRY_FACTOR = 2
+
+
+# Reader-Regeln bleiben System-Message vorne, Präfix-Cache wie beim strukturierten Reader
+FUSED_READ_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", READER_STRUCTURED_RULES),
+    ("human", "TEXT:\n{content}"),
+    ("human",
+        "Answer with JSON with two fields.\n"
+        "notes: NOTES for TEXT, following the rules above.\n"
+        "summary: a summary of your notes. Treat your notes as NOTES for this task.\n\n"
+        + SUMMARY_TASK
+    ),
+])
+
+# NOTES-Präfix wie Summarizer/Critic/Integrator, danach beide Aufgaben
+FUSED_REVIEW_PROMPT = ChatPromptTemplate.from_messages([
+    *NOTES_PREFIX_MESSAGES,
+    ("human",
+        "Answer with JSON with two fields.\n\n"
+        "critic:\n" + CRITIC_TASK +
+        "meta: treat your critic as CRITIC.\n" + INTEGRATOR_TASK +
+        "SUMMARY:\n{summary}"
+    ),
+])
+
+_FUSED_PROMPTS = {"read": FUSED_READ_PROMPT, "review": FUSED_REVIEW_PROMPT}
+
+
+def _invoke_fused(name: str, variables: dict, max_tokens: Optional[int]) -> BaseModel:
+    """
+    Fusionierter Call mit einem zweiten Versuch.
+
+    Reicht max_tokens nicht, bricht JSON mitten im Feld ab und
+    invoke_prompt wirft ValueError. Dann einmal mit
+    TRUNCATION_RETRY_FACTOR-fachem Budget. Abgeschnittene Antwort landet
+    nicht im LLM-Cache, zweiter Versuch fragt also wirklich neu.
+    """
+    prompt = _FUSED_PROMPTS[name]
+    step = FUSED_CALLS[name][0]
+    try:
+        return invoke_prompt(prompt, variables, step=step, schema=FUSED_SCHEMAS[name], max_tokens=max_tokens)
+    except ValueError:
+        budget = int(max_tokens or get_llm(step).max_tokens or 0)
+        return invoke_prompt(
+            prompt, variables, step=step, schema=FUSED_SCHEMAS[name],
+            max_tokens=TRUNCATION_RETRY_FACTOR * budget or None,
+        )
+
+
+def run_read(input_text: str, max_tokens: Optional[int] = None) -> Dict[str, str]:
+    """
+    Notes und Summary in einem Structured-Output-Call.
+
+    max_tokens aus llm.fused_settings: Reader- plus Summarizer-Budget,
+    mindestens was das Schema braucht. Notes kommen als PaperNotes,
+    downstream geht kompakte render_notes()-Form. Titel wie beim Reader lokal setzen.
+    """
+    result = _invoke_fused("read", {"content": input_text}, max_tokens)
+    notes = enforce_title(render_notes(result.notes), extract_title(input_text))
+    summary = enforce_title(result.summary.strip(), read_title(notes))
+    return {"notes": notes, "summary": summary}
+
+
+def run_review(notes: str, summary: str, max_tokens: Optional[int] = None) -> Dict[str, str]:
+    """
+    Critic und Meta Summary in einem Call.
+
+    Precritic kann hier keinen Call sparen, Meta Summary brauchen wir
+    trotzdem. Lokal gefundene Probleme hängen wir wie beim Critic an.
+    """
+    result = _invoke_fused("review", {"notes": notes, "summary": summary}, max_tokens)
+    critic = result.critic.strip()
+    local_check = run_precritic(notes, summary)
+    if local_check["issues"]:
+        critic = critic + "\n" + "\n".join(f"- {issue}" for issue in local_check["issues"])
+    return {"critic": critic, "meta": enforce_title(result.meta.strip(), read_title(notes))}
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 from langchain_core.prompts import ChatPromptTemplate
 
-from llm import llm
+from agents.notes_prefix import NOTES_PREFIX_MESSAGES
+from llm import invoke_prompt
+from utils import enforce_title, read_title
 
-INTEGRATOR_PROMPT = ChatPromptTemplate.from_template(
-    "Create a final Meta Summary. Combine SUMMARY with CRITIC. Base everything on NOTES. "
-    "Do not invent facts. Do not invent metrics. Do not invent numbers. Do not invent citations.\n\n"
+INTEGRATOR_TASK = (
+    "TASK: Create a final Meta Summary. Combine SUMMARY with CRITIC. Base everything on NOTES.\n\n"
     "Start with Title:\n"
     "Title: <copy exactly from NOTES Title. If 'not reported', write 'not reported'>\n\n"
     "Then output:\n"
@@ -17,12 +18,14 @@ INTEGRATOR_PROMPT = ChatPromptTemplate.from_template(
     "STRICT RULES:\n\n"
     "Results:\n"
     "- Check if NOTES Results contains quantitative metrics. If it does, include numeric outcomes from NOTES. Include context. Copy from NOTES. Or copy from SUMMARY if it matches NOTES. Do not change numbers.\n"
-    "- If NOTES Results says 'No quantitative metrics reported in provided text.', write that exact sentence. Do not include any performance numbers.\n"
-    "- If CRITIC flags unsupported numbers or claims, remove them or mark as 'not reported'. Do not keep claims that CRITIC says are not in NOTES.\n"
-    "- Do not add years. Do not add section numbers. Do not add paper IDs. Do not add other irrelevant numbers.\n\n"
-    "NOTES:\n{notes}\n\nSUMMARY:\n{summary}\n\nCRITIC:\n{critic}"
+    "- If CRITIC flags unsupported numbers or claims, remove them or mark as 'not reported'. Do not keep claims that CRITIC says are not in NOTES.\n\n"
 )
 
+INTEGRATOR_PROMPT = ChatPromptTemplate.from_messages([
+    *NOTES_PREFIX_MESSAGES,
+    ("human", INTEGRATOR_TASK + "SUMMARY:\n{summary}\n\nCRITIC:\n{critic}"),
+])
+
 
 def _clean_output_text(raw_output: str) -> str:
     """Removes leading/trailing whitespace."""
@@ -39,7 +42,7 @@ def run(notes: str = "", summary: str = "", critic: str = "", *args, **kwargs) -
         summary_text = kwargs.get("summary", summary) or ""
         critic_text = kwargs.get("critic", critic) or ""
     
-    prompt_chain = INTEGRATOR_PROMPT | llm
-    llm_response = prompt_chain.invoke({"notes": notes_text, "summary": summary_text, "critic": critic_text})
+    llm_response = invoke_prompt(INTEGRATOR_PROMPT, {"notes": notes_text, "summary": summary_text, "critic": critic_text}, step="integrator")
     output_text = getattr(llm_response, "content", llm_response)
-    return _clean_output_text(output_text)
+    # Titel aus Notes übernehmen statt LLM vertrauen
+    return enforce_title(_clean_output_text(output_text), read_title(notes_text))
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+# Gemeinsamer Prompt-Anfang für Summarizer, Critic und Integrator.
+#
+# Provider cachen Prompts nur über identische Präfixe. Darum steht vorne
+# nur, was bei allen drei Agents und jeder LangGraph-Schleife gleich ist:
+# gemeinsame Regeln, dann NOTES. Agent-spezifische Regeln und variable
+# Teile (SUMMARY, CRITIC) kommen danach. Wer diesen Text ändert, ändert
+# den Cache-Schlüssel für alle drei Agents.
+
+SHARED_SYSTEM_RULES = (
+    "You work on structured NOTES extracted from a scientific paper. NOTES are the ground truth. "
+    "Base everything on NOTES. Your specific task follows after NOTES.\n\n"
+    "SHARED RULES:\n"
+    "- Do not invent facts. Do not invent metrics. Do not invent numbers. Do not invent citations.\n"
+    "- Title: copy exactly from NOTES Title. If NOTES Title is 'not reported', write 'not reported'.\n"
+    "- Results: include numeric outcomes only if present in NOTES Results. Copy values exactly. Never compute. Never round. Never guess.\n"
+    "- If NOTES Results says 'No quantitative metrics reported in provided text.', use that exact sentence. Do not include any performance numbers.\n"
+    "- Do not add years. Do not add section numbers. Do not add paper IDs. Do not add other irrelevant numbers."
+)
+
+NOTES_PREFIX_MESSAGES = [
+    ("system", SHARED_SYSTEM_RULES),
+    ("human", "NOTES:\n{notes}"),
+]
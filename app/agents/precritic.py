@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List
+
+from utils import NO_METRICS_SENTENCE, count_numeric_results, extract_numbers, read_title
+
+# Abschnitte, die jede Summary haben muss (Summarizer-Format, DSPy-Summary ähnlich)
+_REQUIRED_SECTIONS = ("objective", "method", "results", "limitations")
+
+
+def _results_block(text: str) -> str:
+    match = re.search(r"Results\**\s*:?\**\s*(.*?)(?:\n\W*\**[A-Z][A-Za-z /]+\**\s*:|\Z)", text or "", flags=re.S)
+    return match.group(1).strip() if match else ""
+
+
+def _without_title(text: str) -> str:
+    # Titel darf Zahlen haben ("GPT-4", "T5"), die zählen nicht als Ergebnis
+    return re.sub(r"^[ \t#*-]*\**Title\**\s*:[^\n]*$", "", text or "", count=1, flags=re.I | re.M)
+
+
+def check(notes: str, summary: str) -> List[str]:
+    """
+    Mechanische Critic-Regeln ohne LLM. Gibt Liste von Problemen zurück.
+
+    Prüft genau das, was CRITIC_PROMPT als feste Regeln hat: Titel gleich,
+    keine Zahlen in SUMMARY, die nicht in NOTES stehen, "No quantitative
+    metrics"-Satz, Ergebniszahlen übernommen. Dazu, ob alle Abschnitte da
+    sind. Leere Liste heißt: Summary besteht alle Regeln.
+    """
+    issues: List[str] = []
+    notes_title = read_title(notes)
+    if notes_title and notes_title.lower() != "not reported":
+        if " ".join(read_title(summary).split()) != " ".join(notes_title.split()):
+            issues.append(f"Title: use exact NOTES title: {notes_title}")
+
+    summary_body = _without_title(summary)
+    unsupported = sorted(extract_numbers(summary_body) - extract_numbers(notes))
+    if unsupported:
+        issues.append(f"Remove numbers not found in NOTES: {', '.join(unsupported[:5])}")
+
+    if NO_METRICS_SENTENCE in (notes or ""):
+        if NO_METRICS_SENTENCE not in summary_body:
+            issues.append(f"Results: write exactly '{NO_METRICS_SENTENCE}'")
+        elif extract_numbers(_results_block(summary_body)):
+            issues.append("Results: NOTES report no metrics, remove performance numbers")
+    elif count_numeric_results(notes) > 0:
+        notes_results = extract_numbers(_results_block(notes))
+        if notes_results and not (notes_results & extract_numbers(summary_body)):
+            issues.append("Results: add numeric outcomes from NOTES Results")
+
+    lowered = summary_body.lower()
+    missing = [name for name in _REQUIRED_SECTIONS if name not in lowered]
+    if missing:
+        issues.append(f"Add missing sections: {', '.join(missing)}")
+    return issues
+
+
+def run(notes: str = "", summary: str = "") -> Dict[str, Any]:
+    """
+    Lokaler Vor-Critic. Besteht Summary alle Regeln, braucht es keinen
+    LLM-Critic mehr.
+
+    "critic" hat dann dasselbe Format wie LLM-Critic, damit Integrator und
+    LangGraph-Routing (erste Zahl = Score) nichts Neues lernen müssen.
+    "Makes sense" prüfen wir nicht lokal, darum 4 statt 5.
+    """
+    issues = check(notes, summary)
+    if issues:
+        critic_text = "Improvements:\n" + "\n".join(f"- {issue}" for issue in issues)
+    else:
+        critic_text = (
+            "Makes sense: 4\n"
+            "Accuracy: 5\n"
+            "Coverage: 5\n"
+            "Details: 5\n"
+            "Improvements:\n"
+            "- none (local rule check passed: title, numbers, results, sections)"
+        )
+    return {"passed": not issues, "issues": issues, "critic": critic_text}
@@ -1,15 +1,53 @@
 from __future__ import annotations
 
+from typing import List
+
 from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from document import extract_title
+from llm import get_llm, invoke_prompt, schema_token_floor, structured_output_rejected
+from utils import enforce_title
+
+NO_METRICS_SENTENCE = "No quantitative metrics reported in provided text."
+NOT_REPORTED = "not reported"
+
+
+class ResultItem(BaseModel):
+    task: str = Field(description="Task, dataset or split, with model/baseline if given")
+    metric: str = Field(description="Metric name, e.g. BLEU, F1, Acc, p")
+    value: str = Field(description="Value exactly as written in TEXT, e.g. 87.3%, 12.4±0.3, <0.05")
+
+
+class PaperNotes(BaseModel):
+    """
+    Reader-Ausgabe als Schema statt Markdown.
+
+    Listen statt Fließtext, "not reported" für fehlende Felder. results leer,
+    wenn Paper keine Zahlen hat. render_notes() macht daraus kompakten Text
+    für spätere Prompts.
+    """
+    title: str = Field(description="Title line at the start of TEXT, else the paper title, else 'not reported'")
+    objective: str = Field(description="1-2 sentences or 'not reported'")
+    methods: List[str] = Field(description="Technique/model, training/eval setup, tooling/frameworks")
+    datasets: List[str] = Field(description="Dataset or corpus names")
+    results: List[ResultItem] = Field(description="Quantitative outcomes, empty if TEXT has no metrics")
+    metrics: List[str] = Field(description="Metric names used in TEXT, no values")
+    contributions: List[str] = Field(description="Main contribution first")
+    limitations: str = Field(description="Short phrase or 'not reported'")
+    applications: str = Field(description="Short phrase or 'not reported'")
+    notes: str = Field(description="Any other important detail or 'not reported'")
 
-from llm import llm
 
-READER_PROMPT = ChatPromptTemplate.from_template(
+_READER_INTRO = (
     "You are a careful scientific note-taker. Work only with TEXT below. "
     "Do not invent facts. Do not include author info. "
     "If a field is missing in TEXT, write 'not reported'. Do not guess.\n\n"
+)
+
+_READER_MARKDOWN_SCHEMA = (
     "Return notes in this Markdown schema:\n\n"
-    "Title: <copy exactly from TEXT. If multi-line, join with spaces. Use 'not reported' only if no title exists>\n"
+    "Title: <copy the 'Title:' line at the start of TEXT. If there is none, copy the title from the beginning of TEXT, or 'not reported'>\n"
     "Objective: <1-2 sentences or 'not reported'>\n"
     "Methods: <technique/model, training/eval setup, tooling/frameworks, or 'not reported'>\n"
     "Datasets/Corpora: <names or 'not reported'>\n"
@@ -20,13 +58,10 @@ READER_PROMPT = ChatPromptTemplate.from_template(
     "Limitations: <short phrase or 'not reported'>\n"
     "Applications/Use-cases: <short phrase or 'not reported'>\n"
     "Notes: <any other important detail or 'not reported'>\n\n"
+)
+
+_READER_STRICT_RULES = (
     "STRICT RULES:\n\n"
-    "Title:\n"
-    "- Copy title exactly from TEXT. Do not shorten. Do not change.\n"
-    "- Title is usually near beginning. Scan first ~80 lines.\n"
-    "- Multi-line title: join lines with single spaces. Keep punctuation as shown.\n"
-    "- Do not mistake 'Abstract' or 'Introduction' as title.\n"
-    "- Use 'not reported' only if no reasonable title exists.\n\n"
     "Results:\n"
     "- Check if TEXT contains quantitative metrics. Look for tables, scores, percentages, p-values, ROUGE, BLEU, F1, Acc, EM, AUC.\n"
     "- If 'Table' is present, extract at least 2 numeric entries.\n"
@@ -36,10 +71,75 @@ READER_PROMPT = ChatPromptTemplate.from_template(
     "- Use values exactly as written. Never compute. Never round. Never guess missing values.\n"
     "- If tables are present, include context. Include model/system. Include dataset/task. Include metric name. Include split.\n"
     "- If only one result is present, extract it. Also extract next-best outcome. Next-best could be baseline comparison, comparison test, another metric, or p-value.\n"
-    "- If no metrics exist, write exactly: No quantitative metrics reported in provided text.\n\n"
-    "TEXT:\n{content}"
+    "- If no metrics exist, write exactly: No quantitative metrics reported in provided text."
 )
 
+# Statische Regeln als System-Message vorne: gleicher Präfix für jedes Paper, Provider kann ihn cachen.
+READER_RULES = _READER_INTRO + _READER_MARKDOWN_SCHEMA + _READER_STRICT_RULES
+
+# Schema-Ausgabe (PaperNotes): Markdown-Teil fällt weg, Felder beschreibt
+# das JSON-Schema. Fused-Reader (agents/fused.py) nutzt diese Regeln.
+READER_STRUCTURED_RULES = _READER_INTRO + (
+    "Fill every field of the response schema. Lists may be empty. "
+    "results: one item per outcome, split into task, metric and value. "
+    "If TEXT has no quantitative metrics, results is an empty list.\n\n"
+) + _READER_STRICT_RULES
+
+READER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", READER_RULES),
+    ("human", "TEXT:\n{content}"),
+])
+
+READER_STRUCTURED_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", READER_STRUCTURED_RULES),
+    ("human", "TEXT:\n{content}"),
+])
+
+
+def reader_prompt(structured: bool = False) -> ChatPromptTemplate:
+    """Prompt passend zu run(structured=...), für Step-Cache-Fingerprint."""
+    return READER_STRUCTURED_PROMPT if structured else READER_PROMPT
+
+
+def _reported(value: str) -> bool:
+    return bool(value and value.strip() and value.strip().lower().rstrip(".") != NOT_REPORTED)
+
+
+def render_notes(notes: PaperNotes) -> str:
+    """
+    Kompakte, feste Textform von PaperNotes für spätere Prompts.
+
+    Gleiche Labels wie Markdown-Notes, darum passen read_title,
+    count_numeric_results und precritic weiter. Felder ohne Inhalt fallen
+    weg, außer Title und Results. Das spart in Summarizer, Critic und
+    Integrator je Call Tokens, NOTES stehen dort jedes Mal im Prompt.
+    """
+    lines = [f"Title: {notes.title.strip() or NOT_REPORTED}"]
+    if _reported(notes.objective):
+        lines.append(f"Objective: {notes.objective.strip()}")
+    for label, values in (("Methods", notes.methods), ("Datasets/Corpora", notes.datasets)):
+        values = [value.strip() for value in values if _reported(value)]
+        if values:
+            lines.append(f"{label}: {'; '.join(values)}")
+    lines.append("Results:")
+    results = [item for item in notes.results if _reported(item.value)]
+    if results:
+        lines.extend(f"- {item.task.strip()}: {item.metric.strip()}={item.value.strip()}" for item in results)
+    else:
+        lines.append(NO_METRICS_SENTENCE)
+    for label, values in (("Metrics", notes.metrics), ("Contributions", notes.contributions)):
+        values = [value.strip() for value in values if _reported(value)]
+        if values:
+            lines.append(f"{label}: {'; '.join(values)}")
+    for label, value in (
+        ("Limitations", notes.limitations),
+        ("Applications/Use-cases", notes.applications),
+        ("Notes", notes.notes),
+    ):
+        if _reported(value):
+            lines.append(f"{label}: {value.strip()}")
+    return "\n".join(lines)
+
 
 def _clean_output_text(raw_output: str) -> str:
     """
@@ -52,7 +152,7 @@ def _clean_output_text(raw_output: str) -> str:
     return (raw_output or "").strip()
 
 
-def run(input_text: str) -> str:
+def run(input_text: str, structured: bool = False) -> str:
     """
     Extrahiert strukturierte Notizen aus Paper-Text.
     
@@ -62,9 +162,38 @@ def run(input_text: str) -> str:
     
     getattr() etwas defensiv. Manchmal llm_response String, manchmal Objekt
     mit .content. Behandelt beide Fälle.
+
+    Titel kommt lokal aus Text (build_analysis_context setzt "Title:"-Zeile).
+    Ist er bekannt, überschreiben wir Title in Notes. LLM muss ihn nicht
+    exakt treffen.
+
+    structured=True: Ausgabe als PaperNotes (Structured Output), zurück
+    kommt render_notes(). Kein Markdown-Parsen, kürzere NOTES downstream.
+    max_tokens mindestens schema_token_floor(PaperNotes), Presets (160/256)
+    reichen für das JSON nicht. Ist Antwort trotzdem abgeschnitten oder
+    kein gültiges JSON, läuft Markdown-Reader wie ohne Schema. Ebenso, wenn
+    Provider response_format ablehnt (llm.structured_output_rejected).
     """
-    prompt_chain = READER_PROMPT | llm
-    llm_response = prompt_chain.invoke({"content": input_text})
+    if structured:
+        try:
+            paper_notes = invoke_prompt(
+                READER_STRUCTURED_PROMPT, {"content": input_text}, step="reader",
+                schema=PaperNotes, max_tokens=structured_max_tokens(),
+            )
+        except ValueError:
+            # Ungültige Antwort ist nicht im LLM-Cache, Markdown-Call fragt neu
+            pass
+        except Exception as exc:
+            if not structured_output_rejected(exc):
+                raise
+        else:
+            return enforce_title(render_notes(paper_notes), extract_title(input_text))
+    llm_response = invoke_prompt(READER_PROMPT, {"content": input_text}, step="reader")
     # Beide Fälle behandeln: String-Antworten und Objekt-Antworten
     output_text = getattr(llm_response, "content", llm_response)
-    return _clean_output_text(output_text)
+    return enforce_title(_clean_output_text(output_text), extract_title(input_text))
+
+
+def structured_max_tokens() -> int:
+    """max_tokens für strukturierten Reader: Reader-Budget, mindestens was PaperNotes braucht."""
+    return max(int(get_llm("reader").max_tokens or 0), schema_token_floor(PaperNotes))
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from langchain_core.prompts import ChatPromptTemplate
 
-from llm import llm
+from agents.notes_prefix import NOTES_PREFIX_MESSAGES
+from llm import invoke_prompt
+from utils import enforce_title, read_title
 
-SUMMARIZER_PROMPT = ChatPromptTemplate.from_template(
-    "Produce a concise scientific summary from NOTES. Do not invent facts. Do not include citations.\n\n"
+SUMMARY_TASK = (
+    "TASK: Produce a concise scientific summary from NOTES. Do not include citations.\n\n"
     "Output format:\n"
     "Title: <copy exactly from NOTES Title. If 'not reported', write 'not reported'>\n"
     "Objective: <1-2 sentences or 'not reported'>\n"
@@ -18,20 +20,43 @@ SUMMARIZER_PROMPT = ChatPromptTemplate.from_template(
     "- <bullet or 'not reported'>\n\n"
     "STRICT RULES:\n\n"
     "Results:\n"
-    "- Include numeric outcomes only if present in NOTES Results. Otherwise write exactly 'No quantitative metrics reported in provided text.'\n"
-    "- Never infer numbers. Never guess numbers. Never add numbers that are not in NOTES Results.\n"
     "- If NOTES Results contains metrics, copy them exactly. Keep values exactly as they are.\n"
-    "- Do not add other numbers. Do not add years. Do not add section numbers. Do not add paper IDs. Do not add counts. Do not add hyperparameters.\n\n"
-    "NOTES:\n{notes}"
+    "- Do not add counts. Do not add hyperparameters."
 )
 
+SUMMARIZER_PROMPT = ChatPromptTemplate.from_messages([
+    *NOTES_PREFIX_MESSAGES,
+    ("human", SUMMARY_TASK),
+])
+
+# Rework nach Critic: gleicher Präfix (Prompt-Cache), dazu alte Summary und
+# Improvements. Ohne Kritik liefert temperature=0 sonst dieselbe Summary nochmal.
+SUMMARIZER_REWORK_PROMPT = ChatPromptTemplate.from_messages([
+    *NOTES_PREFIX_MESSAGES,
+    ("human",
+        SUMMARY_TASK + "\n\n"
+        "REWORK: A reviewer checked your PREVIOUS SUMMARY against NOTES. "
+        "Apply every point in IMPROVEMENTS. Keep parts that are correct. Use the same output format.\n\n"
+        "PREVIOUS SUMMARY:\n{summary}\n\n"
+        "IMPROVEMENTS:\n{improvements}"
+    ),
+])
+
 
 def _clean_output_text(raw_output: str) -> str:
     return (raw_output or "").strip()
 
 
-def run(structured_notes: str) -> str:
-    prompt_chain = SUMMARIZER_PROMPT | llm
-    llm_response = prompt_chain.invoke({"notes": structured_notes})
+def run(structured_notes: str, previous_summary: str = "", improvements: str = "") -> str:
+    """Erster Lauf nur mit Notes. Mit previous_summary und improvements: Rework."""
+    if previous_summary and improvements:
+        llm_response = invoke_prompt(
+            SUMMARIZER_REWORK_PROMPT,
+            {"notes": structured_notes, "summary": previous_summary, "improvements": improvements},
+            step="summarizer",
+        )
+    else:
+        llm_response = invoke_prompt(SUMMARIZER_PROMPT, {"notes": structured_notes}, step="summarizer")
     output_text = getattr(llm_response, "content", llm_response)
-    return _clean_output_text(output_text)
+    # Titel aus Notes übernehmen statt LLM vertrauen
+    return enforce_title(_clean_output_text(output_text), read_title(structured_notes))
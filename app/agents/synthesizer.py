@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from llm import invoke_prompt
+
+# Cross-Paper-Synthese über mehrere Uploads. Quellen sind Notes einzelner
+# Paper oder, eine Ebene höher, Teil-Synthesen aus früheren Gruppen.
+# Gleiche Regeln für beide Fälle: Zahlen nur kopieren, nie vergleichen per Rechnung.
+SYNTHESIZER_RULES = (
+    "You compare several scientific papers. Each SOURCE is either the NOTES of one paper "
+    "or a SYNTHESIS of a group of papers. SOURCES are the ground truth.\n\n"
+    "STRICT RULES:\n"
+    "- Do not invent facts. Do not invent metrics. Do not invent numbers. Do not invent citations.\n"
+    "- Name papers by their Title in square brackets, e.g. [Title]. Copy titles exactly from SOURCES.\n"
+    "- Copy numbers exactly with their paper. Never compute. Never round. Never compare numbers across "
+    "different tasks, datasets or metrics.\n"
+    "- If a paper reports no quantitative metrics, say so for that paper. Do not fill the gap."
+)
+
+SYNTHESIS_TASK = (
+    "TASK: Write a cross-paper Meta Summary of all SOURCES.\n\n"
+    "Output format:\n"
+    "Papers: <comma-separated list of all titles in square brackets>\n"
+    "1) Five bullets with **bold labels**: Common Goal, Methods, Results, Differences, Gaps\n"
+    "2) Two open questions that span several papers\n"
+    "3) Confidence: <High/Medium/Low> - <one short reason>. Low if SOURCES rarely report comparable numbers.\n\n"
+    "SOURCES:\n{sources}"
+)
+
+SYNTHESIZER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYNTHESIZER_RULES),
+    ("human", SYNTHESIS_TASK),
+])
+
+
+def format_sources(sources: List[Dict[str, str]]) -> str:
+    """Quellen nummeriert mit Dateiname als Kopf, Text darunter."""
+    return "\n\n".join(
+        f"SOURCE {index} ({source.get('name') or 'paper'}):\n{(source.get('text') or '').strip()}"
+        for index, source in enumerate(sources, start=1)
+    )
+
+
+def run(sources: List[Dict[str, str]]) -> str:
+    """Eine Synthese über eine Gruppe. sources: [{"name": ..., "text": ...}]."""
+    llm_response = invoke_prompt(SYNTHESIZER_PROMPT, {"sources": format_sources(sources)}, step="integrator")
+    return (getattr(llm_response, "content", llm_response) or "").strip()
@@ -5,27 +5,24 @@ LangChain, LangGraph, and DSPy pipelines.
 """
 
 import os
-import io
 import json
 import copy
 import time
 import streamlit as st
-import pandas as pd
-import altair as alt
 from dotenv import load_dotenv
-from pypdf import PdfReader
-
-from workflows.langchain_pipeline import run_pipeline as run_lc
-try:
-    from workflows.langgraph_pipeline import run_pipeline as run_lg
-    LANGGRAPH_READY = True
-except Exception as e:
-    LANGGRAPH_READY = False
-    def run_lg(*args, **kwargs):
-        raise ImportError(f"LangGraph import failed: {e}")
-from workflows.dspy_pipeline import run_pipeline as run_dspy, DSPY_READY
+
+from coalescing import request_key
+from corpus import find_prior_analysis, get_corpus_index
+from fingerprint import signature as document_signature
+from document import extract_file_text
+from engines import engine_available, run_engine
+from jobs import get_job_queue
 from utils import build_analysis_context, extract_confidence_line
 
+# Engines, pandas und altair erst bei Bedarf laden: erster Seitenaufbau ohne mehrere Sekunden Importe
+LANGGRAPH_READY = engine_available("langgraph")
+DSPY_READY = engine_available("dspy")
+
 load_dotenv()
 st.set_page_config(
     page_title="Paper Summarizer",
@@ -115,7 +112,7 @@ with st.sidebar:
         "Preset",
         ["Speed", "Balanced", "Detail"],
         index=1,
-        help="Speed: Fast execution, fewer tokens (160), deterministic (temp=0.0)\n\nBalanced: Good trade-off (256 tokens, temp=0.1)\n\nDetail: Slower but more detailed (384 tokens, temp=0.15)",
+        help="Speed: Fast execution, fewer tokens (160), deterministic (temp=0.0), fused fast mode (2 LLM calls instead of 4)\n\nBalanced: Good trade-off (256 tokens, temp=0.1)\n\nDetail: Slower but more detailed (384 tokens, temp=0.15)",
     )
     
     if preset == "Speed":
@@ -137,6 +134,13 @@ with st.sidebar:
         help="gpt-4o-mini: Faster and cheaper, good for most tasks\n\ngpt-4o: More capable but slower and more expensive",
     )
     
+    light_model = st.selectbox(
+        "Summarizer & Critic model",
+        ["Same as above", "gpt-4o-mini", "gpt-4o", "gpt-4.1"],
+        index=0,
+        help="Summarizer and Critic only read the short notes, not the paper. A small model there saves time and cost, the Reader keeps the model above.",
+    )
+    
     with st.expander("Advanced"):
         max_tokens = st.slider(
             "Max Tokens",
@@ -149,6 +153,67 @@ with st.sidebar:
             0.0, 1.0, default_temperature, 0.05,
             help="Controls randomness in responses:\n\n0.0 = Deterministic, same input always gives same output\n0.1-0.3 = Slightly creative, good for structured tasks\n0.7-1.0 = Very creative, more variation",
         )
+        
+        context_token_budget = st.slider(
+            "Context Budget (tokens)",
+            0, 32000, 8000, 1000,
+            help="Maximum size of the paper text sent to the Reader. Longer papers are compressed: abstract, results, tables and conclusion are kept first, appendix and bibliography dropped. 0 = no compression.",
+        )
+        
+        context_strategy = st.selectbox(
+            "Context Selection",
+            ["compress", "bm25"],
+            format_func=lambda value: {"compress": "Compress (section + number heuristic)", "bm25": "BM25 retrieval per Reader field"}[value],
+            help="How papers above the context budget are shortened.\n\nCompress: keeps blocks by section weight and numeric evidence until the budget is full.\n\nBM25: keeps the abstract plus the top 3 passages each for methods, datasets, results and limitations (local BM25 index, no embeddings). Much shorter Reader prompt for long papers.",
+        )
+        
+        use_precritic = st.checkbox(
+            "Local pre-critic",
+            value=True,
+            help="Checks title, numbers and the 'No quantitative metrics' rule locally. If the summary passes, the LLM Critic call is skipped.",
+        )
+        
+        use_step_cache = st.checkbox(
+            "Reuse unchanged steps",
+            value=True,
+            help="Stores notes, summary, critic and meta summary per input and step settings. Re-running with the same inputs only recomputes the steps whose input or settings changed. Steps with temperature > 0 always run again.",
+        )
+        
+        use_structured_notes = st.checkbox(
+            "Structured Reader notes",
+            value=True,
+            help="Reader returns typed notes (title, methods, results as task/metric/value, ...) via structured output. Later steps get a compact rendering, so every prompt after the Reader is shorter. The Reader gets at least the tokens the schema needs, and falls back to Markdown notes if the JSON is cut off or invalid. Turn off for providers without JSON schema support.",
+        )
+        
+        use_fast_mode = st.checkbox(
+            "Fused fast mode",
+            value=preset == "Speed",
+            help="Runs Reader+Summarizer as one call and Critic+Integrator as a second call. Half the round trips, NOTES are sent once instead of three times. No LangGraph rework loop. Default in the Speed preset.",
+        )
+        
+        use_synthesis = st.checkbox(
+            "Cross-paper synthesis",
+            value=True,
+            help="With several uploaded files every paper gets its own pipeline, all running at the same time. Afterwards one more step compares the per-paper notes and writes a cross-paper Meta Summary. Groups of four papers are summarized first, then the group summaries.",
+        )
+        
+        use_reuse = st.checkbox(
+            "Reuse prior analyses",
+            value=False,
+            help="If the same paper, or a near-duplicate (other arXiv version, different PDF extraction), was already analysed with this pipeline and model, its stored result is returned without any LLM call.",
+        )
+        
+        near_duplicate_threshold = st.slider(
+            "Near-duplicate threshold",
+            0.5, 1.0, 0.8, 0.05,
+            help="Estimated overlap (MinHash over 9-character shingles) above which two documents count as the same paper. 0.8 tolerates a few percent of changed words. 1.0 = exact text only.",
+        )
+        
+        use_checkpointing = st.checkbox(
+            "Resumable LangGraph runs",
+            value=False,
+            help="Saves LangGraph state after every node (SQLite, needs langgraph-checkpoint-sqlite). If a run crashes or times out, pressing Analyze again continues from the last finished node.",
+        )
     
     # DSPy settings
     if DSPY_READY:
@@ -167,14 +232,22 @@ with st.sidebar:
                 )
                 if not os.path.exists(dspy_dev_path):
                     st.warning(f"File not found: {dspy_dev_path}")
+                teleprompt_objective = st.selectbox(
+                    "Optimization Objective",
+                    ["f1", "cost"],
+                    format_func=lambda value: {"f1": "Word-F1", "cost": "F1 + tokens + latency"}[value],
+                    help="Word-F1: keep the compiled program with all bootstrapped demos.\n\nF1 + tokens + latency: also tries fewer demos and picks the cheapest program per call whose F1 stays within tolerance of the best.",
+                )
             else:
                 dspy_dev_path = "dev-set/dev.jsonl"
+                teleprompt_objective = "f1"
             
             show_debug = st.checkbox("Debug Mode", value=False, help="Show detailed error messages and stack traces when errors occur. Useful for troubleshooting.")
     else:
         # DSPy not available
         use_dspy_teleprompt = False
         dspy_dev_path = "dev-set/dev.jsonl"
+        teleprompt_objective = "f1"
         show_debug = False
 
 # Config
@@ -187,12 +260,452 @@ config = {
     "debug": bool(show_debug),
     "dspy_teleprompt": use_dspy_teleprompt,
     "dspy_dev_path": dspy_dev_path,
+    "teleprompt_objective": teleprompt_objective,
     "csv_telemetry": True,
     "max_critic_loops": 2, # Default for LangGraph
+    "context_token_budget": int(context_token_budget),
+    "context_strategy": context_strategy,
+    "precritic": bool(use_precritic),
+    "step_cache": bool(use_step_cache),
+    "checkpointing": bool(use_checkpointing),
+    "fast_mode": bool(use_fast_mode),
+    "structured_notes": bool(use_structured_notes),
+    "reuse_prior_analyses": bool(use_reuse),
+    "near_duplicate_threshold": float(near_duplicate_threshold),
 }
+if light_model != "Same as above":
+    # Pro Agent überschreibbar: model, max_tokens, temperature (llm.agent_config)
+    config["agents"] = {step: {"model": light_model} for step in ("summarizer", "critic")}
+
+# Text processing
+@st.cache_data(show_spinner=False, max_entries=32)
+def _extract_file_text(file_data: bytes, file_name: str, file_type: str) -> str:
+    # Schlüssel ist Dateiinhalt: Tab-Wechsel oder Slider parsen PDF nicht neu
+    return extract_file_text(file_data, file_name, file_type)
+
+
+def read_uploaded_papers(files) -> dict:
+    """Text pro Datei, Schlüssel ist Dateiname. Gleiche Namen bekommen Suffix."""
+    papers = {}
+    for file in files or []:
+        name = file.name
+        while name in papers:
+            name = f"{name} ({len(papers) + 1})"
+        try:
+            # getvalue() statt read(): Upload-Puffer bleibt bei jedem Rerun lesbar
+            papers[name] = _extract_file_text(file.getvalue(), file.name, file.type)
+        except Exception as e:
+            papers[name] = f"[Error reading {file.name}: {e}]"
+    return papers
+
+
+def read_uploaded_files(files) -> str:
+    return "\n\n".join(text for text in read_uploaded_papers(files).values() if text).strip()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_analysis_context(raw_text: str, context_token_budget: int, context_strategy: str = "compress") -> str:
+    # Nur Budget und Strategie ändern Kontext. Modell, Temperatur usw. gehören nicht in den Schlüssel
+    return build_analysis_context(
+        raw_text, {"context_token_budget": context_token_budget, "context_strategy": context_strategy}
+    )
+
+
+def load_analysis_context(files, run_config: dict) -> str:
+    raw_text = read_uploaded_files(files)
+    if not raw_text:
+        return ""
+    return _cached_analysis_context(
+        raw_text, int(run_config.get("context_token_budget") or 0), run_config.get("context_strategy") or "compress"
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_signature(context: str):
+    return document_signature(context)
+
+
+def load_paper_contexts(files, run_config: dict) -> dict:
+    """
+    Analyse-Kontext pro Datei statt eines verketteten Texts.
+
+    Jedes Paper wird einzeln komprimiert und bekommt eigene Pipeline. Ein
+    Reader-Prompt mit mehreren Papern mischt Titel, Methoden und Zahlen.
+    """
+    budget = int(run_config.get("context_token_budget") or 0)
+    contexts = {}
+    for name, raw_text in read_uploaded_papers(files).items():
+        if raw_text.strip():
+            contexts[name] = _cached_analysis_context(raw_text.strip(), budget, run_config.get("context_strategy") or "compress")
+    return {name: context for name, context in contexts.items() if context.strip()}
+
+
+# Background jobs
+PIPELINE_ENGINES = {"LangChain": "langchain", "LangGraph": "langgraph", "DSPy": "dspy"}
+
+
+def submit_pipeline_job(mode: str, context: str, run_config: dict):
+    """
+    Startet Pipeline als Hintergrund-Job.
+
+    Gleicher Kontext + gleiche Config + gleiche Engine ergibt denselben Job.
+    Analyze und Compare teilen sich so fertige Läufe.
+    """
+    return get_job_queue().submit(
+        mode,
+        run_engine,
+        PIPELINE_ENGINES[mode],
+        context,
+        copy.deepcopy(run_config),
+        key=request_key("run", mode, context, run_config),
+    )
+
+
+def _synthesize_results(results: dict, run_config: dict) -> dict:
+    # Erst im Job importieren: synthesis zieht llm und langchain_openai nach
+    from synthesis import paper_sources, synthesize
+
+    return synthesize(paper_sources(results), run_config)
+
+
+def submit_synthesis_job(results: dict, run_config: dict):
+    """Cross-Paper-Synthese als Job. Gleiche Notes + Config ergeben denselben Job."""
+    notes = {name: (result or {}).get("structured", "") for name, result in results.items()}
+    return get_job_queue().submit(
+        "Cross-paper synthesis",
+        _synthesize_results,
+        results,
+        copy.deepcopy(run_config),
+        key=request_key("synthesis", notes, run_config),
+    )
+
+
+@st.fragment(run_every=1.0)
+def poll_jobs(job_ids: list, label: str) -> None:
+    """Zeigt Fortschritt, bis alle Jobs fertig sind. Dann voller Rerun für Ergebnisse."""
+    queue = get_job_queue()
+    jobs = [queue.get(job_id) for job_id in job_ids]
+    if all(job is None or job.is_finished for job in jobs):
+        st.rerun()
+    with st.status(label, expanded=True, state="running"):
+        for job in jobs:
+            if job is not None:
+                st.write(f"{job.label}: {job.status} ({job.elapsed_s():.0f}s)")
+
+
+def jobs_running(job_ids: list) -> bool:
+    queue = get_job_queue()
+    return any(job is not None and not job.is_finished for job in (queue.get(job_id) for job_id in job_ids))
+
+
+def _tokens(s: str) -> set[str]:
+    import re
+    s = (s or "").lower()
+    s = re.sub(r"[^a-z0-9\s]", " ", s)
+    return {t for t in s.split() if len(t) > 2}
+
+
+def _f1(gold: str, pred: str) -> float:
+    G = _tokens(gold)
+    P = _tokens(pred)
+    if not G or not P:
+        return 0.0
+    inter = len(G & P)
+    prec = inter / len(P)
+    rec = inter / len(G)
+    return 0.0 if (prec + rec) == 0 else (2 * prec * rec) / (prec + rec)
+
+
+def run_teleprompt_comparison(context: str, run_config: dict) -> dict:
+    base_cfg = copy.deepcopy(run_config)
+    base_cfg["dspy_teleprompt"] = False
+    tp_cfg = copy.deepcopy(run_config)
+    tp_cfg["dspy_teleprompt"] = True
+    # Teleprompting optimiert einzelnen Summarizer, Fast-Mode hat keinen
+    base_cfg["fast_mode"] = tp_cfg["fast_mode"] = False
+    res_base = run_engine("dspy", context, base_cfg)
+    res_tp = run_engine("dspy", context, tp_cfg)
+    # F1 gleich im Job, dann muss Kontext nicht in Session bleiben
+    return {
+        "Base": {**res_base, "f1": _f1(context, res_base.get("summary", "") or "")},
+        "Teleprompt": {**res_tp, "f1": _f1(context, res_tp.get("summary", "") or "")},
+    }
+
+
+# Result rendering
+def workflow_graph_dot(pipeline_result: dict) -> str:
+    """LangGraph-Ergebnis trägt keinen DOT-String mehr, erst bei Anzeige bauen."""
+    if pipeline_result.get("graph_dot"):
+        return pipeline_result["graph_dot"]
+    from workflows.langgraph_pipeline import graph_dot
+    return graph_dot(pipeline_result)
+
+
+def render_analysis_result(pipeline_result: dict, pipeline_mode: str, paper_name: str = "") -> None:
+    st.markdown("## Results")
+    reused_from = pipeline_result.get("reused_from")
+    if reused_from:
+        st.info(
+            f"Reused stored analysis of '{reused_from.get('title') or reused_from.get('doc_hash')}' "
+            f"({reused_from.get('similarity', 1.0):.0%} similar). No LLM calls. Turn off 'Reuse prior analyses' to run again."
+        )
+    
+    # Metrics
+    col_meta1, col_meta2, col_meta3, col_meta4 = st.columns(4)
+    with col_meta1:
+        st.metric("Total Time", f"{pipeline_result.get('latency_s', 0):.2f}s", help="Total execution time for the entire pipeline in seconds")
+    with col_meta2:
+        summary_len = len(pipeline_result.get("summary", "") or "")
+        st.metric("Summary Length", f"{summary_len:,} chars", help="Number of characters in the generated summary")
+    with col_meta3:
+        meta_len = len(pipeline_result.get("meta", "") or "")
+        st.metric("Meta Length", f"{meta_len:,} chars", help="Number of characters in the meta summary (final integrated summary)")
+    with col_meta4:
+        loops = int(pipeline_result.get("critic_loops", 0) or 0)
+        st.metric("Critic Loops", str(loops), help="How many times LangGraph routed back to Summarizer due low critic score (LangGraph only).")
+
+    execution_trace = pipeline_result.get("execution_trace", []) or []
+    trace_set = {str(x).lower() for x in execution_trace if x}
+    agent_lines = []
+    for key, label in (
+        ("reader", "Reader"),
+        ("summarizer", "Summarizer"),
+        ("critic", "Critic"),
+        ("integrator", "Integrator"),
+    ):
+        status_text = "visited" if key in trace_set else "not visited"
+        agent_lines.append(f"{label} - {status_text}")
+
+    with st.expander("Execution Trace", expanded=True):
+        st.markdown("\n".join(f"- {line}" for line in agent_lines))
+        if pipeline_result.get("fast_mode"):
+            st.caption(f"Fused fast mode: 2 LLM calls, {pipeline_result.get('calls_saved', 0)} saved. Reader time includes Summarizer, Integrator time includes Critic.")
+        if pipeline_mode == "LangGraph":
+            looped = "YES" if int(pipeline_result.get("critic_loops", 0) or 0) > 0 else "NO"
+            routing = pipeline_result.get("routing_trace", []) or []
+            branch = (routing[-1] if routing else "n/a").upper()
+            st.markdown(f"LangGraph looped: **{looped}**")
+            st.markdown(f"LangGraph branch: **{branch}**")
+    
+    # Meta Summary
+    if pipeline_result.get("meta"):
+        st.markdown("### Meta Summary")
+        st.info(pipeline_result.get("meta"))
+        confidence_line = pipeline_result.get("confidence") or extract_confidence_line(pipeline_result.get("meta", ""))
+        if confidence_line:
+            st.caption(confidence_line)
+        else:
+            st.caption("Confidence: not provided")
+
+    # Summary
+    if pipeline_result.get("summary"):
+        st.markdown("### Summary")
+        st.markdown(pipeline_result.get("summary"))
+    
+    # Timing
+    st.markdown("### Timing")
+    times = {
+        "Reader": pipeline_result.get('reader_s', 0),
+        "Results Extractor": pipeline_result.get('results_extractor_s', 0),
+        "Summarizer": pipeline_result.get('summarizer_s', 0),
+        "Critic": pipeline_result.get('critic_s', 0),
+        "Integrator": pipeline_result.get('integrator_s', 0),
+    }
+    cols = st.columns(len(times))
+    for col, (key, value) in zip(cols, times.items()):
+        with col:
+            st.metric(key, f"{value:.2f}s")
+    
+    # Notes & Critic
+    col_notes, col_critic = st.columns(2)
+    with col_notes:
+        if pipeline_result.get("structured"):
+            with st.expander("Notes", expanded=False):
+                st.code(pipeline_result.get("structured"), language="")
+    
+    with col_critic:
+        if pipeline_result.get("critic"):
+            with st.expander("Critic", expanded=False):
+                st.code(pipeline_result.get("critic"), language="")
+    
+    # Graph (only LangGraph)
+    if pipeline_mode == "LangGraph" and pipeline_result.get("execution_trace"):
+        st.markdown("### Workflow Graph")
+        st.graphviz_chart(workflow_graph_dot(pipeline_result), use_container_width=True)
+    
+    # Download
+    st.markdown("### Export")
+    st.download_button(
+        "Download as JSON",
+        data=json.dumps(pipeline_result, ensure_ascii=False, indent=2),
+        file_name=f"paper_analysis_{pipeline_mode.lower()}_{int(time.time())}.json",
+        mime="application/json",
+        use_container_width=True,
+        # Mehrere Paper: ein Button pro Tab, gleiche Ergebnisse dürfen nicht kollidieren
+        key=f"download_{paper_name}" if paper_name else None,
+    )
+
+
+def render_analysis_job(job, pipeline_mode: str, paper_name: str = "") -> None:
+    if job.status == "error":
+        st.error(f"Analysis failed: {job.error}")
+        if show_debug:
+            st.code(job.error_trace, language="python")
+    elif job.result:
+        render_analysis_result(job.result, pipeline_mode, paper_name)
+    else:
+        st.error("Analysis failed. No results received.")
+
+
+def render_comparison(results: dict, errors: dict, error_traces: dict) -> None:
+    import altair as alt
+    import pandas as pd
+
+    # Comparison table
+    st.markdown("## Comparison Table")
+    table_rows = []
+    for label, res in results.items():
+        table_rows.append({
+            "Pipeline": label,
+            "Total (s)": f"{res.get('latency_s', 0.0):.2f}",
+            "Reader (s)": f"{res.get('reader_s', 0.0):.2f}",
+            "Summarizer (s)": f"{res.get('summarizer_s', 0.0):.2f}",
+            "Critic (s)": f"{res.get('critic_s', 0.0):.2f}",
+            "Summary (chars)": len(res.get("summary", "") or ""),
+            "Meta (chars)": len(res.get("meta", "") or ""),
+        })
+    
+    df = pd.DataFrame(table_rows)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    # Runtime Comparison
+    if not df.empty:
+        st.markdown("### Runtime Comparison")
+        chart_df = pd.DataFrame([
+            {
+                "Pipeline": row["Pipeline"],
+                "Runtime": float(row["Total (s)"])
+            }
+            for row in table_rows
+        ])
+        chart = (
+            alt.Chart(chart_df)
+            .mark_bar(size=50)
+            .encode(
+                x=alt.X("Pipeline:N", title="Pipeline", sort=None),
+                y=alt.Y("Runtime:Q", title="Runtime (seconds)"),
+                color=alt.Color("Pipeline:N", legend=None),
+                tooltip=["Pipeline", "Runtime"]
+            )
+            .properties(height=300)
+        )
+        st.altair_chart(chart, use_container_width=True)
+    
+    # Key Metrics
+    st.markdown("### Key Metrics")
+    if len(table_rows) >= 3:
+        fastest = min(table_rows, key=lambda x: float(x["Total (s)"]))
+        longest_summary = max(table_rows, key=lambda x: int(x["Summary (chars)"]))
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Fastest Pipeline", fastest["Pipeline"], f"{fastest['Total (s)']}s")
+        with col2:
+            st.metric("Longest Summary", longest_summary["Pipeline"], f"{int(longest_summary['Summary (chars)']):,} chars")
+        with col3:
+            avg_time = sum(float(r["Total (s)"]) for r in table_rows) / len(table_rows)
+            st.metric("Average Runtime", f"{avg_time:.2f}s")
+    
+    # Detailed results
+    st.markdown("## Detailed Results")
+    tabs = st.tabs(list(results.keys()))
+    for tab, label in zip(tabs, results.keys()):
+        res = results[label]
+        with tab:
+            if label == "DSPy" and not DSPY_READY:
+                st.warning("DSPy not installed. Install `dspy-ai` and `litellm` for full functionality.")
+            if errors.get(label):
+                st.error(f"**Error in {label}:** {errors[label]}")
+                if show_debug:
+                    st.code(error_traces.get(label, ""), language="python")
+
+            execution_trace = res.get("execution_trace", []) or []
+            if execution_trace:
+                with st.expander("Execution Trace", expanded=False):
+                    st.markdown("\n".join(f"- {t}" for t in execution_trace))
+            
+            # Graph for LangGraph
+            if label == "LangGraph" and res.get("execution_trace"):
+                st.markdown("### Workflow Graph")
+                st.graphviz_chart(workflow_graph_dot(res), use_container_width=True)
+            
+            st.markdown("**Meta Summary**")
+            st.info(res.get("meta", ""))
+            
+            st.markdown("**Summary**")
+            st.markdown(res.get("summary", ""))
+            
+            with st.expander("Notes"):
+                st.text(res.get("structured", ""))
+            
+            with st.expander("Critic"):
+                st.text(res.get("critic", ""))
+
+
+def render_teleprompt_comparison(variants: dict) -> None:
+    import pandas as pd
+
+    # Comparison table
+    st.markdown("## Comparison")
+    rows = []
+    for label, res in variants.items():
+        rows.append({
+            "Variant": label,
+            "Runtime (s)": f"{res.get('latency_s', 0.0):.2f}",
+            "Summary Length": len(res.get("summary", "") or ""),
+            "Meta Length": len(res.get("meta", "") or ""),
+            "F1 Score": f"{res.get('f1', 0.0):.3f}",
+            "Summarizer Tokens/Call": res.get("teleprompt_tokens_per_call"),
+        })
+    df_gain = pd.DataFrame(rows)
+    st.dataframe(df_gain, use_container_width=True, hide_index=True)
+    
+    if len(df_gain) == 2:
+        f1_base = float(df_gain.iloc[0]["F1 Score"])
+        f1_tp = float(df_gain.iloc[1]["F1 Score"])
+        gain = f1_tp - f1_base
+        if gain > 0:
+            st.success(f"Teleprompt F1 Gain: +{gain:.3f}")
+        else:
+            st.info(f"Teleprompt F1 Gain: {gain:.3f}")
+
+    candidates = (variants.get("Teleprompt") or {}).get("teleprompt_candidates") or []
+    if candidates:
+        tp_res = variants["Teleprompt"]
+        st.markdown("### Candidate Programs (dev set, per summarizer call)")
+        st.caption(
+            f"{tp_res.get('teleprompt_choice', '')}: {tp_res.get('teleprompt_tokens_per_call', 0)} tokens/call, "
+            f"{tp_res.get('teleprompt_token_overhead', 0):+d} vs. no demos"
+        )
+        st.dataframe(pd.DataFrame(candidates), use_container_width=True, hide_index=True)
+    
+    # Detailed results
+    st.markdown("## Results")
+    tabs = st.tabs(list(variants.keys()))
+    for tab, (label, res) in zip(tabs, variants.items()):
+        with tab:
+            st.markdown(f"### {label}")
+            st.markdown("**Meta Summary**")
+            st.info(res.get("meta", ""))
+            st.markdown("**Summary**")
+            st.markdown(res.get("summary", ""))
+            with st.expander("Notes"):
+                st.text(res.get("structured", ""))
+            with st.expander("Critic"):
+                st.text(res.get("critic", ""))
+
 
 # Main tabs
-tab_analyse, tab_vergleich, tab_teleprompt = st.tabs(["Analysis", "Compare", "DSPy Optimization"])
+tab_analyse, tab_vergleich, tab_teleprompt, tab_library = st.tabs(["Analysis", "Compare", "DSPy Optimization", "Library"])
 
 # Tab 1: Analysis
 with tab_analyse:
@@ -229,170 +742,68 @@ with tab_analyse:
     
     st.markdown("---")
     
-    # Text processing
-    def extract_pdf_text(file_handle) -> str:
-        try:
-            import pdfplumber
-            try:
-                with pdfplumber.open(file_handle) as pdf:
-                    pages = [page.extract_text(x_tolerance=1, y_tolerance=1) or "" for page in pdf.pages]
-                    text = "\n\n".join(pages).strip()
-                    if text:
-                        return text
-            except Exception:
-                pass
-        except Exception:
-            pass
-        try:
-            reader = PdfReader(file_handle)
-            return "\n\n".join((page.extract_text() or "") for page in reader.pages).strip()
-        except Exception as e:
-            return f"[PDF error] {e}"
-    
-    def read_uploaded_files(files) -> str:
-        if not files:
-            return ""
-        text_chunks = []
-        for file in files:
-            try:
-                file_data = file.read()
-                if file.type == "application/pdf" or file.name.lower().endswith(".pdf"):
-                    text_chunks.append(extract_pdf_text(io.BytesIO(file_data)))
-                else:
-                    text_chunks.append(file_data.decode("utf-8", errors="ignore"))
-            except Exception as e:
-                text_chunks.append(f"[Error reading {file.name}: {e}]")
-        return "\n\n".join(chunk for chunk in text_chunks if chunk).strip()
-    
-    raw_text = read_uploaded_files(uploaded_files)
-    analysis_context = ""
-    
-    if raw_text:
-        analysis_context = build_analysis_context(raw_text, config)
+    # Ein Kontext pro Datei: mehrere Paper laufen als eigene Jobs gleichzeitig,
+    # Gesamtzeit richtet sich nach größtem Paper statt nach Summe
+    paper_contexts = load_paper_contexts(uploaded_files, config)
+    # Exakt per Hash, sonst Near-Duplicate per LSH. Millisekunden, Ergebnis steht im Library-Tab.
+    for name, context in paper_contexts.items():
+        prior = find_prior_analysis(PIPELINE_ENGINES[pipeline_mode], context, config, _cached_signature(context))
+        if prior is not None:
+            analysed_on = time.strftime("%Y-%m-%d %H:%M", time.localtime(prior["created"]))
+            match = "already analysed" if prior["similarity"] >= 1.0 else f"{prior['similarity']:.0%} similar to '{prior['title']}', analysed"
+            action = "stored result will be reused" if config["reuse_prior_analyses"] else "see Library tab"
+            st.caption(f"{name}: {match} with {pipeline_mode} / {prior['model']} on {analysed_on}, {action}")
     
     # Analyze button
     if st.button("Analyze", type="primary", use_container_width=True, disabled=not uploaded_files):
-        if not analysis_context.strip():
+        if not paper_contexts:
             st.error("Please upload a file first!")
         else:
-            pipeline_result = None
-            try:
-                with st.status("Analyzing document", expanded=True) as status:
-                    if pipeline_mode == "LangChain":
-                        status.update(label="Running LangChain", state="running")
-                        pipeline_result = run_lc(analysis_context, config)
-                    elif pipeline_mode == "LangGraph":
-                        status.update(label="Running LangGraph", state="running")
-                        pipeline_result = run_lg(analysis_context, config)
-                    else:
-                        status.update(label="Running DSPy", state="running")
-                        if use_dspy_teleprompt:
-                            status.update(label="Optimizing with Teleprompting...", state="running")
-                        pipeline_result = run_dspy(analysis_context, config)
-                    
-                    status.update(label="Analysis complete!", state="complete")
-                
-                # Results
-                if pipeline_result:
-                    st.markdown("## Results")
-                    
-                    # Metrics
-                    col_meta1, col_meta2, col_meta3, col_meta4 = st.columns(4)
-                    with col_meta1:
-                        st.metric("Total Time", f"{pipeline_result.get('latency_s', 0):.2f}s", help="Total execution time for the entire pipeline in seconds")
-                    with col_meta2:
-                        summary_len = len(pipeline_result.get("summary", "") or "")
-                        st.metric("Summary Length", f"{summary_len:,} chars", help="Number of characters in the generated summary")
-                    with col_meta3:
-                        meta_len = len(pipeline_result.get("meta", "") or "")
-                        st.metric("Meta Length", f"{meta_len:,} chars", help="Number of characters in the meta summary (final integrated summary)")
-                    with col_meta4:
-                        loops = int(pipeline_result.get("critic_loops", 0) or 0)
-                        st.metric("Critic Loops", str(loops), help="How many times LangGraph routed back to Summarizer due low critic score (LangGraph only).")
-
-                    execution_trace = pipeline_result.get("execution_trace", []) or []
-                    trace_set = {str(x).lower() for x in execution_trace if x}
-                    agent_lines = []
-                    for key, label in (
-                        ("reader", "Reader"),
-                        ("summarizer", "Summarizer"),
-                        ("critic", "Critic"),
-                        ("integrator", "Integrator"),
-                    ):
-                        status_text = "visited" if key in trace_set else "not visited"
-                        agent_lines.append(f"{label} - {status_text}")
-
-                    with st.expander("Execution Trace", expanded=True):
-                        st.markdown("\n".join(f"- {line}" for line in agent_lines))
-                        if pipeline_mode == "LangGraph":
-                            looped = "YES" if int(pipeline_result.get("critic_loops", 0) or 0) > 0 else "NO"
-                            routing = pipeline_result.get("routing_trace", []) or []
-                            branch = (routing[-1] if routing else "n/a").upper()
-                            st.markdown(f"LangGraph looped: **{looped}**")
-                            st.markdown(f"LangGraph branch: **{branch}**")
-                    
-                    # Meta Summary
-                    if pipeline_result.get("meta"):
-                        st.markdown("### Meta Summary")
-                        st.info(pipeline_result.get("meta"))
-                        confidence_line = pipeline_result.get("confidence") or extract_confidence_line(pipeline_result.get("meta", ""))
-                        if confidence_line:
-                            st.caption(confidence_line)
-                        else:
-                            st.caption("Confidence: not provided")
-
-                    # Summary
-                    if pipeline_result.get("summary"):
-                        st.markdown("### Summary")
-                        st.markdown(pipeline_result.get("summary"))
-                    
-                    # Timing
-                    st.markdown("### Timing")
-                    times = {
-                        "Reader": pipeline_result.get('reader_s', 0),
-                        "Results Extractor": pipeline_result.get('results_extractor_s', 0),
-                        "Summarizer": pipeline_result.get('summarizer_s', 0),
-                        "Critic": pipeline_result.get('critic_s', 0),
-                        "Integrator": pipeline_result.get('integrator_s', 0),
-                    }
-                    cols = st.columns(len(times))
-                    for col, (key, value) in zip(cols, times.items()):
-                        with col:
-                            st.metric(key, f"{value:.2f}s")
-                    
-                    # Notes & Critic
-                    col_notes, col_critic = st.columns(2)
-                    with col_notes:
-                        if pipeline_result.get("structured"):
-                            with st.expander("Notes", expanded=False):
-                                st.code(pipeline_result.get("structured"), language="")
-                    
-                    with col_critic:
-                        if pipeline_result.get("critic"):
-                            with st.expander("Critic", expanded=False):
-                                st.code(pipeline_result.get("critic"), language="")
-                    
-                    # Graph (only LangGraph)
-                    graph_dot = pipeline_result.get("graph_dot")
-                    if graph_dot and pipeline_mode == "LangGraph":
-                        st.markdown("### Workflow Graph")
-                        st.graphviz_chart(graph_dot, use_container_width=True)
-                    
-                    # Download
-                    st.markdown("### Export")
-                    st.download_button(
-                        "Download as JSON",
-                        data=json.dumps(pipeline_result, ensure_ascii=False, indent=2),
-                        file_name=f"paper_analysis_{pipeline_mode.lower()}_{int(time.time())}.json",
-                        mime="application/json",
-                        use_container_width=True,
+            st.session_state["analysis_job"] = {
+                "ids": {name: submit_pipeline_job(pipeline_mode, context, config).id for name, context in paper_contexts.items()},
+                "mode": pipeline_mode,
+                "synthesis": bool(use_synthesis) and len(paper_contexts) > 1,
+                "config": copy.deepcopy(config),
+            }
+    
+    # Ergebnis kommt aus Session, nicht aus Button-Handler: bleibt bei jedem Rerun stehen
+    analysis_job = st.session_state.get("analysis_job")
+    if analysis_job:
+        paper_jobs = {name: get_job_queue().get(job_id) for name, job_id in analysis_job["ids"].items()}
+        if any(job is None for job in paper_jobs.values()):
+            st.session_state.pop("analysis_job", None)
+        elif jobs_running(list(analysis_job["ids"].values())):
+            poll_jobs(list(analysis_job["ids"].values()), f"Running {analysis_job['mode']}")
+        else:
+            paper_results = {name: job.result for name, job in paper_jobs.items() if job.status == "done" and job.result}
+            if analysis_job["synthesis"] and len(paper_results) > 1:
+                # Reduce erst, wenn alle Paper fertig sind. ID merken: fehlgeschlagene
+                # Synthese soll nicht bei jedem Rerun neu starten.
+                synthesis_job = get_job_queue().get(analysis_job.get("synthesis_id"))
+                if synthesis_job is None:
+                    synthesis_job = submit_synthesis_job(paper_results, analysis_job["config"])
+                    analysis_job["synthesis_id"] = synthesis_job.id
+                if not synthesis_job.is_finished:
+                    poll_jobs([synthesis_job.id], "Synthesizing papers")
+                elif synthesis_job.status == "error":
+                    st.error(f"Cross-paper synthesis failed: {synthesis_job.error}")
+                    if show_debug:
+                        st.code(synthesis_job.error_trace, language="python")
+                else:
+                    st.markdown("## Cross-Paper Synthesis")
+                    st.caption(
+                        f"{len(synthesis_job.result['papers'])} papers, {synthesis_job.result['calls']} call(s) "
+                        f"in {synthesis_job.result['levels']} level(s), {synthesis_job.result['latency_s']:.2f}s"
                     )
-                elif pipeline_result is None:
-                    st.error("Analysis failed. No results received.")
-            except Exception as e:
-                st.error(f"Analysis failed: {str(e)}")
-                if show_debug:
-                    st.exception(e)
+                    st.info(synthesis_job.result["synthesis"])
+            
+            if len(paper_jobs) == 1:
+                render_analysis_job(next(iter(paper_jobs.values())), analysis_job["mode"])
+            else:
+                paper_tabs = st.tabs(list(paper_jobs.keys()))
+                for paper_tab, (name, job) in zip(paper_tabs, paper_jobs.items()):
+                    with paper_tab:
+                        render_analysis_job(job, analysis_job["mode"], name)
 
 # Tab 2: Compare
 with tab_vergleich:
@@ -406,8 +817,7 @@ with tab_vergleich:
         key="compare_upload",
     )
     
-    raw_text_compare = read_uploaded_files(uploaded_files_compare) if uploaded_files_compare else ""
-    analysis_context_compare = build_analysis_context(raw_text_compare, config) if raw_text_compare else ""
+    analysis_context_compare = load_analysis_context(uploaded_files_compare, config)
     
     if analysis_context_compare:
         st.success(f"{len(analysis_context_compare):,} characters loaded")
@@ -416,131 +826,40 @@ with tab_vergleich:
         if not analysis_context_compare.strip():
             st.error("Please upload a file first!")
         else:
-            with st.status("Comparing pipelines", expanded=True) as status:
-                results = {}
-                errors = {}
-                pipelines = [
-                    ("LangChain", lambda: run_lc(analysis_context_compare, config)),
-                    ("LangGraph", lambda: run_lg(analysis_context_compare, config)),
-                    ("DSPy", lambda: run_dspy(analysis_context_compare, config)),
-                ]
-                
-                for label, runner in pipelines:
-                    try:
-                        status.update(label=f"Running {label}")
-                        results[label] = runner()
-                    except Exception as exc:
-                        import traceback
-                        error_msg = str(exc)
-                        error_trace = traceback.format_exc()
-                        errors[label] = error_msg
-                        results[label] = {
-                            "meta": f"Error: {error_msg}",
-                            "summary": "",
-                            "structured": "",
-                            "critic": "",
-                            "latency_s": 0.0,
-                            "reader_s": 0.0,
-                            "summarizer_s": 0.0,
-                            "critic_s": 0.0,
-                            "integrator_s": 0.0,
-                        }
-                        if show_debug:
-                            st.error(f"{label} error: {error_trace}")
-                
-                status.update(label="Comparison complete!", state="complete")
-            
-            # Comparison table
-            st.markdown("## Comparison Table")
-            table_rows = []
-            for label, res in results.items():
-                table_rows.append({
-                    "Pipeline": label,
-                    "Total (s)": f"{res.get('latency_s', 0.0):.2f}",
-                    "Reader (s)": f"{res.get('reader_s', 0.0):.2f}",
-                    "Summarizer (s)": f"{res.get('summarizer_s', 0.0):.2f}",
-                    "Critic (s)": f"{res.get('critic_s', 0.0):.2f}",
-                    "Summary (chars)": len(res.get("summary", "") or ""),
-                    "Meta (chars)": len(res.get("meta", "") or ""),
-                })
-            
-            df = pd.DataFrame(table_rows)
-            st.dataframe(df, use_container_width=True, hide_index=True)
-            
-            # Runtime Comparison
-            if not df.empty:
-                st.markdown("### Runtime Comparison")
-                chart_df = pd.DataFrame([
-                    {
-                        "Pipeline": row["Pipeline"],
-                        "Runtime": float(row["Total (s)"])
-                    }
-                    for row in table_rows
-                ])
-                chart = (
-                    alt.Chart(chart_df)
-                    .mark_bar(size=50)
-                    .encode(
-                        x=alt.X("Pipeline:N", title="Pipeline", sort=None),
-                        y=alt.Y("Runtime:Q", title="Runtime (seconds)"),
-                        color=alt.Color("Pipeline:N", legend=None),
-                        tooltip=["Pipeline", "Runtime"]
-                    )
-                    .properties(height=300)
-                )
-                st.altair_chart(chart, use_container_width=True)
-            
-            # Key Metrics
-            st.markdown("### Key Metrics")
-            if len(table_rows) >= 3:
-                fastest = min(table_rows, key=lambda x: float(x["Total (s)"]))
-                longest_summary = max(table_rows, key=lambda x: int(x["Summary (chars)"]))
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Fastest Pipeline", fastest["Pipeline"], f"{fastest['Total (s)']}s")
-                with col2:
-                    st.metric("Longest Summary", longest_summary["Pipeline"], f"{int(longest_summary['Summary (chars)']):,} chars")
-                with col3:
-                    avg_time = sum(float(r["Total (s)"]) for r in table_rows) / len(table_rows)
-                    st.metric("Average Runtime", f"{avg_time:.2f}s")
-            
-            # Detailed results
-            st.markdown("## Detailed Results")
-            tabs = st.tabs(list(results.keys()))
-            for tab, label in zip(tabs, results.keys()):
-                res = results[label]
-                with tab:
-                    if label == "DSPy" and not DSPY_READY:
-                        st.warning("DSPy not installed. Install `dspy-ai` and `litellm` for full functionality.")
-                    if errors.get(label):
-                        st.error(f"**Error in {label}:** {errors[label]}")
-                        if show_debug:
-                            import traceback
-                            st.code(traceback.format_exc(), language="python")
-
-                    execution_trace = res.get("execution_trace", []) or []
-                    if execution_trace:
-                        with st.expander("Execution Trace", expanded=False):
-                            st.markdown("\n".join(f"- {t}" for t in execution_trace))
-                    
-                    # Graph for LangGraph
-                    if label == "LangGraph":
-                        graph_dot = res.get("graph_dot")
-                        if graph_dot:
-                            st.markdown("### Workflow Graph")
-                            st.graphviz_chart(graph_dot, use_container_width=True)
-                    
-                    st.markdown("**Meta Summary**")
-                    st.info(res.get("meta", ""))
-                    
-                    st.markdown("**Summary**")
-                    st.markdown(res.get("summary", ""))
-                    
-                    with st.expander("Notes"):
-                        st.text(res.get("structured", ""))
-                    
-                    with st.expander("Critic"):
-                        st.text(res.get("critic", ""))
+            # Alle drei parallel in der Job-Queue: identische Reader-Calls von
+            # LangChain und LangGraph werden im LLM-Layer zusammengefasst.
+            st.session_state["compare_jobs"] = {
+                label: submit_pipeline_job(label, analysis_context_compare, config).id
+                for label in PIPELINE_ENGINES
+            }
+    
+    compare_jobs = st.session_state.get("compare_jobs")
+    if compare_jobs:
+        if jobs_running(list(compare_jobs.values())):
+            poll_jobs(list(compare_jobs.values()), "Comparing pipelines")
+        else:
+            results = {}
+            errors = {}
+            error_traces = {}
+            for label, job_id in compare_jobs.items():
+                job = get_job_queue().get(job_id)
+                if job is not None and job.status == "done":
+                    results[label] = job.result
+                    continue
+                errors[label] = job.error if job is not None else "Result expired, please run again."
+                error_traces[label] = job.error_trace if job is not None else ""
+                results[label] = {
+                    "meta": f"Error: {errors[label]}",
+                    "summary": "",
+                    "structured": "",
+                    "critic": "",
+                    "latency_s": 0.0,
+                    "reader_s": 0.0,
+                    "summarizer_s": 0.0,
+                    "critic_s": 0.0,
+                    "integrator_s": 0.0,
+                }
+            render_comparison(results, errors, error_traces)
 
 # Tab 3: DSPy Teleprompt
 with tab_teleprompt:
@@ -557,8 +876,7 @@ with tab_teleprompt:
             key="teleprompt_upload",
         )
         
-        raw_text_tp = read_uploaded_files(uploaded_files_tp) if uploaded_files_tp else ""
-        analysis_context_tp = build_analysis_context(raw_text_tp, config) if raw_text_tp else ""
+        analysis_context_tp = load_analysis_context(uploaded_files_tp, config)
         
         if analysis_context_tp:
             st.success(f"{len(analysis_context_tp):,} characters loaded")
@@ -567,82 +885,33 @@ with tab_teleprompt:
             if not analysis_context_tp.strip():
                 st.error("Please upload a file first!")
             else:
-                def _tokens(s: str) -> set[str]:
-                    import re
-                    s = (s or "").lower()
-                    s = re.sub(r"[^a-z0-9\s]", " ", s)
-                    return {t for t in s.split() if len(t) > 2}
-                
-                def _f1(gold: str, pred: str) -> float:
-                    G = _tokens(gold)
-                    P = _tokens(pred)
-                    if not G or not P:
-                        return 0.0
-                    inter = len(G & P)
-                    prec = inter / len(P)
-                    rec = inter / len(G)
-                    return 0.0 if (prec + rec) == 0 else (2 * prec * rec) / (prec + rec)
-                
-                base_cfg = copy.deepcopy(config)
-                base_cfg["dspy_teleprompt"] = False
-                tp_cfg = copy.deepcopy(config)
-                tp_cfg["dspy_teleprompt"] = True
-                
-                with st.status("Running DSPy (Base vs. Teleprompt)...", expanded=True) as status:
-                    try:
-                        status.update(label="Base version...")
-                        res_base = run_dspy(analysis_context_tp, base_cfg)
-                        status.update(label="Teleprompt version...")
-                        res_tp = run_dspy(analysis_context_tp, tp_cfg)
-                        status.update(label="Comparison complete!", state="complete")
-                    except Exception as e:
-                        status.update(label=f"Error: {e}", state="error")
-                        st.error(str(e))
-                        res_base = res_tp = None
-                
-                if res_base and res_tp:
-                    # Comparison table
-                    st.markdown("## Comparison")
-                    rows = []
-                    for label, res in (("Base", res_base), ("Teleprompt", res_tp)):
-                        f1 = _f1(analysis_context_tp, res.get("summary", "") or "")
-                        rows.append({
-                            "Variant": label,
-                            "Runtime (s)": f"{res.get('latency_s', 0.0):.2f}",
-                            "Summary Length": len(res.get("summary", "") or ""),
-                            "Meta Length": len(res.get("meta", "") or ""),
-                            "F1 Score": f"{f1:.3f}",
-                        })
-                    df_gain = pd.DataFrame(rows)
-                    st.dataframe(df_gain, use_container_width=True, hide_index=True)
-                    
-                    if len(df_gain) == 2:
-                        f1_base = float(df_gain.iloc[0]["F1 Score"])
-                        f1_tp = float(df_gain.iloc[1]["F1 Score"])
-                        gain = f1_tp - f1_base
-                        if gain > 0:
-                            st.success(f"Teleprompt F1 Gain: +{gain:.3f}")
-                        else:
-                            st.info(f"Teleprompt F1 Gain: {gain:.3f}")
-                    
-                    # Detailed results
-                    st.markdown("## Results")
-                    tabs = st.tabs(["Base", "Teleprompt"])
-                    for tab, (label, res) in zip(tabs, (("Base", res_base), ("Teleprompt", res_tp))):
-                        with tab:
-                            st.markdown(f"### {label}")
-                            st.markdown("**Meta Summary**")
-                            st.info(res.get("meta", ""))
-                            st.markdown("**Summary**")
-                            st.markdown(res.get("summary", ""))
-                            with st.expander("Notes"):
-                                st.text(res.get("structured", ""))
-                            with st.expander("Critic"):
-                                st.text(res.get("critic", ""))
+                job = get_job_queue().submit(
+                    "DSPy Base vs. Teleprompt",
+                    run_teleprompt_comparison,
+                    analysis_context_tp,
+                    copy.deepcopy(config),
+                    key=request_key("teleprompt", analysis_context_tp, config),
+                )
+                st.session_state["teleprompt_job"] = job.id
+        
+        teleprompt_job = get_job_queue().get(st.session_state.get("teleprompt_job"))
+        if teleprompt_job is not None:
+            if not teleprompt_job.is_finished:
+                poll_jobs([teleprompt_job.id], "Running DSPy (Base vs. Teleprompt)...")
+            elif teleprompt_job.status == "error":
+                st.error(teleprompt_job.error)
+                if show_debug:
+                    st.code(teleprompt_job.error_trace, language="python")
+            else:
+                render_teleprompt_comparison(teleprompt_job.result)
 
 # CSV Telemetry
 st.markdown("---")
-with st.expander("CSV Telemetry Data", expanded=False):
+# Toggle statt Expander: Expander-Inhalt läuft bei jedem Rerun mit, pandas und altair auch
+if st.toggle("Show CSV Telemetry Data", value=False):
+    import altair as alt
+    import pandas as pd
+
     telemetry_path = "telemetry.csv"
     if not os.path.exists(telemetry_path):
         st.info("No telemetry data yet. Run a pipeline to start logging metrics.")
@@ -732,3 +1001,30 @@ with st.expander("CSV Telemetry Data", expanded=False):
                 st.info("No data yet. Run a pipeline to start logging metrics.")
         except Exception as e:
             st.error(f"Could not load telemetry: {e}")
+
+# Tab 4: Library
+with tab_library:
+    st.markdown("### Library")
+    st.info("Every finished analysis is stored with notes, summary, critic and meta summary. Search runs on a local full-text index, no pipeline involved.")
+    
+    corpus_index = get_corpus_index(config)
+    if corpus_index is None:
+        st.warning("Corpus index is disabled (corpus_index=False).")
+    else:
+        library_query = st.text_input("Search", key="library_query", placeholder="e.g. retrieval augmented F1")
+        search_started = time.perf_counter()
+        library_hits = corpus_index.search(library_query, limit=20)
+        search_ms = (time.perf_counter() - search_started) * 1000
+        st.caption(f"{len(library_hits)} of {corpus_index.count():,} stored runs in {search_ms:.1f} ms")
+        for hit in library_hits:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit["created"]))
+            with st.expander(f"{hit['title'] or 'Untitled'} · {hit['engine']} · {hit['model']} · {created}"):
+                if hit["snippet"]:
+                    st.markdown(hit["snippet"])
+                st.markdown("**Meta Summary**")
+                st.info(hit["meta"])
+                st.markdown("**Summary**")
+                st.markdown(hit["summary"])
+                st.markdown("**Notes**")
+                st.text(hit["notes"])
+                st.caption(f"Document hash {hit['doc_hash']}")
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from coalescing import request_key
+from tracing import current_span
+
+# Standardort neben pdf_text-Cache. Per Env oder Config (step_cache_path) änderbar.
+_DEFAULT_PATH = os.getenv(
+    "STEP_CACHE_PATH",
+    str(Path(__file__).resolve().parent.parent / "local_cache" / "steps.sqlite"),
+)
+
+
+class StepCache:
+    """
+    Kleiner Key-Value-Store auf SQLite für Zwischenergebnisse.
+
+    Eine Verbindung pro Zugriff statt geteilter Verbindung. sqlite3-Objekte
+    dürfen nicht zwischen Threads wandern, und mehrere Prozesse können so
+    dieselbe Datei nutzen. WAL erlaubt Lesen während geschrieben wird.
+    Werte sind JSON.
+    """
+
+    def __init__(self, path: str = _DEFAULT_PATH):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS steps ("
+                        "key TEXT PRIMARY KEY, step TEXT, value TEXT, created REAL)"
+                    )
+                    connection.commit()
+                    self._ready = True
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            connection = self._connect()
+            try:
+                row = connection.execute("SELECT value FROM steps WHERE key = ?", (key,)).fetchone()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            # Cache kaputt oder gesperrt: dann eben neu rechnen
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, step: str, value: Any) -> None:
+        try:
+            connection = self._connect()
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO steps (key, step, value, created) VALUES (?, ?, ?, ?)",
+                    (key, step, json.dumps(value, ensure_ascii=False), time.time()),
+                )
+                connection.commit()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            pass
+
+
+_caches: Dict[str, StepCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_step_cache(config: Optional[dict] = None) -> Optional[StepCache]:
+    """Cache für Config. None, wenn step_cache=False."""
+    config_dict = config or {}
+    if not config_dict.get("step_cache", True):
+        return None
+    path = config_dict.get("step_cache_path") or _DEFAULT_PATH
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = StepCache(path)
+            _caches[path] = cache
+        return cache
+
+
+def prompt_fingerprint(prompt: Any) -> str:
+    """Kurzer Hash über Prompt-Text (ChatPromptTemplate oder String)."""
+    text = prompt.pretty_repr() if hasattr(prompt, "pretty_repr") else str(prompt)
+    return request_key(text)[:16]
+
+
+def step_key(step: str, inputs: Dict[str, Any], settings: Dict[str, Any], fingerprint: str = "") -> str:
+    """
+    Schlüssel für einen Schritt: Eingaben + Einstellungen dieses Schritts.
+
+    fingerprint ist Prompt (oder DSPy-Signature mit Demos). Ändert jemand
+    den Prompt, passt der alte Eintrag nicht mehr.
+    """
+    return request_key("step", step, inputs, settings, fingerprint)
+
+
+def _sampled(settings: Dict[str, Any]) -> bool:
+    """temperature > 0: Ergebnis ist Stichprobe, nicht Funktion der Eingaben."""
+    try:
+        return float(settings.get("temperature") or 0) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def run_step(
+    config: Optional[dict],
+    step: str,
+    inputs: Dict[str, Any],
+    settings: Dict[str, Any],
+    function: Callable[[], Any],
+    fingerprint: str = "",
+) -> Tuple[Any, bool]:
+    """
+    Führt Schritt aus oder holt Ergebnis aus Cache. Gibt (Wert, hit) zurück.
+
+    Gleiche Eingaben und gleiche Einstellungen liefern gespeichertes
+    Ergebnis. Ändert sich nur, was spätere Schritte betrifft (Critic-Prompt,
+    precritic, Integrator-Einstellungen), laufen frühere nicht neu. Treffer landen als "step_cached" am
+    aktuellen Span. Timeouts ("__TIMEOUT__") werden nicht gespeichert.
+
+    Bei temperature > 0 weder lesen noch schreiben, wie llm._cacheable.
+    Sonst liefert jeder Lauf dieselbe Stichprobe.
+    """
+    cache = get_step_cache(config)
+    if cache is None or _sampled(settings):
+        return function(), False
+    key = step_key(step, inputs, settings, fingerprint)
+    cached = cache.get(key)
+    if cached is not None:
+        step_span = current_span()
+        if step_span is not None:
+            step_span.set_attribute("step_cached", 1)
+        return cached, True
+    value = function()
+    if value != "__TIMEOUT__":
+        cache.put(key, step, value)
+    return value, False
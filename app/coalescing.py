@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+def request_key(*parts: Any) -> str:
+    """
+    Stabiler Schlüssel für (Prompt, Modell, Parameter).
+
+    JSON mit sort_keys, damit gleiche Dicts gleichen Hash ergeben.
+    default=str fängt Message-Objekte und andere Nicht-JSON-Typen ab.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.followers = 0
+
+
+class InflightCoalescer:
+    """
+    Fasst identische, gleichzeitig laufende Requests zusammen ("single flight").
+
+    Erster Aufrufer mit einem Schlüssel macht echten Upstream-Call. Wer
+    während dessen mit gleichem Schlüssel kommt, wartet und bekommt dasselbe
+    Ergebnis (oder denselben Fehler). Nach Abschluss wird Eintrag entfernt.
+    Das ist kein Cache: spätere Aufrufe gehen wieder upstream.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.saved_calls = 0
+
+    def run(self, key: str, function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Gibt (Ergebnis, coalesced) zurück. coalesced=True heißt: kein eigener Upstream-Call."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.followers += 1
+                self.saved_calls += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+            return call.result, False
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+_coalescer = InflightCoalescer()
+
+
+def get_coalescer() -> InflightCoalescer:
+    return _coalescer
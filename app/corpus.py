@@ -0,0 +1,334 @@
+"""
+Korpus aller analysierten Paper.
+
+Jeder erfolgreiche Lauf landet hier mit Notes, Summary, Critic und Meta
+Summary. Schlüssel: Dokument-Hash (Analyse-Kontext), Engine, Modell.
+Neuer Lauf mit gleichem Schlüssel ersetzt alten. Volltextsuche über
+SQLite FTS5, Lookup per Primärschlüssel. Beides in Millisekunden, auch
+bei tausenden Läufen, und ohne Pipeline.
+
+Fast gleiche Dokumente (arXiv v2, andere PDF-Extraktion) findet
+find_similar() über MinHash-Signaturen und LSH-Buckets (fingerprint.py).
+Mit reuse_prior_analyses=True liefert run_engine() dann das alte Ergebnis.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from document import text_hash
+from fingerprint import lsh_buckets, signature as document_signature, similarity
+from utils import read_title
+
+# Neben dem Step-Cache. Per Env oder Config (corpus_index_path) änderbar.
+_DEFAULT_PATH = os.getenv(
+    "CORPUS_INDEX_PATH",
+    str(Path(__file__).resolve().parent.parent / "local_cache" / "corpus.sqlite"),
+)
+
+# External-Content-Tabelle: Text liegt einmal in papers, FTS hält nur den Index.
+# Trigger halten beide synchron, auch bei Upsert.
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS papers ("
+    "id INTEGER PRIMARY KEY, doc_hash TEXT NOT NULL, engine TEXT NOT NULL, model TEXT NOT NULL, "
+    "title TEXT, notes TEXT, summary TEXT, critic TEXT, meta TEXT, result TEXT, "
+    "input_chars INTEGER, latency_s REAL, created REAL, signature TEXT, "
+    "UNIQUE (doc_hash, engine, model))",
+    "CREATE INDEX IF NOT EXISTS papers_created ON papers (created)",
+    # LSH: ein Eintrag pro Band. Gleicher Bucket in irgendeinem Band heißt Kandidat.
+    "CREATE TABLE IF NOT EXISTS papers_lsh ("
+    "band INTEGER NOT NULL, bucket TEXT NOT NULL, paper_id INTEGER NOT NULL, "
+    "PRIMARY KEY (band, bucket, paper_id)) WITHOUT ROWID",
+    "CREATE TRIGGER IF NOT EXISTS papers_lsh_ad AFTER DELETE ON papers BEGIN "
+    "DELETE FROM papers_lsh WHERE paper_id = old.id; END",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5("
+    "title, notes, summary, meta, content='papers', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN "
+    "INSERT INTO papers_fts (rowid, title, notes, summary, meta) "
+    "VALUES (new.id, new.title, new.notes, new.summary, new.meta); END",
+    "CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN "
+    "INSERT INTO papers_fts (papers_fts, rowid, title, notes, summary, meta) "
+    "VALUES ('delete', old.id, old.title, old.notes, old.summary, old.meta); END",
+    "CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN "
+    "INSERT INTO papers_fts (papers_fts, rowid, title, notes, summary, meta) "
+    "VALUES ('delete', old.id, old.title, old.notes, old.summary, old.meta); "
+    "INSERT INTO papers_fts (rowid, title, notes, summary, meta) "
+    "VALUES (new.id, new.title, new.notes, new.summary, new.meta); END",
+)
+
+_ENTRY_COLUMNS = "doc_hash, engine, model, title, notes, summary, critic, meta, input_chars, latency_s, created"
+_QUERY_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts_query(query: str) -> str:
+    """
+    Freitext zu FTS5-Ausdruck. Jedes Wort in Anführungszeichen, alle müssen
+    vorkommen, letztes als Präfix (Suche beim Tippen). Kein FTS-Syntaxfehler
+    bei Eingaben wie "F1-score" oder "(RAG".
+    """
+    tokens = _QUERY_TOKEN_PATTERN.findall(query or "")
+    if not tokens:
+        return ""
+    return " ".join(f'"{token}"' for token in tokens[:-1]) + (" " if len(tokens) > 1 else "") + f'"{tokens[-1]}"*'
+
+
+class CorpusIndex:
+    """
+    Analyse-Ergebnisse auf SQLite, wie StepCache: Verbindung pro Zugriff,
+    WAL für paralleles Lesen, mehrere Prozesse auf derselben Datei.
+    Fehler beim Schreiben brechen keinen Lauf ab.
+    """
+
+    def __init__(self, path: str = _DEFAULT_PATH):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    columns = {row[1] for row in connection.execute("PRAGMA table_info(papers)")}
+                    if columns and "signature" not in columns:
+                        # Index aus Version ohne Near-Duplicates: Spalte nachziehen
+                        connection.execute("ALTER TABLE papers ADD COLUMN signature TEXT")
+                    for statement in _SCHEMA:
+                        connection.execute(statement)
+                    connection.commit()
+                    self._ready = True
+        return connection
+
+    def add(
+        self, doc_hash: str, engine: str, model: str, result: Dict[str, Any], signature: Optional[List[int]] = None,
+    ) -> None:
+        notes = str(result.get("structured") or "")
+        summary = str(result.get("summary") or "")
+        meta = str(result.get("meta") or "")
+        try:
+            connection = self._connect()
+            try:
+                connection.execute(
+                    "INSERT INTO papers (doc_hash, engine, model, title, notes, summary, critic, meta, result, "
+                    "input_chars, latency_s, created, signature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (doc_hash, engine, model) DO UPDATE SET "
+                    "title = excluded.title, notes = excluded.notes, summary = excluded.summary, "
+                    "critic = excluded.critic, meta = excluded.meta, result = excluded.result, "
+                    "input_chars = excluded.input_chars, latency_s = excluded.latency_s, created = excluded.created, "
+                    "signature = excluded.signature",
+                    (
+                        doc_hash, engine, model,
+                        read_title(notes) or read_title(meta) or read_title(summary),
+                        notes, summary, str(result.get("critic") or ""), meta,
+                        # graph_dot ist Darstellung, kein Ergebnis
+                        json.dumps({k: v for k, v in result.items() if k != "graph_dot"}, ensure_ascii=False, default=str),
+                        int(result.get("input_chars") or 0),
+                        float(result.get("latency_s") or 0.0),
+                        time.time(),
+                        json.dumps(signature) if signature else None,
+                    ),
+                )
+                paper_id = connection.execute(
+                    "SELECT id FROM papers WHERE doc_hash = ? AND engine = ? AND model = ?", (doc_hash, engine, model)
+                ).fetchone()[0]
+                connection.execute("DELETE FROM papers_lsh WHERE paper_id = ?", (paper_id,))
+                connection.executemany(
+                    "INSERT OR IGNORE INTO papers_lsh (band, bucket, paper_id) VALUES (?, ?, ?)",
+                    [(band, bucket, paper_id) for band, bucket in lsh_buckets(signature or [])],
+                )
+                connection.commit()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            pass
+
+    def get(self, doc_hash: str, engine: Optional[str] = None, model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Letzter Lauf für Dokument, optional nur für Engine/Modell. Mit vollem Ergebnis unter "result"."""
+        sql = f"SELECT {_ENTRY_COLUMNS}, result FROM papers WHERE doc_hash = ?"
+        params: List[Any] = [doc_hash]
+        if engine:
+            sql += " AND engine = ?"
+            params.append(engine)
+        if model:
+            sql += " AND model = ?"
+            params.append(model)
+        rows = self._query(sql + " ORDER BY created DESC LIMIT 1", params)
+        if not rows:
+            return None
+        entry = dict(rows[0])
+        entry["result"] = json.loads(entry["result"] or "{}")
+        return entry
+
+    def find_similar(
+        self,
+        signature: Optional[List[int]],
+        engine: Optional[str] = None,
+        model: Optional[str] = None,
+        threshold: float = 0.8,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Ähnlichster früherer Lauf ab threshold, mit "similarity" und vollem Ergebnis.
+
+        LSH liefert Kandidaten (gleicher Bucket in mindestens einem Band),
+        nur diese werden per Signatur verglichen. Kein Scan über alle Läufe.
+        """
+        buckets = lsh_buckets(signature or [])
+        if not buckets:
+            return None
+        sql = (
+            f"SELECT {_ENTRY_COLUMNS}, result, signature FROM papers WHERE id IN ("
+            "SELECT paper_id FROM papers_lsh WHERE "
+            + " OR ".join("(band = ? AND bucket = ?)" for _ in buckets) + ")"
+        )
+        params: List[Any] = [value for bucket in buckets for value in bucket]
+        if engine:
+            sql += " AND engine = ?"
+            params.append(engine)
+        if model:
+            sql += " AND model = ?"
+            params.append(model)
+        best: Optional[Dict[str, Any]] = None
+        for row in self._query(sql, params):
+            score = similarity(signature, json.loads(row["signature"] or "[]"))
+            if score >= threshold and (best is None or (score, row["created"]) > (best["similarity"], best["created"])):
+                best = {**dict(row), "similarity": score}
+        if best is not None:
+            best.pop("signature")
+            best["result"] = json.loads(best["result"] or "{}")
+        return best
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Volltextsuche über Titel, Notes, Summary und Meta Summary, beste
+        Treffer zuerst (BM25 von FTS5). Leere Suche: neueste Läufe.
+        """
+        expression = _fts_query(query)
+        if not expression:
+            return self.recent(limit)
+        return [dict(row) for row in self._query(
+            f"SELECT {', '.join('p.' + column.strip() for column in _ENTRY_COLUMNS.split(','))}, "
+            "snippet(papers_fts, -1, '**', '**', ' … ', 16) AS snippet "
+            "FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid "
+            "WHERE papers_fts MATCH ? ORDER BY bm25(papers_fts) LIMIT ?",
+            (expression, int(limit)),
+        )]
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._query(
+            f"SELECT {_ENTRY_COLUMNS}, '' AS snippet FROM papers ORDER BY created DESC LIMIT ?", (int(limit),)
+        )]
+
+    def count(self) -> int:
+        rows = self._query("SELECT COUNT(*) AS n FROM papers", ())
+        return int(rows[0]["n"]) if rows else 0
+
+    def _query(self, sql: str, params: Any) -> List[sqlite3.Row]:
+        try:
+            connection = self._connect()
+            try:
+                return connection.execute(sql, params).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            # Index kaputt oder gesperrt: leeres Ergebnis statt Absturz im UI
+            return []
+
+
+_indexes: Dict[str, CorpusIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_corpus_index(config: Optional[dict] = None) -> Optional[CorpusIndex]:
+    """Index für Config. None, wenn corpus_index=False."""
+    config_dict = config or {}
+    if not config_dict.get("corpus_index", True):
+        return None
+    path = config_dict.get("corpus_index_path") or _DEFAULT_PATH
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = CorpusIndex(path)
+            _indexes[path] = index
+        return index
+
+
+def document_key(input_text: str) -> str:
+    """Dokument-Hash wie im Index: Hash des Analyse-Kontexts, den die Engine bekommt."""
+    return text_hash(input_text)
+
+
+def near_duplicate_threshold(config: Optional[dict]) -> float:
+    """Ab dieser geschätzten Jaccard-Ähnlichkeit gilt Dokument als dasselbe Paper. 0.8 hält wenige Prozent geänderter Wörter aus."""
+    try:
+        return min(1.0, max(0.0, float((config or {}).get("near_duplicate_threshold", 0.8))))
+    except (TypeError, ValueError):
+        return 0.8
+
+
+def find_prior_analysis(
+    engine: str, input_text: str, config: Optional[dict], signature: Optional[List[int]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Früherer Lauf mit gleicher Engine und gleichem Modell für dieses Dokument.
+    Erst exakt per Hash (similarity 1.0), sonst ähnlichstes Dokument über LSH.
+    signature nur übergeben, wenn schon berechnet (UI cacht sie pro Text).
+    """
+    index = get_corpus_index(config)
+    if index is None:
+        return None
+    engine, model = engine.lower(), str((config or {}).get("model") or "")
+    exact = index.get(document_key(input_text), engine, model)
+    if exact is not None:
+        return {**exact, "similarity": 1.0}
+    return index.find_similar(
+        signature or document_signature(input_text), engine, model, near_duplicate_threshold(config)
+    )
+
+
+def reuse_prior_result(engine: str, input_text: str, config: Optional[dict]) -> Optional[Dict[str, Any]]:
+    """
+    Mit reuse_prior_analyses=True: Ergebnis eines früheren Laufs statt Pipeline.
+    "reused_from" im Ergebnis sagt, welches Dokument und wie ähnlich.
+    """
+    if not (config or {}).get("reuse_prior_analyses"):
+        return None
+    prior = find_prior_analysis(engine, input_text, config)
+    if prior is None:
+        return None
+    return {
+        **prior["result"],
+        "reused_from": {
+            "doc_hash": prior["doc_hash"],
+            "title": prior["title"],
+            "similarity": round(prior["similarity"], 3),
+            "created": prior["created"],
+        },
+    }
+
+
+def record_result(engine: str, input_text: str, config: Optional[dict], result: Dict[str, Any]) -> None:
+    """
+    Lauf ins Korpus schreiben. Nur Läufe mit Summary: Fehlerantworten
+    (leerer Input, DSPy nicht installiert) haben keine. Wiederverwendete
+    Ergebnisse auch nicht, die stehen schon drin.
+    """
+    index = get_corpus_index(config)
+    if index is None or not isinstance(result, dict) or not str(result.get("summary") or "").strip():
+        return
+    if result.get("reused_from"):
+        return
+    index.add(
+        document_key(input_text), engine.lower(), str((config or {}).get("model") or ""),
+        {"input_chars": len(input_text or ""), **result},
+        document_signature(input_text),
+    )
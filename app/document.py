@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Überschriften: "1 Introduction", "2.1 Method", "IV. Results", "A. Appendix", "Abstract"
+_HEADING_PATTERN = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVX]+\.|[A-Z]\.?(?:\d+)?)\s+[A-Z][^\n]{2,80}$")
+_HEADING_KEYWORDS = ("abstract", "introduction", "conclusion", "conclusions", "acknowledgments", "acknowledgements", "references", "bibliography")
+_REFERENCES_PATTERN = re.compile(r"\n\s*(references|bibliography)\s*\n", re.I)
+_TABLE_PATTERN = re.compile(r"^\s*table\s*\d+", re.I)
+_FIGURE_PATTERN = re.compile(r"^\s*(?:figure|fig\.)\s*\d+", re.I)
+_BODY_HEADING_PATTERN = re.compile(r"^(?:\d+\.?|[IVX]+\.)\s+[A-Z]|^introduction$", re.I)
+
+# Metadaten stehen im Kopf. Nie weiter als 200 Zeilen suchen.
+_HEAD_MAX_LINES = 200
+_INDEX_CACHE_SIZE = 32
+
+
+@dataclass(frozen=True)
+class Section:
+    """Abschnitt mit Zeichen-Offsets. start zeigt auf Überschrift, end exklusiv."""
+    heading: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class DocumentIndex:
+    """
+    Struktur eines Papers, einmal geparst.
+
+    Alle Positionen sind Zeichen-Offsets in genau dem Text, aus dem der
+    Index gebaut wurde. text_hash identifiziert diesen Text.
+    """
+    text_hash: str
+    length: int
+    sections: Tuple[Section, ...]
+    head_end: int
+    abstract: Optional[Tuple[int, int]] = None
+    references_start: Optional[int] = None
+    tables: Tuple[int, ...] = field(default_factory=tuple)
+    figures: Tuple[int, ...] = field(default_factory=tuple)
+
+    def section_at(self, offset: int) -> Optional[Section]:
+        for section in self.sections:
+            if section.start <= offset < section.end:
+                return section
+        return None
+
+
+def is_heading(line: str) -> bool:
+    """
+    Erkennt Abschnittsüberschriften in PDF-Text.
+
+    Nummerierte Überschriften, aber keine Sätze oder Aufzählungen. Darum
+    kein Satzzeichen am Ende und höchstens 12 Wörter. Nicht perfekt. Reicht
+    für Gewichtung und Chunking.
+    """
+    stripped = line.strip()
+    if not stripped or len(stripped) > 90:
+        return False
+    lowered = stripped.lower()
+    if lowered in _HEADING_KEYWORDS or lowered.startswith("appendix"):
+        return True
+    return bool(_HEADING_PATTERN.match(stripped)) and stripped[-1] not in ".?:,;" and len(stripped.split()) <= 12
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _build_index(text: str, digest: str) -> DocumentIndex:
+    headings: List[Tuple[str, int]] = []
+    tables: List[int] = []
+    figures: List[int] = []
+    head_limit = len(text)
+    offset = 0
+    for line_number, line in enumerate(text.splitlines(keepends=True)):
+        if line_number == _HEAD_MAX_LINES:
+            head_limit = offset
+        if is_heading(line):
+            headings.append((line.strip(), offset))
+        elif _TABLE_PATTERN.match(line):
+            tables.append(offset)
+        elif _FIGURE_PATTERN.match(line):
+            figures.append(offset)
+        offset += len(line)
+
+    sections: List[Section] = []
+    for i, (heading, start) in enumerate(headings):
+        end = headings[i + 1][1] if i + 1 < len(headings) else len(text)
+        sections.append(Section(heading, start, end))
+
+    abstract = None
+    head_end = head_limit
+    for section in sections:
+        lowered = section.heading.lower()
+        if lowered == "abstract" and abstract is None:
+            abstract = (section.start, section.end)
+        elif _BODY_HEADING_PATTERN.match(section.heading):
+            # Kopf endet bei erster inhaltlicher Überschrift. Titel wie
+            # "A Survey of ..." sehen auch aus wie Überschriften, darum nur
+            # Nummern oder "Introduction".
+            head_end = min(head_limit, section.start)
+            break
+
+    # Referenzen nur abschneiden, wenn danach noch genug Text kommt. Sonst
+    # ist "References" vermutlich nur ein Wort im Fließtext.
+    references_start = None
+    match = _REFERENCES_PATTERN.search(text)
+    if match and len(text) - match.start() > 800:
+        references_start = match.start()
+
+    return DocumentIndex(
+        text_hash=digest,
+        length=len(text),
+        sections=tuple(sections),
+        head_end=head_end,
+        abstract=abstract,
+        references_start=references_start,
+        tables=tuple(tables),
+        figures=tuple(figures),
+    )
+
+
+_index_cache: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def index_document(text: str) -> DocumentIndex:
+    """
+    Liefert Struktur-Index für Text, gecacht nach SHA1.
+
+    Chunking, Kompression und Titel-Extraktion fragen denselben Index ab,
+    statt jeweils selbst Zeilen zu scannen. Kleiner LRU-Cache reicht: pro
+    Lauf gibt es meist nur ein oder zwei Textvarianten.
+    """
+    digest = text_hash(text)
+    with _index_lock:
+        cached = _index_cache.get(digest)
+        if cached is not None:
+            _index_cache.move_to_end(digest)
+            return cached
+    document = _build_index(text or "", digest)
+    with _index_lock:
+        _index_cache[digest] = document
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return document
+
+
+# Dokument-Handles
+
+_documents: Dict[str, List] = {}
+_documents_lock = threading.Lock()
+
+
+def hold_document(text: str) -> str:
+    """
+    Legt Text einmal im Prozess ab, liefert Handle (SHA1).
+
+    Pipeline-State trägt nur Handle statt Text. Checkpoints schreiben so
+    kein Paper pro Node, parallele Läufe mit gleichem Text teilen sich
+    eine Kopie. Jedes hold_document braucht ein release_document.
+    """
+    handle = text_hash(text)
+    with _documents_lock:
+        entry = _documents.get(handle)
+        if entry is None:
+            _documents[handle] = [text or "", 1]
+        else:
+            entry[1] += 1
+    return handle
+
+
+def has_document(handle: str) -> bool:
+    with _documents_lock:
+        return handle in _documents
+
+
+def document_text(handle: str) -> str:
+    """Text zum Handle. KeyError, wenn schon freigegeben oder aus anderem Prozess."""
+    with _documents_lock:
+        return _documents[handle][0]
+
+
+def release_document(handle: str) -> None:
+    """Letzte Freigabe löscht Text. Unbekannte Handles ignorieren."""
+    with _documents_lock:
+        entry = _documents.get(handle)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _documents[handle]
+
+
+# Titel und Abstract ohne LLM
+
+TITLE_PREFIX = "Title:"
+_TITLE_SCAN_LINES = 20
+_TITLE_MAX_LINES = 3
+_TITLE_SKIP_PATTERN = re.compile(
+    r"@|https?://|arxiv|doi|preprint|proceedings of|under review|copyright|licen[cs]e|^\d{4}-\d{1,2}-\d{1,2}$|^page \d",
+    re.I,
+)
+# "Maciej Besta1*, Nils Blach1*" oder "Tianjun Zhang∗": Autoren, kein Titel
+_AUTHOR_LINE_PATTERN = re.compile(
+    r"^[A-Z][a-z]+(?: [A-Z]\.)?(?: [A-Z][a-z]+)+[\d*∗†‡,\s]*$|[a-z][\d*∗†‡]+,|,\s*\d|\w[*∗†‡]\d?(?:,|$)"
+)
+
+
+def _is_title_candidate(line: str) -> bool:
+    stripped = line.strip()
+    if len(stripped) < 8 or len(stripped) > 200:
+        return False
+    if stripped.lower() in _HEADING_KEYWORDS or _TITLE_SKIP_PATTERN.search(stripped):
+        return False
+    if _AUTHOR_LINE_PATTERN.search(stripped):
+        return False
+    # Titel hat Buchstaben, keine Tabellen- oder Datumszeile
+    return sum(ch.isalpha() for ch in stripped) >= 0.6 * len(stripped.replace(" ", ""))
+
+
+def extract_title(text: str, document: Optional[DocumentIndex] = None) -> str:
+    """
+    Titel aus Textkopf, ohne LLM.
+
+    Steht schon eine "Title:"-Zeile vorne (von build_analysis_context oder
+    aus PDF-Layout), gilt die. Sonst erste Zeile vor dem Abstract, die
+    nicht nach Metadaten oder Autoren aussieht. Folgezeilen im gleichen
+    Stil (z.B. alles GROSS) gehören dazu, höchstens drei. Leerer String,
+    wenn nichts passt. Dann entscheidet weiter der Reader.
+    """
+    if not text:
+        return ""
+    first_line = text.lstrip().split("\n", 1)[0].strip()
+    if first_line.startswith(TITLE_PREFIX):
+        return first_line[len(TITLE_PREFIX):].strip()
+
+    document = document or index_document(text)
+    head_end = document.abstract[0] if document.abstract else document.head_end
+    lines = [line.strip() for line in text[:head_end].splitlines()[:_TITLE_SCAN_LINES]]
+    for i, line in enumerate(lines):
+        if not _is_title_candidate(line):
+            continue
+        parts = [line]
+        for follower in lines[i + 1:i + _TITLE_MAX_LINES]:
+            if not _is_title_candidate(follower) or follower.isupper() != line.isupper():
+                break
+            parts.append(follower)
+        return " ".join(parts)
+    return ""
+
+
+def extract_abstract(text: str, document: Optional[DocumentIndex] = None) -> str:
+    """Abstract-Text ohne Überschrift, leer wenn Index keinen Abstract kennt."""
+    if not text:
+        return ""
+    document = document or index_document(text)
+    if not document.abstract:
+        return ""
+    start, end = document.abstract
+    return text[start:end].split("\n", 1)[-1].strip()
+
+
+def title_from_pdf_layout(page) -> str:
+    """
+    Titel aus erster PDF-Seite über Schriftgröße (pdfplumber Page).
+
+    Titel ist fast immer größte Schrift oben auf Seite 1. Wörter mit
+    dieser Größe in Lesereihenfolge zusammensetzen. Ist größte Schrift
+    kaum größer als Fließtext, lieber nichts liefern und Text-Heuristik
+    nehmen.
+    """
+    try:
+        words = page.extract_words(extra_attrs=["size"], x_tolerance=1.5)
+    except Exception:
+        return ""
+    upper = [w for w in words if w.get("top", 0) < page.height * 0.5 and len(w.get("text", "")) > 1]
+    if not upper:
+        return ""
+    sizes = sorted(round(w["size"], 1) for w in words)
+    body_size = sizes[len(sizes) // 2]
+    title_size = max(round(w["size"], 1) for w in upper)
+    if title_size < body_size * 1.15:
+        return ""
+    # Ganzes Band von erster bis letzter Titelzeile neu lesen. Kapitälchen
+    # haben größere Anfangsbuchstaben als Rest vom Wort, Wortliste nach
+    # Größe würde sie zerreißen.
+    title_words = [w for w in upper if round(w["size"], 1) >= title_size - 0.5]
+    top = min(w["top"] for w in title_words) - 1
+    bottom = max(w["bottom"] for w in title_words) + 1
+    try:
+        band_text = page.crop((0, max(0, top), page.width, min(page.height, bottom))).extract_text(x_tolerance=1.5, y_tolerance=4)
+    except Exception:
+        return ""
+    title = " ".join(line.strip() for line in (band_text or "").splitlines() if line.strip())
+    return title if _TITLE_SKIP_PATTERN.search(title) is None else ""
+
+
+def extract_pdf_text(data: bytes) -> str:
+    """
+    Text aus PDF-Bytes. pdfplumber zuerst, pypdf als Fallback.
+
+    Titel aus Layout kommt als "Title:"-Zeile davor. Kein Streamlit hier,
+    damit UI, HTTP-Service und Worker dieselbe Extraktion nutzen.
+    """
+    try:
+        import pdfplumber
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            pages = [page.extract_text(x_tolerance=1, y_tolerance=1) or "" for page in pdf.pages]
+            text = "\n\n".join(pages).strip()
+            if text:
+                # Titel aus Schriftgröße ist zuverlässiger als aus Text
+                layout_title = title_from_pdf_layout(pdf.pages[0]) if pdf.pages else ""
+                return f"{TITLE_PREFIX} {layout_title}\n{text}" if layout_title else text
+    except Exception:
+        pass
+    try:
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(data))
+        return "\n\n".join((page.extract_text() or "") for page in reader.pages).strip()
+    except Exception as e:
+        return f"[PDF error] {e}"
+
+
+def extract_file_text(data: bytes, file_name: str, content_type: str = "") -> str:
+    """PDF oder Text. Typ aus Content-Type oder Dateiendung."""
+    if content_type == "application/pdf" or file_name.lower().endswith(".pdf"):
+        return extract_pdf_text(data)
+    return data.decode("utf-8", errors="ignore")
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import importlib
+import threading
+from importlib.util import find_spec
+from typing import Any, Callable, Dict
+
+from corpus import record_result, reuse_prior_result
+
+# Engine-Module erst bei erstem Lauf importieren. langchain_openai, langgraph
+# und dspy/litellm kosten zusammen mehrere Sekunden Startzeit.
+ENGINE_MODULES = {
+    "langchain": "workflows.langchain_pipeline",
+    "langgraph": "workflows.langgraph_pipeline",
+    "dspy": "workflows.dspy_pipeline",
+}
+# Pakete, ohne die eine Engine nicht laufen kann
+_ENGINE_PACKAGES = {
+    "langchain": ("langchain_openai",),
+    "langgraph": ("langchain_openai", "langgraph"),
+    "dspy": ("dspy", "litellm"),
+}
+# Compare startet drei Engines gleichzeitig. Erster Import gemeinsamer Module
+# (agents, llm) aus mehreren Threads kann in Pythons Import-Deadlock-Erkennung laufen.
+_import_lock = threading.Lock()
+
+
+def engine_available(engine: str) -> bool:
+    """Prüft nur, ob Pakete installiert sind. Importiert nichts."""
+    return all(find_spec(package) is not None for package in _ENGINE_PACKAGES[engine.lower()])
+
+
+def get_runner(engine: str) -> Callable[[str, Dict[str, Any]], Dict[str, Any]]:
+    engine = engine.lower()
+    if engine not in ENGINE_MODULES:
+        raise ValueError(f"Unknown engine '{engine}', use one of: {', '.join(ENGINE_MODULES)}")
+    with _import_lock:
+        module = importlib.import_module(ENGINE_MODULES[engine])
+    return module.run_pipeline
+
+
+def run_engine(engine: str, input_text: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    # Gleiches oder fast gleiches Paper schon analysiert: kein LLM-Call (reuse_prior_analyses)
+    reused = reuse_prior_result(engine, input_text, config)
+    if reused is not None:
+        return reused
+    result = get_runner(engine)(input_text, config)
+    # Jeder Lauf ins Korpus (corpus.py): später suchen und nachschlagen ohne Pipeline
+    record_result(engine, input_text, config, result)
+    return result
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import concurrent.futures as cf
 import json, re, os, sys
 from typing import Dict
 
@@ -45,17 +46,28 @@ def _round_metrics(metrics: Dict[str, float]) -> Dict[str, float]:
     """Rundet Metriken auf 3 Dezimalstellen für Lesbarkeit."""
     return {k: round(v, 3) for k, v in metrics.items()}
 
-def run_example(text: str, cfg: Dict):
+def run_example(text: str, cfg: Dict, concurrent: bool = False):
     """
     Führt alle drei Pipelines auf demselben Text aus und vergleicht.
     
     Führt LangChain, LangGraph und DSPy auf demselben Input aus, dann Metriken.
     F1-Score vergleicht Zusammenfassung mit ursprünglichen Notizen.
+
+    Eval vergleicht Engines, darum nacheinander und ohne Step-/LLM-Cache:
+    Sonst teilen sich Engines Scheduler-Slots und Reader-Calls, Latenzen
+    wären nicht vergleichbar. concurrent=True lässt alle drei parallel
+    laufen (schneller, identische Reader-Prompts teilen einen Upstream-Call),
+    Zeiten zählen dann nur noch grob.
     """
+    cfg = {"step_cache": False, "llm_cache": False, **cfg}
     ctx = build_analysis_context(text, cfg)
-    out_lc = run_lc(ctx, cfg)
-    out_lg = run_lg(ctx, cfg)
-    out_dp = run_dspy(ctx, cfg)
+    runners = (run_lc, run_lg, run_dspy)
+    if concurrent:
+        with cf.ThreadPoolExecutor(max_workers=len(runners)) as executor:
+            futures = [executor.submit(runner, ctx, cfg) for runner in runners]
+            out_lc, out_lg, out_dp = [future.result() for future in futures]
+    else:
+        out_lc, out_lg, out_dp = [runner(ctx, cfg) for runner in runners]
 
     def _annotate(out: Dict) -> Dict:
         """F1-Score zu Pipeline-Ausgabe hinzu."""
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import concurrent.futures as cf
+import contextvars
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+_DEFAULT_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Fertige Jobs behalten, damit UI und Clients Ergebnisse später noch abholen
+_MAX_FINISHED_JOBS = 64
+
+
+class Job:
+    """Ein Pipeline-Lauf im Hintergrund. Status: queued, running, done, error."""
+
+    def __init__(self, label: str, key: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.key = key
+        self.status = "queued"
+        self.result: Any = None
+        self.error = ""
+        self.error_trace = ""
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def elapsed_s(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "label": self.label,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "elapsed_s": round(self.elapsed_s(), 2),
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """
+    Thread-Pool mit Job-IDs.
+
+    Pipeline-Läufe sind fast nur Warten auf LLM. Threads reichen, und alle
+    Jobs teilen Scheduler, Coalescer und Caches im Prozess. Jeder Job läuft
+    in eigenem contextvars-Kontext, LLM-Clients gehören zum Lauf.
+    key fasst Doppelklicks zusammen: gleicher Schlüssel, noch laufender
+    oder fertiger Job wird zurückgegeben statt neu gestartet. Fehlgeschlagene
+    Jobs werden bei gleichem Schlüssel neu gestartet.
+    """
+
+    def __init__(self, max_workers: int = _DEFAULT_WORKERS):
+        self._executor = cf.ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, label: str, function: Callable[..., Any], *args: Any, key: Optional[str] = None) -> Job:
+        with self._lock:
+            if key is not None:
+                existing = self._jobs.get(self._by_key.get(key, ""))
+                if existing is not None and existing.status != "error":
+                    return existing
+            job = Job(label, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            self._trim()
+        # Frischer Kontext pro Job: LLM-Clients und Spans (contextvars) bleiben nicht vom Vorgänger im Thread hängen
+        self._executor.submit(contextvars.Context().run, self._run, job, function, args)
+        return job
+
+    def _run(self, job: Job, function: Callable[..., Any], args: tuple) -> None:
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = function(*args)
+            job.status = "done"
+        except Exception as exc:
+            job.error = str(exc)
+            job.error_trace = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+            job.status = "error"
+        finally:
+            job.finished = time.time()
+            job.done.set()
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - _MAX_FINISHED_JOBS)]:
+            job = self._jobs.pop(job_id)
+            if job.key is not None and self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id or "")
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(max_workers: Optional[int] = None) -> JobQueue:
+    """
+    Eine Queue pro Prozess. Überlebt Streamlit-Reruns, weil Module gecacht sind.
+
+    max_workers gilt nur beim ersten Aufruf (z.B. service.py --workers).
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(max_workers or _DEFAULT_WORKERS)
+        return _queue
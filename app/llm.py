@@ -1,9 +1,21 @@
 from __future__ import annotations
 
+import contextvars
 import os
-from typing import Optional
+import re
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Type, get_args, get_origin
 
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+from cache_store import get_step_cache
+from coalescing import get_coalescer, request_key
+from scheduler import configure_scheduler, get_scheduler
+from tracing import span, traced_http_client
+from utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from pydantic import BaseModel
 
 try:
     from dotenv import load_dotenv
@@ -11,7 +23,20 @@ try:
 except ImportError:
     pass
 
-_llm_instance: Optional[ChatOpenAI] = None
+# Clients des aktuellen Laufs: {"default": Client, "agents": {step: Client}, "response_cache": StepCache|None}.
+# contextvar statt Modul-Globals: Service-Jobs laufen parallel, jeder mit eigener Config.
+# Threads eines Laufs erben Wert über tracing.run_in_context().
+_run_clients: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("llm_run_clients", default=None)
+# Clients aus Env, für Aufrufe ohne configure() (z.B. Skripte, die Agents direkt nutzen)
+_env_clients: Optional[Dict[str, Any]] = None
+# Client vom zuletzt konfigurierten Lauf. Nur für alten Import `from llm import llm`, Agents nutzen get_llm()
+llm: Optional[ChatOpenAI] = None
+
+AGENT_STEPS = ("reader", "summarizer", "critic", "integrator")
+# Was pro Agent überschrieben werden darf
+_AGENT_OVERRIDE_KEYS = ("model", "api_base", "temperature", "max_tokens")
+# Abbruch wegen max_tokens oder Filter: Antwort unvollständig, nie cachen
+_INCOMPLETE_FINISH_REASONS = ("length", "content_filter")
 
 
 def _create_openai_llm(
@@ -28,6 +53,8 @@ def _create_openai_llm(
             "OPENAI_API_KEY must be set! "
             "Please add to .env file"
         )
+    # Erst hier importieren: langchain_openai zieht openai + httpx, fast 1s Startzeit
+    from langchain_openai import ChatOpenAI
     
     return ChatOpenAI(
         model=model_name,
@@ -36,33 +63,334 @@ def _create_openai_llm(
         temperature=temperature,
         max_tokens=max_output_tokens,
         timeout=request_timeout_seconds,
+        # Retries macht der Scheduler (Backoff mit Jitter, Rate-Limits), nicht der Client
+        max_retries=0,
+        http_client=traced_http_client(request_timeout_seconds),
+    )
+
+
+def agent_config(config: Optional[dict], step: str) -> dict:
+    """
+    Config für einen Agent: globale Werte plus config["agents"][step].
+
+    Beispiel: {"model": "gpt-4.1", "agents": {"critic": {"model": "gpt-4o-mini",
+    "max_tokens": 256}}}. Reader sieht ganzes Paper und bleibt beim großen
+    Modell, Critic und Summarizer arbeiten nur auf kurzen NOTES.
+    """
+    config_dict = dict(config or {})
+    overrides = (config_dict.get("agents") or {}).get(step) or {}
+    config_dict.update({key: overrides[key] for key in _AGENT_OVERRIDE_KEYS if overrides.get(key) is not None})
+    return config_dict
+
+
+def _config_or_env(config_dict: dict, key: str, env_name: str, default: str) -> Any:
+    """Wert aus Config, sonst Env. Nur None fehlt: temperature 0.0 ist ein gültiger Wert."""
+    value = config_dict.get(key)
+    return os.getenv(env_name, default) if value is None else value
+
+
+def _resolve_settings(config_dict: dict) -> dict:
+    return {
+        "model": config_dict.get("model") or os.getenv("OPENAI_MODEL", "gpt-4.1"),
+        "api_base": config_dict.get("api_base") or os.getenv("OPENAI_BASE_URL", None),
+        "temperature": float(_config_or_env(config_dict, "temperature", "OPENAI_TEMPERATURE", "0.0")),
+        "max_tokens": int(_config_or_env(config_dict, "max_tokens", "OPENAI_MAX_TOKENS", "4096")),
+    }
+
+
+def _llm_from_config(config_dict: dict) -> ChatOpenAI:
+    settings = _resolve_settings(config_dict)
+    return _create_openai_llm(
+        model_name=settings["model"],
+        base_url=settings["api_base"],
+        api_key=config_dict.get("api_key") or os.getenv("OPENAI_API_KEY"),
+        temperature=settings["temperature"],
+        max_output_tokens=settings["max_tokens"],
+        request_timeout_seconds=int(config_dict.get("timeout") or os.getenv("OPENAI_TIMEOUT", "45")),
     )
 
 
+def _build_clients(config_dict: dict) -> Dict[str, Any]:
+    default = _llm_from_config(config_dict)
+    return {
+        "default": default,
+        # Nur Agents mit eigenen Werten bekommen eigenen Client
+        "agents": {
+            step: _llm_from_config(agent_config(config_dict, step))
+            for step in (config_dict.get("agents") or {})
+            if _resolve_settings(agent_config(config_dict, step)) != _resolve_settings(config_dict)
+        },
+        # Antworten auf Platte, geteilt zwischen Prozessen (worker_pool.py). None = aus.
+        # Gleicher Schalter wie Step-Cache, llm_cache=False schaltet nur diese Ebene ab.
+        # Greift nur bei temperature 0 (invoke_prompt), gesampelte Antworten bleiben frisch.
+        "response_cache": get_step_cache(config_dict) if config_dict.get("llm_cache", True) else None,
+    }
+
+
 def configure(config: Optional[dict] = None) -> None:
-    global _llm_instance
+    """
+    Clients für einen Lauf bauen und im aktuellen Kontext setzen.
+
+    Jeder run_pipeline() ruft das am Anfang. Parallele Läufe (Service-Jobs,
+    Compare-Tab) sehen je nur ihre eigenen Clients. Scheduler bleibt
+    prozessweit: Rate-Limits gelten pro Account und Modell, nicht pro Lauf.
+    """
+    global llm
 
     config_dict = config or {}
+    clients = _build_clients(config_dict)
+    _run_clients.set(clients)
+    llm = clients["default"]
+    configure_scheduler(config_dict)
 
-    model_name = config_dict.get("model") or os.getenv("OPENAI_MODEL", "gpt-4.1")
-    base_url = config_dict.get("api_base") or os.getenv("OPENAI_BASE_URL", None)
-    api_key = config_dict.get("api_key") or os.getenv("OPENAI_API_KEY")
-    temperature = float(config_dict.get("temperature") or os.getenv("OPENAI_TEMPERATURE", "0.0"))
-    max_output_tokens = int(config_dict.get("max_tokens") or os.getenv("OPENAI_MAX_TOKENS", "4096"))
-    request_timeout = int(config_dict.get("timeout") or os.getenv("OPENAI_TIMEOUT", "45"))
 
-    _llm_instance = _create_openai_llm(
-        model_name=model_name,
-        base_url=base_url,
-        api_key=api_key,
-        temperature=temperature,
-        max_output_tokens=max_output_tokens,
-        request_timeout_seconds=request_timeout,
-    )
+def _current_clients() -> Dict[str, Any]:
+    global _env_clients
 
+    clients = _run_clients.get()
+    if clients is not None:
+        return clients
+    if _env_clients is None:
+        _env_clients = _build_clients({})
+    return _env_clients
 
-llm: Optional[ChatOpenAI] = None
 
-if _llm_instance is None:
-    configure({})
-    llm = _llm_instance
+def step_settings(config: Optional[dict], step: str) -> dict:
+    """
+    Einstellungen, die Ausgabe eines Schritts beeinflussen.
+
+    Gleiche Auflösung wie configure(), inkl. Agent-Overrides. Für
+    Step-Cache-Schlüssel: nur was Ergebnis ändert, nicht Timeout oder Telemetrie.
+    """
+    return {"step": step, **_resolve_settings(agent_config(config, step))}
+
+
+# Mindestbudget pro Ausgabefeld eines Schemas. Listenfelder zählen doppelt,
+# Listen von Objekten pro Unterfeld doppelt. Dazu JSON-Klammern und Schlüssel.
+_FIELD_TOKEN_FLOOR = 32
+_SCHEMA_OVERHEAD_TOKENS = 16
+
+
+def schema_token_floor(schema: Type[BaseModel]) -> int:
+    """
+    Mindest-max_tokens für eine Antwort als schema.
+
+    JSON braucht Schlüssel, Anführungszeichen und Klammern zusätzlich zum
+    Inhalt. Per-Agent-Presets (160/256) reichen für PaperNotes nicht, das
+    JSON bricht ab und lässt sich nicht parsen.
+    """
+    from pydantic import BaseModel
+
+    def field_floor(annotation: Any) -> int:
+        if get_origin(annotation) is list:
+            return 2 * field_floor(get_args(annotation)[0])
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return sum(field_floor(field.annotation) for field in annotation.model_fields.values())
+        return _FIELD_TOKEN_FLOOR
+
+    return _SCHEMA_OVERHEAD_TOKENS + field_floor(schema)
+
+
+def fused_settings(config: Optional[dict], steps: Sequence[str], schema: Optional[Type[BaseModel]] = None) -> dict:
+    """
+    Einstellungen für einen Call, der mehrere Agents ersetzt (fast_mode).
+
+    Modell und Temperatur vom ersten Agent (dessen Client macht den Call),
+    max_tokens als Summe: eine Antwort muss alle Ausgaben tragen. Mit
+    schema mindestens schema_token_floor(), sonst bricht JSON bei kleinen
+    Presets ab.
+    """
+    settings = step_settings(config, steps[0])
+    settings["step"] = "+".join(steps)
+    settings["max_tokens"] = sum(step_settings(config, step)["max_tokens"] for step in steps)
+    if schema is not None:
+        settings["max_tokens"] = max(settings["max_tokens"], schema_token_floor(schema))
+    return settings
+
+
+def agent_models(config: Optional[dict]) -> Dict[str, str]:
+    """Modell pro Agent für Telemetrie, z.B. {"reader_model": "gpt-4.1", ...}."""
+    return {f"{step}_model": step_settings(config, step)["model"] for step in AGENT_STEPS}
+
+
+def get_llm(step: Optional[str] = None) -> ChatOpenAI:
+    """
+    LLM-Client des aktuellen Laufs, für step mit Agent-Override dessen eigener Client.
+
+    Clients sind pro Lauf: configure() in run_pipeline() setzt sie im
+    Kontext dieses Laufs (contextvar), nicht im Modul. Zwei gleichzeitige
+    Läufe mit anderem Modell oder api_key kommen sich so nicht in die Quere.
+    Agents holen Client bei jedem Aufruf, nicht beim Import, sonst griffe
+    Config aus UI nicht. Modul-Variable `llm` ist nur der zuletzt
+    konfigurierte Client, für parallele Läufe ungeeignet. Ohne configure()
+    gelten Werte aus Env.
+    """
+    clients = _current_clients()
+    return clients["agents"].get(step or "", clients["default"])
+
+
+def _record_usage(llm_span, llm_response: Any) -> None:
+    """
+    Token-Zahlen aus usage_metadata (LangChain) in Span schreiben.
+
+    cached_tokens: Anteil des Prompts, den Provider aus Prefix-Cache bedient
+    hat. Zeigt, ob gemeinsamer NOTES-Präfix (agents/notes_prefix.py) greift.
+    """
+    usage = getattr(llm_response, "usage_metadata", None) or {}
+    input_details = usage.get("input_token_details") or {}
+    llm_span.set_attribute("prompt_tokens", int(usage.get("input_tokens") or 0))
+    llm_span.set_attribute("completion_tokens", int(usage.get("output_tokens") or 0))
+    llm_span.set_attribute("cached_tokens", int(input_details.get("cache_read") or 0))
+
+
+def finish_reason(llm_response: Any) -> str:
+    """finish_reason aus response_metadata, leer wenn Provider keinen schickt."""
+    return str((getattr(llm_response, "response_metadata", None) or {}).get("finish_reason") or "")
+
+
+def _cacheable(chat_model: ChatOpenAI, llm_response: Any) -> bool:
+    """
+    Nur deterministische, vollständige Antworten cachen.
+
+    Bei temperature > 0 ist jede Antwort eine Stichprobe. Aus dem Cache käme
+    immer dieselbe, Wiederholungen und Teleprompting sähen keine Streuung.
+    """
+    if _current_clients()["response_cache"] is None or chat_model.temperature:
+        return False
+    return bool(str(llm_response.content or "").strip()) and finish_reason(llm_response) not in _INCOMPLETE_FINISH_REASONS
+
+
+def _cached_response(key: str) -> Any:
+    response_cache = _current_clients()["response_cache"]
+    if response_cache is None:
+        return None
+    cached = response_cache.get(key)
+    return messages_from_dict([cached])[0] if cached else None
+
+
+def _store_response(key: str, step: str, llm_response: Any) -> None:
+    response_cache = _current_clients()["response_cache"]
+    if response_cache is None:
+        return
+    try:
+        response_cache.put(key, f"llm.{step}", message_to_dict(llm_response))
+    except (TypeError, ValueError):
+        # Metadaten nicht JSON-fähig: dann eben nicht cachen
+        pass
+
+
+def _json_schema_format(schema: Type[BaseModel]) -> dict:
+    """
+    response_format für OpenAI Structured Outputs. strict verlangt
+    additionalProperties=false an jedem Objekt, Pydantic setzt das nicht.
+    """
+    json_schema = schema.model_json_schema()
+    for node in [json_schema, *(json_schema.get("$defs") or {}).values()]:
+        if node.get("type") == "object":
+            node["additionalProperties"] = False
+    return {"type": "json_schema", "json_schema": {"name": schema.__name__, "schema": json_schema, "strict": True}}
+
+
+def _parse_structured(schema: Type[BaseModel], content: Any) -> BaseModel:
+    """Antwort als schema. Provider ohne Structured Outputs packen JSON gern in ```json."""
+    text = str(content or "").strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        return schema.model_validate_json(text)
+    except ValueError as exc:
+        raise ValueError(f"{schema.__name__}: response is not valid JSON for schema ({exc})") from exc
+
+
+def structured_output_rejected(exc: BaseException) -> bool:
+    """
+    Provider oder Client kann kein Structured Output, Aufrufer macht ohne Schema weiter.
+
+    openai.BadRequestError (400): Modell/Server lehnt response_format ab,
+    z.B. lokale OpenAI-kompatible Server. NotImplementedError: Client ohne
+    Support. Ursachen mitprüfen, LiteLLM und DSPy verpacken den Fehler.
+    """
+    from openai import BadRequestError
+
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, (BadRequestError, NotImplementedError)):
+            return True
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def invoke_prompt(
+    prompt: Any,
+    variables: dict,
+    step: str,
+    schema: Optional[Type[BaseModel]] = None,
+    max_tokens: Optional[int] = None,
+) -> Any:
+    """
+    Führt Prompt-Template mit aktuellem LLM aus.
+
+    Einziger Weg, wie Agents das LLM aufrufen. Jeder Aufruf wird als
+    "llm.call"-Span mit Step, Modell und Tokens getraced. HTTP-Requests
+    darunter kommen aus traced_http_client(). Aufruf läuft durch den
+    Scheduler: Rate-Limits pro Modell, Retries bei 429/Timeouts.
+
+    Identische Requests (gleiche Messages, Modell, Parameter), die gleichzeitig
+    laufen, teilen sich einen Upstream-Call. Z.B. Reader von LangChain und
+    LangGraph im Compare-Tab. Geteilter Call zählt keine Tokens doppelt.
+
+    Fertige Antworten landen im Step-Cache (SQLite). Andere Prozesse und
+    spätere Läufe holen sie dort, Span bekommt dann llm_cached=1. Nur bei
+    temperature 0 und erst nach Prüfung: abgeschnittene Antworten
+    (finish_reason "length") und ungültiges JSON kommen nicht in den Cache.
+
+    schema (Pydantic-Modell): Structured Output, Rückgabe ist Instanz des
+    Modells statt Message. max_tokens überschreibt Client-Wert für diesen
+    Call, z.B. wenn eine Antwort zwei Agent-Ausgaben trägt.
+    """
+    chat_model = get_llm(step)
+    messages = prompt.format_messages(**variables)
+    call_kwargs: Dict[str, Any] = {}
+    if max_tokens and max_tokens != chat_model.max_tokens:
+        call_kwargs["max_tokens"] = int(max_tokens)
+    if schema is not None:
+        call_kwargs["response_format"] = _json_schema_format(schema)
+    key_parts = [
+        [(m.type, m.content) for m in messages],
+        chat_model.model_name,
+        chat_model.temperature,
+        chat_model.max_tokens,
+        chat_model.openai_api_base,
+    ]
+    if call_kwargs:
+        # Nur anhängen, wenn gesetzt: Schlüssel normaler Calls bleiben gleich
+        key_parts.append(call_kwargs)
+    key = request_key(*key_parts)
+    output_tokens = int(call_kwargs.get("max_tokens") or chat_model.max_tokens or 0)
+    estimated_tokens = estimate_tokens("".join(str(m.content) for m in messages)) + output_tokens
+    cache_key = request_key("llm", key)
+    with span("llm.call", step=step, model=chat_model.model_name) as llm_span:
+        llm_response = None if chat_model.temperature else _cached_response(cache_key)
+        if llm_response is not None:
+            llm_span.set_attribute("llm_cached", 1)
+        else:
+            llm_response, coalesced = get_coalescer().run(
+                key,
+                lambda: get_scheduler().run(
+                    chat_model.model_name, estimated_tokens, lambda: chat_model.invoke(messages, **call_kwargs)
+                ),
+            )
+            llm_span.set_attribute("coalesced", coalesced)
+            if not coalesced:
+                _record_usage(llm_span, llm_response)
+                llm_span.set_attribute("retries", max(0, int(llm_span.attributes.get("http_attempts") or 1) - 1))
+            # Erst parsen, dann cachen: kaputtes JSON darf keinen Cache-Eintrag hinterlassen
+            parsed = _parse_structured(schema, llm_response.content) if schema is not None else llm_response
+            if not coalesced and _cacheable(chat_model, llm_response):
+                _store_response(cache_key, step, llm_response)
+            return parsed
+    if schema is not None:
+        return _parse_structured(schema, llm_response.content)
+    return llm_response
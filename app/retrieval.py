@@ -0,0 +1,91 @@
+"""
+Lokales BM25 über Textblöcke eines Papers.
+
+Kein Embedding-Modell, kein Vektorindex: ein Paper hat ein paar hundert
+Blöcke, da reicht Okapi BM25 in reinem Python (Millisekunden). Reader
+braucht pro Schema-Feld wenige Stellen (Methoden, Datasets, Ergebnis-
+Tabellen, Limitations). FIELD_QUERIES beschreibt diese Stellen mit
+Wörtern, die dort typischerweise stehen.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+# Okapi-Standardwerte
+_K1 = 1.5
+_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9\-]+|\d+(?:\.\d+)?%?|%")
+_STOPWORDS = frozenset(
+    "the and for are was were with that this from have has been our its their which into than then "
+    "also can such these those there where when while using used use based each other more most".split()
+)
+
+# Suchanfrage pro PaperNotes-Feld. Titel, Objective und Contributions stehen
+# im Kopf (Abstract), der bleibt sowieso drin.
+FIELD_QUERIES: Dict[str, str] = {
+    "methods": "method approach model architecture algorithm propose framework training objective loss layer module",
+    "datasets": "dataset datasets corpus benchmark data collected samples split train test validation annotated",
+    "results": "results table accuracy f1 score bleu rouge auc outperforms baseline improvement % achieves evaluation",
+    "limitations": "limitation limitations future work however fail fails drawback cannot restricted assumption",
+}
+
+
+def _stem(token: str) -> str:
+    # Grob, aber genug für "datasets"/"dataset", "results"/"result", "training"/"train"
+    for suffix in ("ations", "ation", "ings", "ing", "ies", "es", "ed", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(token) for token in _TOKEN_PATTERN.findall((text or "").lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 über Dokumente (hier: Blöcke eines Papers)."""
+
+    def __init__(self, documents: Sequence[str]):
+        self._term_counts = [Counter(tokenize(document)) for document in documents]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency: Counter = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self._term_counts)
+        self._idf = {
+            term: math.log(1.0 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._term_counts)
+
+    def scores(self, query: str) -> List[float]:
+        terms = set(tokenize(query))
+        result = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            norm = _K1 * (1.0 - _B + _B * length / (self._avg_length or 1.0))
+            score = 0.0
+            for term in terms:
+                frequency = counts.get(term, 0)
+                if frequency:
+                    score += self._idf[term] * frequency * (_K1 + 1.0) / (frequency + norm)
+            result.append(score)
+        return result
+
+    def top(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Beste k Dokumente als (Index, Score). Dokumente ohne Treffer fallen raus."""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: (-item[1], item[0]))
+        return [(index, score) for index, score in ranked[: max(0, k)] if score > 0]
+
+
+def rank_for_fields(documents: Sequence[str], top_k: int) -> Dict[str, List[int]]:
+    """Pro Feld aus FIELD_QUERIES die Indizes der top_k besten Dokumente."""
+    index = BM25Index(documents)
+    return {field: [doc for doc, _ in index.top(query, top_k)] for field, query in FIELD_QUERIES.items()}
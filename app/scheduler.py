@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from tracing import current_span
+
+# Limits pro Modell. Defaults passen zu kleinem OpenAI-Tier, per Env/Config überschreibbar.
+_DEFAULT_RPM = int(os.getenv("OPENAI_RPM", "500"))
+_DEFAULT_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+_DEFAULT_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+_DEFAULT_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+
+_RETRYABLE_ERRORS = {
+    "RateLimitError",
+    "APITimeoutError",
+    "APIConnectionError",
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "Timeout",
+    "TimeoutError",
+    # DSPy 3.x verpackt LiteLLM-Fehler in eigene Klassen
+    "LMRateLimitError",
+    "LMTimeoutError",
+    "LMServerError",
+    "LMTransportError",
+}
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Klassischer Token-Bucket pro Minute.
+
+    Füllt sich kontinuierlich auf. acquire() blockiert, bis genug Budget da ist.
+    Anfragen größer als Kapazität werden auf Kapazität gekappt, sonst
+    würden sie nie durchkommen.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, float(per_minute))
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Gibt zurück, wie lange gewartet wurde."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return waited
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def drain(self) -> None:
+        """Nach 429 Budget leeren, damit parallele Threads nicht sofort nachlegen."""
+        with self._lock:
+            self._refill()
+            self.available = 0.0
+
+
+class AdaptiveLimiter:
+    """
+    Begrenzt parallele Requests, Limit passt sich an (AIMD).
+
+    Erfolg mit normaler Latenz: Limit langsam erhöhen (+1 nach `limit`
+    Erfolgen). 429 oder Latenz deutlich über Basiswert: Limit halbieren
+    bzw. um eins senken. So tastet sich Durchsatz an Account-Limit heran.
+    """
+
+    def __init__(self, initial: int, maximum: int):
+        self.maximum = max(1, int(maximum))
+        self.limit = max(1, min(int(initial), self.maximum))
+        self.active = 0
+        self.successes = 0
+        self.latency_ewma: Optional[float] = None
+        self.latency_floor: Optional[float] = None
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def on_success(self, latency_s: float, tokens: Optional[int] = None) -> None:
+        """
+        Latenz pro 1k geschätzte Tokens, nicht absolut. Sonst drückt ein
+        langer Call nach vielen kurzen das Limit, obwohl der Provider
+        gesund ist.
+        """
+        if tokens:
+            latency_s = latency_s * 1000.0 / max(1, int(tokens))
+        with self._cond:
+            self.latency_ewma = latency_s if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency_s
+            self.latency_floor = self.latency_ewma if self.latency_floor is None else min(self.latency_floor, self.latency_ewma)
+            if self.latency_ewma > 2.0 * self.latency_floor and self.limit > 1:
+                # Provider wird langsam, bevor er 429 schickt
+                self.limit -= 1
+                self.successes = 0
+                return
+            self.successes += 1
+            if self.successes >= self.limit:
+                # Gesundes Fenster: Basiswert zieht Richtung aktueller Latenz.
+                # Ein einzelner Ausreißer nach unten bleibt so nicht für immer Maßstab.
+                self.latency_floor += 0.25 * (self.latency_ewma - self.latency_floor)
+                self.successes = 0
+                if self.limit < self.maximum:
+                    self.limit += 1
+                    self._cond.notify()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self.successes = 0
+
+
+def _exception_chain(exc: BaseException):
+    """Fehler plus Ursachen. LiteLLM und DSPy verpacken den OpenAI-Fehler mehrfach."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    return any(
+        type(e).__name__ in _RETRYABLE_ERRORS or getattr(e, "status_code", None) in _RETRYABLE_STATUS
+        for e in _exception_chain(exc)
+    )
+
+
+def _is_rate_limit(exc: BaseException) -> bool:
+    return any(
+        type(e).__name__ in ("RateLimitError", "LMRateLimitError") or getattr(e, "status_code", None) == 429
+        for e in _exception_chain(exc)
+    )
+
+
+def _retry_after_seconds(exc: BaseException) -> Optional[float]:
+    for e in _exception_chain(exc):
+        headers = getattr(getattr(e, "response", None), "headers", None) or {}
+        try:
+            value = headers.get("retry-after")
+            if value is not None:
+                return float(value)
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return None
+
+
+class RequestScheduler:
+    """
+    Zentrale Stelle, durch die alle LLM-Aufrufe laufen.
+
+    Pro Modell: Request-Bucket (RPM), Token-Bucket (TPM) und adaptiver
+    Concurrency-Limiter. Retries mit exponentiellem Backoff plus Jitter.
+    Retry-After Header vom Provider hat Vorrang.
+    """
+
+    def __init__(
+        self,
+        rpm: int = _DEFAULT_RPM,
+        tpm: int = _DEFAULT_TPM,
+        max_concurrency: int = _DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = _DEFAULT_MAX_RETRIES,
+        base_delay_s: float = 1.0,
+        max_delay_s: float = 30.0,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _model_state(self, model: str) -> Dict[str, Any]:
+        with self._lock:
+            state = self._models.get(model)
+            if state is None:
+                state = {
+                    "requests": TokenBucket(self.rpm),
+                    "tokens": TokenBucket(self.tpm),
+                    "limiter": AdaptiveLimiter(max(1, self.max_concurrency // 2), self.max_concurrency),
+                }
+                self._models[model] = state
+            return state
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            return min(self.max_delay_s, retry_after) + random.uniform(0, 0.25)
+        # Full jitter: zufällig zwischen 0 und exponentieller Obergrenze
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+    def run(self, model: str, estimated_tokens: int, function: Callable[[], Any]) -> Any:
+        state = self._model_state(model or "default")
+        llm_span = current_span()
+        attempt = 0
+        while True:
+            waited = state["requests"].acquire(1)
+            waited += state["tokens"].acquire(max(1, estimated_tokens))
+            limiter: AdaptiveLimiter = state["limiter"]
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                result = function()
+            except Exception as exc:
+                limiter.release()
+                if not _is_retryable(exc) or attempt >= self.max_retries:
+                    raise
+                if _is_rate_limit(exc):
+                    limiter.on_throttle()
+                    state["tokens"].drain()
+                    if llm_span is not None:
+                        llm_span.add("throttled", 1)
+                delay = self._backoff(attempt, exc)
+                if llm_span is not None:
+                    llm_span.add("backoff_s", round(delay, 3))
+                time.sleep(delay)
+                attempt += 1
+                continue
+            limiter.release()
+            limiter.on_success(time.perf_counter() - start, estimated_tokens)
+            if llm_span is not None:
+                llm_span.set_attribute("queue_wait_s", round(waited, 3))
+                llm_span.set_attribute("concurrency_limit", limiter.limit)
+            return result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Aktueller Zustand pro Modell. Für Debugging und Batch-Reports."""
+        with self._lock:
+            return {
+                model: {
+                    "concurrency_limit": state["limiter"].limit,
+                    "active": state["limiter"].active,
+                    "latency_ewma_s": round(state["limiter"].latency_ewma or 0.0, 3),
+                }
+                for model, state in self._models.items()
+            }
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def configure_scheduler(config: Optional[dict] = None) -> None:
+    """
+    Übernimmt Limits aus Config (rate_limit_rpm, rate_limit_tpm,
+    max_concurrency, max_retries).
+
+    Scheduler bleibt prozessweit gleich, nur Limits ändern sich. Buckets
+    werden neu gebaut, wenn sich ein Limit ändert.
+    """
+    config_dict = config or {}
+    scheduler = get_scheduler()
+    rpm = int(config_dict.get("rate_limit_rpm") or scheduler.rpm)
+    tpm = int(config_dict.get("rate_limit_tpm") or scheduler.tpm)
+    max_concurrency = int(config_dict.get("max_concurrency") or scheduler.max_concurrency)
+    if "max_retries" in config_dict:
+        scheduler.max_retries = max(0, int(config_dict["max_retries"]))
+    if (rpm, tpm, max_concurrency) != (scheduler.rpm, scheduler.tpm, scheduler.max_concurrency):
+        with scheduler._lock:
+            scheduler.rpm, scheduler.tpm, scheduler.max_concurrency = rpm, tpm, max_concurrency
+            scheduler._models.clear()
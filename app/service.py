@@ -0,0 +1,212 @@
+"""
+Lokaler HTTP-Service für die Pipelines.
+
+Ein warmer Prozess für mehrere Frontends und Batch-Skripte: Scheduler,
+Coalescer und Caches werden geteilt, LLM-Clients baut jeder Job aus
+seiner Config (llm.configure). Nur Standardbibliothek.
+
+Start (aus Projekt-Root):
+    python app/service.py --port 8000 --workers 4
+
+Endpunkte:
+    POST /jobs              {"engine": "langgraph", "text": "..."} oder
+                            {"engine": "dspy", "pdf_base64": "...", "filename": "paper.pdf"},
+                            optional "config": {...} wie in der UI
+    GET  /jobs              alle Jobs ohne Ergebnis
+    GET  /jobs/<id>         Status, bei "done" mit Ergebnis
+    GET  /jobs/<id>/events  Server-Sent Events: "status" bei jedem Wechsel, am Ende "result"
+    GET  /papers?q=...      Volltextsuche über alle analysierten Paper (corpus.py), ohne q: neueste
+    GET  /papers/<hash>     letzter Lauf zu Dokument-Hash, optional ?engine=...&model=...
+    GET  /health
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from coalescing import request_key
+from corpus import get_corpus_index
+from engines import ENGINE_MODULES, run_engine
+from jobs import Job, get_job_queue
+from utils import prepare_paper
+
+_MAX_BODY_BYTES = int(float(os.getenv("SERVICE_MAX_BODY_MB", "50")) * 1024 * 1024)
+# Alle paar Sekunden Kommentar senden, damit Proxies die SSE-Verbindung offen lassen
+_SSE_KEEPALIVE_S = 15.0
+
+
+def _run_paper(engine: str, data: bytes, filename: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Extraktion, Vorverarbeitung (beide gecacht) und Pipeline. Läuft komplett im Job-Thread."""
+    analysis_context = prepare_paper(data, filename, config)
+    if not analysis_context.strip():
+        raise ValueError("Document contains no text")
+    return run_engine(engine, analysis_context, config)
+
+
+def submit_paper(engine: str, data: bytes, filename: str = "paper.txt", config: Optional[dict] = None) -> Job:
+    """
+    Legt Job an. Gleiche Datei + Engine + Config ergibt denselben Job.
+
+    Auch ohne HTTP nutzbar, z.B. aus Batch-Skripten im selben Prozess.
+    """
+    engine = engine.lower()
+    if engine not in ENGINE_MODULES:
+        raise ValueError(f"Unknown engine '{engine}', use one of: {', '.join(ENGINE_MODULES)}")
+    run_config = dict(config or {})
+    key = request_key("service", engine, hashlib.sha256(data).hexdigest(), filename.lower().endswith(".pdf"), run_config)
+    return get_job_queue().submit(engine, _run_paper, engine, data, filename, run_config, key=key)
+
+
+def _decode_paper(body: Dict[str, Any]) -> tuple:
+    if body.get("pdf_base64"):
+        try:
+            data = base64.b64decode(body["pdf_base64"], validate=True)
+        except (binascii.Error, ValueError) as exc:
+            raise ValueError(f"pdf_base64 is not valid base64: {exc}")
+        return data, str(body.get("filename") or "paper.pdf")
+    text = body.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("Send 'text' or 'pdf_base64'")
+    return text.encode("utf-8"), str(body.get("filename") or "paper.txt")
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "PaperAnalyzer/1.0"
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job_or_404(self, job_id: str) -> Optional[Job]:
+        job = get_job_queue().get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"Unknown job '{job_id}'"})
+        return job
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if parts == ["health"]:
+            self._send_json(200, {"status": "ok", "engines": list(ENGINE_MODULES)})
+        elif parts == ["jobs"]:
+            self._send_json(200, [job.to_dict(include_result=False) for job in get_job_queue().jobs()])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job_or_404(parts[1])
+            if job is not None:
+                self._send_json(200, job.to_dict(include_result=job.status == "done"))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._job_or_404(parts[1])
+            if job is not None:
+                self._stream_events(job)
+        elif parts and parts[0] == "papers" and len(parts) <= 2:
+            self._papers(parts[1] if len(parts) == 2 else "", query)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self) -> None:
+        if self.path.split("?", 1)[0].rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > _MAX_BODY_BYTES:
+            self._send_json(413 if length > 0 else 400, {"error": "Missing or too large request body"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length))
+            data, filename = _decode_paper(body)
+            job = submit_paper(str(body.get("engine") or "langchain"), data, filename, body.get("config"))
+        except (ValueError, TypeError, AttributeError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+        self._send_json(202, job.to_dict(include_result=False))
+
+    def _papers(self, doc_hash: str, query: Dict[str, str]) -> None:
+        index = get_corpus_index()
+        if index is None:
+            self._send_json(404, {"error": "Corpus index disabled"})
+        elif doc_hash:
+            entry = index.get(doc_hash, query.get("engine"), query.get("model"))
+            if entry is None:
+                self._send_json(404, {"error": f"Unknown document '{doc_hash}'"})
+            else:
+                self._send_json(200, entry)
+        else:
+            try:
+                limit = max(1, min(200, int(query.get("limit") or 20)))
+            except ValueError:
+                limit = 20
+            self._send_json(200, index.search(query.get("q", ""), limit))
+
+    def _stream_events(self, job: Job) -> None:
+        """
+        SSE bis Job fertig. Verbindung endet danach (HTTP/1.0, kein Chunking
+        nötig). Client kann jederzeit abbrechen, Job läuft weiter.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        last_status = None
+        last_write = time.time()
+        try:
+            while True:
+                if job.status != last_status:
+                    last_status = job.status
+                    self._write_event("status", job.to_dict(include_result=False))
+                    last_write = time.time()
+                if job.is_finished:
+                    self._write_event("result", job.to_dict())
+                    return
+                job.done.wait(1.0)
+                if time.time() - last_write > _SSE_KEEPALIVE_S:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    last_write = time.time()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_event(self, event: str, payload: Any) -> None:
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        self.wfile.write(f"event: {event}\ndata: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_request(self, code: Any = "-", size: Any = "-") -> None:
+        # Polling würde Konsole fluten. Nur Fehler loggen.
+        if str(code).startswith(("4", "5")):
+            super().log_request(code, size)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, workers: Optional[int] = None) -> None:
+    get_job_queue(workers)
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    print(f"Paper Analyzer service on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless HTTP service for the paper pipelines")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None, help="Parallel pipeline jobs (default: JOB_WORKERS or 4)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
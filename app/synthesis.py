@@ -0,0 +1,103 @@
+"""
+Cross-Paper-Synthese für Multi-File-Uploads.
+
+Jedes Paper läuft als eigene Pipeline (UI: ein Job pro Datei, Batch:
+worker_pool). Danach fasst synthesize() die Notes aller Paper zusammen.
+Bei vielen Papern hierarchisch: Gruppen zu je synthesis_batch Papern
+parallel zusammenfassen, dann deren Synthesen, bis eine übrig ist.
+Kein Prompt muss alle Paper auf einmal tragen.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures as cf
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from agents.synthesizer import SYNTHESIZER_PROMPT, run as run_synthesizer
+from cache_store import prompt_fingerprint, run_step
+from llm import configure, step_settings
+from telemetry import log_row
+from tracing import configure_tracing, run_in_context, span
+
+# Paper pro Synthese-Call. Notes sind kompakt, vier passen gut in einen Prompt.
+DEFAULT_SYNTHESIS_BATCH = 4
+
+
+def paper_sources(results: Dict[str, Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Pipeline-Ergebnisse pro Datei als Quellen. Ohne Notes (Fehler, leer) fällt Paper raus."""
+    return [
+        {"name": name, "text": str(result.get("structured") or "")}
+        for name, result in results.items()
+        if result and str(result.get("structured") or "").strip()
+    ]
+
+
+def _synthesize_group(config: dict, sources: List[Dict[str, str]]) -> str:
+    text, _ = run_step(
+        config, "synthesis", {"sources": sources}, step_settings(config, "integrator"),
+        lambda: run_synthesizer(sources), prompt_fingerprint(SYNTHESIZER_PROMPT),
+    )
+    return text
+
+
+def synthesize(sources: List[Dict[str, str]], config: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    Meta Summary über mehrere Paper. sources: [{"name": Datei, "text": Notes}].
+
+    Gruppen einer Ebene laufen gleichzeitig, Scheduler begrenzt Calls wie
+    sonst. Jede Gruppe geht über Step-Cache: kommt ein Paper dazu, laufen
+    nur Gruppen neu, deren Quellen sich geändert haben.
+    """
+    config_dict = config or {}
+    configure(config_dict)
+    configure_tracing(config_dict)
+    batch_size = max(2, int(config_dict.get("synthesis_batch") or DEFAULT_SYNTHESIS_BATCH))
+
+    started = time.perf_counter()
+    level = [dict(source) for source in sources]
+    levels = calls = 0
+    with span("synthesis", papers=len(level)) as synthesis_span:
+        while len(level) > 1:
+            groups = [level[i:i + batch_size] for i in range(0, len(level), batch_size)]
+            with cf.ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                # Ein Kontext pro Thread: Spans hängen unter "synthesis"
+                futures = [executor.submit(run_in_context(_synthesize_group), config_dict, group) for group in groups]
+                texts = [future.result() for future in futures]
+            if len(groups) == 1:
+                level = [{"name": "synthesis", "text": texts[0]}]
+            else:
+                # Gruppen-Name mit Dateien, damit obere Ebene weiß, was drin steckt
+                level = [
+                    {"name": "group: " + ", ".join(source["name"] for source in group), "text": text}
+                    for group, text in zip(groups, texts)
+                ]
+            levels += 1
+            calls += len(groups)
+        synthesis_text = level[0]["text"] if level else ""
+    latency_s = round(time.perf_counter() - started, 2)
+
+    if config_dict.get("csv_telemetry", True):
+        log_row({
+            "engine": "synthesis",
+            "model": step_settings(config_dict, "integrator")["model"],
+            "timestamp": datetime.now().isoformat(),
+            "papers": len(sources),
+            "synthesis_levels": levels,
+            "synthesis_calls": calls,
+            "meta_len": len(synthesis_text),
+            "latency_s": latency_s,
+            "prompt_tokens": synthesis_span.total("prompt_tokens"),
+            "completion_tokens": synthesis_span.total("completion_tokens"),
+            "steps_cached": synthesis_span.total("step_cached"),
+            "trace_id": synthesis_span.trace_id,
+        })
+
+    return {
+        "synthesis": synthesis_text,
+        "papers": [source["name"] for source in sources],
+        "levels": levels,
+        "calls": calls,
+        "latency_s": latency_s,
+    }
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-import os, csv
+import os, csv, threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: nur Thread-Lock
+    fcntl = None
 
 _DEFAULT_FIELDS: list[str] = [
     "engine", # "langchain" | "langgraph" | "dspy"
@@ -49,12 +55,47 @@ def _ensure_fields(row: dict) -> list[str]:
             fields.append(k)
     return fields
 
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(path: str):
+    """
+    Sperre für CSV-Datei über Threads und Prozesse (worker_pool.py).
+
+    Ohne Sperre können zwei Prozesse gleichzeitig Header prüfen und
+    Datei rotieren, dann gehen Zeilen verloren.
+    """
+    with _write_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def log_row(row: dict, path: str = "telemetry.csv"):
     """
     Write telemetry row to CSV.
 
     """
     row = dict(row or {})
+    with _locked(path):
+        _write_row(row, path)
+    run = _get_wandb()
+    if run:
+        try:
+            run.log(row)
+        except Exception:
+            pass
+
+
+def _write_row(row: dict, path: str) -> None:
     fields = _ensure_fields(row)
 
     exists = os.path.exists(path)
@@ -96,9 +137,3 @@ def log_row(row: dict, path: str = "telemetry.csv"):
         if not exists:
             w.writeheader()
         w.writerow(row)
-    run = _get_wandb()
-    if run:
-        try:
-            run.log(row)
-        except Exception:
-            pass
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Export optional: "file" (JSONL), "otlp" (OpenTelemetry Collector) oder leer (aus)
+_EXPORT_OFF = ("", "none", "off", "false", "0")
+
+
+def _export_mode(value: Any) -> str:
+    """"none"/"off"/False heißen aus, nicht "alles außer otlp ist file"."""
+    mode = str(value or "").strip().lower()
+    return "" if mode in _EXPORT_OFF else mode
+
+
+_TRACE_EXPORT = _export_mode(os.getenv("TRACE_EXPORT"))
+_TRACE_PATH = os.getenv("TRACE_PATH") or "traces.jsonl"
+_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME") or "multi_agent_orchestration"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_file_lock = threading.Lock()
+_otel_tracer = None
+
+
+class Span:
+    """
+    Ein Zeitabschnitt im Trace.
+
+    Angelehnt an OpenTelemetry: trace_id, span_id, parent_id, Start/Ende
+    und Attribute. Wurzel-Span sammelt alle beendeten Spans seines Traces.
+    So kann Pipeline am Ende Zeiten und Tokens auswerten, ohne Exporter.
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.parent = parent
+        self.root: Span = parent.root if parent is not None else self
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error = ""
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self.end_ns: Optional[int] = None
+        self.duration_s = 0.0
+        self.finished: List[Span] = []
+        self._lock = threading.Lock()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: float = 1) -> None:
+        """Zählt numerisches Attribut hoch (z.B. Tokens, HTTP-Versuche)."""
+        with self._lock:
+            self.attributes[key] = (self.attributes.get(key) or 0) + amount
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.duration_s = round(time.perf_counter() - self._start_perf, 4)
+        self.end_ns = self.start_ns + int(self.duration_s * 1e9)
+        with self.root._lock:
+            self.root.finished.append(self)
+
+    def total(self, key: str) -> float:
+        """Summiert ein Attribut über alle beendeten Spans im Trace."""
+        values = [s.attributes.get(key) for s in self.root.finished]
+        return sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+
+    def subtotal(self, key: str) -> float:
+        """Wie total(), aber nur dieser Span und seine Nachfahren. Für einzelne Calls in langem Trace."""
+        with self.root._lock:
+            finished = list(self.root.finished)
+        values = []
+        for s in finished:
+            ancestor = s
+            while ancestor is not None and ancestor is not self:
+                ancestor = ancestor.parent
+            if ancestor is self:
+                values.append(s.attributes.get(key))
+        return sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        """Beendete Spans relativ zum Trace-Start. Für UI und Ergebnis-Dict."""
+        ordered = sorted(self.root.finished, key=lambda s: s.start_ns)
+        return [
+            {
+                "name": s.name,
+                "parent": s.parent.name if s.parent is not None else None,
+                "offset_s": round((s.start_ns - self.root.start_ns) / 1e9, 3),
+                "duration_s": round(s.duration_s, 3),
+                **({"step": s.attributes["step"]} if "step" in s.attributes else {}),
+            }
+            for s in ordered
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_s": self.duration_s,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def configure_tracing(config: Optional[dict] = None) -> None:
+    """
+    Setzt Exporter aus Config. Wird wie llm.configure() pro Lauf aufgerufen.
+
+    Keys: trace_export ("file"/"otlp", aus mit ""/"none"/False), trace_path. Fehlt ein Key,
+    gilt Umgebungsvariable TRACE_EXPORT bzw. TRACE_PATH.
+    """
+    global _TRACE_EXPORT, _TRACE_PATH
+    config_dict = config or {}
+    if "trace_export" in config_dict:
+        _TRACE_EXPORT = _export_mode(config_dict.get("trace_export"))
+    if config_dict.get("trace_path"):
+        _TRACE_PATH = str(config_dict["trace_path"])
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Öffnet Span als Kind des aktuellen Spans.
+
+    Verschachtelung läuft über contextvars. Threads erben Kontext nicht
+    automatisch, dafür gibt es run_in_context().
+    """
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = "error"
+        current.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+        if parent is None:
+            _export_trace(current)
+
+
+def run_in_context(function):
+    """
+    Bindet aktuellen Kontext an Funktion für ThreadPoolExecutor.
+
+    Ohne das hängen Spans aus Worker-Threads nicht am richtigen Eltern-Span.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+
+def _export_trace(root: Span) -> None:
+    if not _TRACE_EXPORT:
+        return
+    spans = sorted(root.finished, key=lambda s: s.start_ns)
+    try:
+        if _TRACE_EXPORT == "otlp":
+            _export_otlp(spans)
+        else:
+            _export_file(spans)
+    except Exception:
+        # Tracing darf Pipeline nie abbrechen
+        pass
+
+
+def _export_file(spans: List[Span]) -> None:
+    with _file_lock:
+        with open(_TRACE_PATH, "a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+def _get_otel_tracer():
+    """OpenTelemetry optional, wie wandb in telemetry.py. Endpoint über OTEL_EXPORTER_OTLP_ENDPOINT."""
+    global _otel_tracer
+    if _otel_tracer is not None:
+        return _otel_tracer
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": _SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    _otel_tracer = provider.get_tracer("multi_agent_orchestration")
+    return _otel_tracer
+
+
+def _export_otlp(spans: List[Span]) -> None:
+    """
+    Spielt beendete Spans in OpenTelemetry nach.
+
+    Sortiert nach Start, daher existiert Eltern-Span immer vor Kind.
+    Start- und Endzeit werden explizit übergeben.
+    """
+    from opentelemetry import trace as otel_trace
+
+    tracer = _get_otel_tracer()
+    created: Dict[str, Any] = {}
+    for s in spans:
+        parent = created.get(s.parent.span_id) if s.parent is not None else None
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        attributes = {k: v for k, v in s.attributes.items() if isinstance(v, (str, bool, int, float))}
+        otel_span = tracer.start_span(s.name, context=context, start_time=s.start_ns, attributes=attributes)
+        if s.status == "error":
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, s.error))
+        created[s.span_id] = otel_span
+    for s in reversed(spans):
+        created[s.span_id].end(end_time=s.end_ns)
+
+
+def traced_http_client(timeout: Optional[float] = None):
+    """
+    httpx-Client, der jeden HTTP-Request als Span unter dem LLM-Span loggt.
+
+    Mehrere HTTP-Spans unter einem LLM-Span bedeuten Retries. Eltern-Span
+    zählt Versuche in "http_attempts".
+    """
+    import httpx
+
+    class _TracingTransport(httpx.HTTPTransport):
+        def handle_request(self, request):
+            parent = _current_span.get()
+            if parent is not None:
+                parent.add("http_attempts", 1)
+            with span("http.request", **{"http.method": request.method, "http.url": str(request.url)}) as http_span:
+                response = super().handle_request(request)
+                http_span.set_attribute("http.status_code", response.status_code)
+                return response
+
+    return httpx.Client(transport=_TracingTransport(), timeout=timeout)
@@ -1,7 +1,13 @@
 from __future__ import annotations
+import hashlib
+import os
 import re
 from typing import Dict, List, Tuple, Optional
 
+from cache_store import run_step
+from document import TITLE_PREFIX, DocumentIndex, extract_file_text, extract_title, index_document, text_hash
+from retrieval import rank_for_fields
+
 def _normalize_text(raw_text: str) -> str:
     """
     Behebt PDF-Formatierungsprobleme.
@@ -31,14 +37,14 @@ def _normalize_text(raw_text: str) -> str:
 _METADATA_KEYWORDS_PATTERN = r"(?:university|institute|faculty|department|school of|affiliation|corresponding author|preprint|arxiv|doi|copyright|acknowledg(e)?ments?)"
 
 
-def strip_meta_head(raw_text: str) -> str:
+def strip_meta_head(raw_text: str, document: Optional[DocumentIndex] = None) -> str:
     """
     Entfernt Metadaten-Header.
     
     PDFs haben oft Autorennamen, Zugehörigkeiten, E-Mails oben. Nicht nützlich
-    für Analyse. Scannen erste 200 Zeilen und filtern Metadaten-Muster heraus.
-    Nach Zeile 200 sind wir im eigentlichen Inhalt. Abstract, Einleitung usw.
-    Alles behalten.
+    für Analyse. Scannen Kopf bis zur ersten inhaltlichen Überschrift
+    (höchstens 200 Zeilen) und filtern Metadaten-Muster heraus. Danach sind
+    wir im eigentlichen Inhalt. Einleitung usw. Alles behalten.
     
     Muster etwas heuristisch. Probierte ML-basierte Klassifikation. War übertrieben.
     Einfache Regex schneller.
@@ -46,11 +52,17 @@ def strip_meta_head(raw_text: str) -> str:
     if not raw_text:
         return ""
     
-    text_lines = raw_text.splitlines()
+    document = document or index_document(raw_text)
+    head_end = min(document.head_end, len(raw_text))
+    # Schon gekürzter Kontext: nach erster Lücke kommen ausgewählte Blöcke, keine Metadaten
+    gap = raw_text.find(f"\n{_GAP_MARKER}\n", 0, head_end)
+    if gap >= 0:
+        head_end = gap + 1
+    text_lines = raw_text[:head_end].splitlines()
     cleaned_lines: List[str] = []
     
-    # Erste 200 Zeilen prüfen, Metadaten meist oben. Danach kommt Inhalt vom Paper.
-    for line_index, line in enumerate(text_lines[:200]):
+    # Nur Kopf prüfen, Metadaten meist oben. Danach kommt Inhalt vom Paper.
+    for line in text_lines:
         stripped_line = line.strip()
         
         if not stripped_line:
@@ -84,46 +96,400 @@ def strip_meta_head(raw_text: str) -> str:
         # Hat alle Filter überstanden, wahrscheinlich echter Inhalt
         cleaned_lines.append(line)
     
-    # Alles nach Zeile 200 ist meist Inhalt, alles behalten
-    cleaned_lines.extend(text_lines[200:])
+    # Alles nach dem Kopf ist Inhalt, alles behalten
+    cleaned_lines.append(raw_text[head_end:])
     
     return _normalize_text("\n".join(cleaned_lines))
 
 
-def strip_references_tail(raw_text: str) -> str:
+def strip_references_tail(raw_text: str, document: Optional[DocumentIndex] = None) -> str:
     if not raw_text:
         return ""
     
-    references_match = re.search(r"\n\s*(references|bibliography)\s*\n", raw_text, re.I)
-    
-    if references_match:
-        characters_after_match = len(raw_text) - references_match.start()
-        if characters_after_match > 800:
-            return raw_text[:references_match.start()].rstrip()
+    document = document or index_document(raw_text)
+    if document.references_start is not None:
+        return raw_text[:document.references_start].rstrip()
     
     return raw_text
 
 
+# Boilerplate und Kompression
+
+_PAGE_MARKER_PATTERN = re.compile(r"^\s*-+\s*page\s+\d+\s*-+\s*$", re.I)
+_PAGE_NUMBER_PATTERN = re.compile(r"^\s*(?:page\s+)?\d{1,3}(?:\s*(?:/|of)\s*\d{1,3})?\s*$", re.I)
+_TABLE_CAPTION_PATTERN = re.compile(r"^\s*table\s*\d", re.I)
+_CITATION_PATTERN = re.compile(r"^\s*\[\d+\]|arXiv:|\bet al\.|\bProc\.|\bPhys\. Rev\.", re.M)
+_NUMERIC_EVIDENCE_PATTERN = re.compile(r"\d+[.,]\d+|\d+\s*%|±|\bp\s*[<=]\s*0?[.,]\d+", re.I)
+
+# Gewicht pro Abschnitt. Abstract, Ergebnisse, Tabellen, Fazit zuerst.
+_SECTION_WEIGHTS = [
+    (r"abstract", 10.0),
+    (r"result|experiment|evaluation|benchmark|ablation", 9.0),
+    (r"conclusion|summary", 8.0),
+    (r"introduction", 7.0),
+    (r"discussion|limitation", 6.0),
+    (r"method|approach|model|architecture|framework|setup", 5.0),
+    (r"related work|background|prior work", 2.0),
+    (r"appendix|acknowledg|supplementary", 0.0),
+]
+_DEFAULT_SECTION_WEIGHT = 4.0
+_BLOCK_CHARS = 700
+_HEAD_CHARS = 1500
+
+
+def _near_page_break(lines: List[str], index: int, distance: int = 2) -> bool:
+    """
+    Zeile steht am Seitenrand: höchstens `distance` Zeilen bis Textanfang,
+    Textende oder Leerzeile. Seiten hängen mit Leerzeile aneinander
+    (extract_file_text), Form-Feeds werden beim Normalisieren zu Umbrüchen.
+    """
+    if index < distance or index >= len(lines) - distance:
+        return True
+    window = lines[index - distance:index + distance + 1]
+    return any(not line.strip() or "\f" in line for line in window)
+
+
+def _table_line_indices(lines: List[str]) -> set:
+    """
+    Zeilen, die zu einer Tabelle gehören.
+
+    Ab "Table N" bis zur nächsten Leerzeile (höchstens 40 Zeilen), dazu
+    jede Zeile mit mindestens zwei Zahlenwerten. Zeilenbeschriftungen wie
+    "BERT-base" wiederholen sich in Tabellen oft, das ist keine Kopfzeile.
+    """
+    indices: set[int] = set()
+    remaining = 0
+    for index, line in enumerate(lines):
+        if _TABLE_CAPTION_PATTERN.match(line):
+            remaining = 40
+        elif not line.strip():
+            remaining = 0
+        if remaining > 0:
+            indices.add(index)
+            remaining -= 1
+        elif len(_VALUE_PATTERN.findall(line)) >= 2:
+            indices.add(index)
+    return indices
+
+
+def _strip_page_boilerplate(raw_text: str) -> str:
+    """
+    Entfernt Seitenmarker, Seitenzahlen und wiederholte Kopf-/Fußzeilen.
+
+    Kopfzeilen erkennt man daran, dass dieselbe kurze Zeile auf vielen
+    Seiten vorkommt. Ab 4 Vorkommen fliegt sie raus, außer in Tabellen.
+    Reine Zahlen gelten nur am Seitenrand als Seitenzahl, sonst sind es
+    oft Tabellenzellen. Zeilen ohne Buchstaben bleiben sonst immer.
+    """
+    if not raw_text:
+        return ""
+    lines = raw_text.splitlines()
+    in_table = _table_line_indices(lines)
+    counts: Dict[str, int] = {}
+    for line in lines:
+        key = line.strip()
+        if 3 <= len(key) <= 80 and re.search(r"[A-Za-z]", key):
+            counts[key] = counts.get(key, 0) + 1
+    kept: List[str] = []
+    for index, line in enumerate(lines):
+        if _PAGE_MARKER_PATTERN.match(line):
+            continue
+        if _PAGE_NUMBER_PATTERN.match(line) and _near_page_break(lines, index):
+            continue
+        if index not in in_table and counts.get(line.strip(), 0) >= 4:
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _section_weight(heading: str) -> float:
+    lowered = (heading or "").lower()
+    for pattern, weight in _SECTION_WEIGHTS:
+        if re.search(pattern, lowered):
+            return weight
+    return _DEFAULT_SECTION_WEIGHT
+
+
+def _split_blocks(text: str) -> List[Tuple[int, str, str]]:
+    """
+    Teilt Text in Blöcke (Index, Überschrift, Text).
+
+    Abschnittsgrenzen kommen aus dem DocumentIndex. PDF-Text hat kaum
+    Leerzeilen zwischen Absätzen. Darum innerhalb eines Abschnitts Blöcke
+    von ca. _BLOCK_CHARS Zeichen an Zeilengrenzen.
+    """
+    document = index_document(text)
+    spans: List[Tuple[str, int, int]] = []
+    first_start = document.sections[0].start if document.sections else len(text)
+    if first_start > 0:
+        spans.append(("", 0, first_start))
+    spans.extend((section.heading, section.start, section.end) for section in document.sections)
+
+    blocks: List[Tuple[int, str, str]] = []
+    for heading, start, end in spans:
+        current: List[str] = []
+        current_len = 0
+        for line in text[start:end].splitlines():
+            current.append(line)
+            current_len += len(line) + 1
+            if current_len >= _BLOCK_CHARS:
+                blocks.append((len(blocks), heading, "\n".join(current)))
+                current, current_len = [], 0
+        if current:
+            blocks.append((len(blocks), heading, "\n".join(current)))
+    return blocks
+
+
+def _score_block(heading: str, block: str) -> float:
+    """
+    Wichtigkeit eines Blocks: Abschnittsgewicht plus numerische Evidenz.
+
+    Zahlen wie 87.3, 12%, ±0.3, p<0.05 geben Bonus. So bleiben genau die
+    Stellen drin, die detect_quantitative_signal und Reader brauchen.
+    Tabellen bekommen Bonus, Bildunterschriften ohne Zahlen Abzug.
+    Literaturlisten ohne "References"-Überschrift haben viele Jahreszahlen
+    und Bandnummern. Die erkennen wir an Zitat-Mustern und werten sie ab.
+    """
+    if len(_CITATION_PATTERN.findall(block)) >= 3:
+        return -5.0
+    score = _section_weight(heading)
+    score += 1.5 * min(len(_NUMERIC_EVIDENCE_PATTERN.findall(block)), 6)
+    lowered = block.lower()
+    if re.search(r"^\s*table\s*\d", block, re.I | re.M):
+        score += 4.0
+    elif re.search(r"^\s*(?:figure|fig\.)\s*\d", block, re.I | re.M) and not _NUMERIC_EVIDENCE_PATTERN.search(block):
+        score -= 3.0
+    if any(kw in lowered for kw in ("accuracy", "f1", "bleu", "rouge", "auc", "outperform")):
+        score += 1.0
+    return score
+
+
+def compress_to_budget(text: str, token_budget: int) -> str:
+    """
+    Extraktive Kompression auf Token-Budget.
+
+    Ist Text kleiner als Budget, bleibt er unverändert. Sonst: Blöcke
+    bewerten, beste Blöcke bis Budget nehmen, in Originalreihenfolge
+    zurückgeben. Anfang (Titel, Abstract-Beginn) bleibt immer drin.
+    Lücken werden mit "[...]" markiert, damit Reader sieht, dass gekürzt wurde.
+    Marker und Zeilenumbrüche zählen mit. Ergebnis passt so ins Budget, und
+    zweiter Durchlauf (App, dann Pipeline) ändert nichts mehr.
+
+    Kein LLM nötig, läuft in Millisekunden. Wir haben Zusammenfassen
+    per LLM überlegt. Kostet aber genau die Latenz, die wir sparen wollen.
+    """
+    if not text or token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text
+    blocks = _split_blocks(text)
+    budget_chars = 4 * token_budget
+    selected, used = _select_head(blocks, budget_chars)
+
+    ranked = sorted(blocks, key=lambda b: (-_score_block(b[1], b[2]), b[0]))
+    for index, heading, block in ranked:
+        if index in selected:
+            continue
+        cost = _block_chars(block)
+        if used + cost > budget_chars:
+            continue
+        selected.add(index)
+        used += cost
+    return _join_blocks(blocks, selected)
+
+
+def retrieve_to_budget(text: str, token_budget: int, top_k: int = 3) -> str:
+    """
+    Wie compress_to_budget, aber Auswahl per BM25 pro Schema-Feld.
+
+    Kopf bleibt. Danach reihum pro Feld (Methoden, Datasets, Results,
+    Limitations) der nächstbeste Block, bis top_k pro Feld oder Budget
+    erreicht. Jedes Feld bekommt so Evidenz, auch wenn ein Abschnitt
+    (z.B. lange Ergebnistabellen) sonst alles verdrängen würde.
+    Kosten wie bei compress_to_budget inklusive Marker, zweiter Durchlauf
+    (App, dann Pipeline) ändert Text darum nicht mehr.
+    """
+    if not text or token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text
+    blocks = _split_blocks(text)
+    budget_chars = 4 * token_budget
+    selected, used = _select_head(blocks, budget_chars)
+    # Überschrift mit indexieren: Block unter "4 Experiments" passt zu Results-Query
+    rankings = rank_for_fields([f"{heading}\n{block}" for _, heading, block in blocks], top_k)
+    for rank in range(top_k):
+        for field_ranking in rankings.values():
+            if rank >= len(field_ranking) or field_ranking[rank] in selected:
+                continue
+            index, _, block = blocks[field_ranking[rank]]
+            cost = _block_chars(block)
+            if used + cost > budget_chars:
+                continue
+            selected.add(index)
+            used += cost
+    return _join_blocks(blocks, selected)
+
+
+_GAP_MARKER = "[...]"
+
+
+def _block_chars(block: str) -> int:
+    """Zeichen, die ein Block im Ergebnis kostet: Text, Umbruch, im schlimmsten Fall Lückenmarker davor."""
+    return len(block) + 1 + len(_GAP_MARKER) + 1
+
+
+def _select_head(blocks: List[Tuple[int, str, str]], budget_chars: int) -> Tuple[set, int]:
+    """
+    Kopf immer behalten: Titel und Abstract stehen dort. Gibt (Indizes, Zeichen) zurück.
+
+    Erster Block bleibt auch bei winzigem Budget, weitere nur solange sie passen.
+    """
+    selected: set[int] = set()
+    used = 0
+    head_len = 0
+    for index, _, block in blocks:
+        if head_len >= _HEAD_CHARS or (selected and used + _block_chars(block) > budget_chars):
+            break
+        selected.add(index)
+        head_len += len(block)
+        used += _block_chars(block)
+    return selected, used
+
+
+def _join_blocks(blocks: List[Tuple[int, str, str]], selected: set) -> str:
+    parts: List[str] = []
+    previous = -1
+    for index, _, block in blocks:
+        if index not in selected:
+            continue
+        if previous >= 0 and index != previous + 1:
+            parts.append(_GAP_MARKER)
+        parts.append(block)
+        previous = index
+    return "\n".join(parts)
+
+
+# "compress": Heuristik nach Abschnitt und Zahlen. "bm25": Blöcke pro Reader-Feld per BM25 (retrieval.py)
+CONTEXT_STRATEGIES = ("compress", "bm25")
+
+
+def _context_strategy(config: Optional[dict]) -> str:
+    """Strategie aus Config (context_strategy) oder Env CONTEXT_STRATEGY. Unbekannt heißt compress."""
+    value = str((config or {}).get("context_strategy") or os.getenv("CONTEXT_STRATEGY", "compress")).lower()
+    return value if value in CONTEXT_STRATEGIES else "compress"
+
+
+def _retrieval_top_k(config: Optional[dict]) -> int:
+    try:
+        return max(1, int((config or {}).get("retrieval_top_k") or 3))
+    except (TypeError, ValueError):
+        return 3
+
+
+def _context_token_budget(config: Optional[dict]) -> int:
+    """Budget aus Config (context_token_budget) oder Env CONTEXT_TOKEN_BUDGET. 0 schaltet ab."""
+    value = (config or {}).get("context_token_budget")
+    if value is None:
+        value = os.getenv("CONTEXT_TOKEN_BUDGET", "8000")
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
 # Public API
 
+def estimate_tokens(text: str) -> int:
+    """
+    Grobe Token-Schätzung, ca. 4 Zeichen pro Token.
+
+    Reicht für Rate-Limits und Budgets. tiktoken wäre genauer, ist aber
+    nicht in requirements und kennt nicht jedes Modell.
+    """
+    return (len(text or "") + 3) // 4
+
+
 def build_analysis_context(raw_text: str, config: dict) -> str:
     """
     Bereitet Text vor für Analyse.
 
-    Normalisiert PDF-Formatierung. Entfernt Metadaten und Referenzen.
+    Normalisiert PDF-Formatierung. Entfernt Metadaten und Referenzen,
+    Kopf-/Fußzeilen nur bei Text über Budget. Ist Text danach noch größer
+    als Token-Budget, wird er extraktiv gekürzt: compress_to_budget oder, mit context_strategy="bm25",
+    retrieve_to_budget (top-k Blöcke pro Reader-Feld).
+
+    Titel wird vorher lokal bestimmt und als erste Zeile "Title: ..."
+    vorangestellt. strip_meta_head würde Titel in GROSSBUCHSTABEN sonst
+    wegfiltern, und Reader muss ihn nicht mehr suchen.
     """
     cleaned_text = _normalize_text(raw_text or "")
-    cleaned_text = strip_meta_head(cleaned_text)
-    cleaned_text = strip_references_tail(cleaned_text)
+    known_title = extract_title(cleaned_text) if cleaned_text.startswith(TITLE_PREFIX) else ""
+    if known_title:
+        # Titel aus PDF-Layout oder früherem Durchlauf, Zeile nicht doppelt behalten
+        cleaned_text = cleaned_text.split("\n", 1)[1] if "\n" in cleaned_text else ""
+    token_budget = _context_token_budget(config)
+    if token_budget and estimate_tokens(cleaned_text) > token_budget:
+        # Kurze Paper bleiben unangetastet, Zahlenzeilen in Tabellen gehen sonst leicht verloren
+        cleaned_text = _strip_page_boilerplate(cleaned_text)
+    # Einmal parsen. Referenzen zuerst abschneiden, dann bleiben Kopf-Offsets gültig.
+    document = index_document(cleaned_text)
+    known_title = known_title or extract_title(cleaned_text, document)
+    cleaned_text = strip_references_tail(cleaned_text, document)
+    cleaned_text = strip_meta_head(cleaned_text, document)
+    if token_budget and known_title:
+        # Titelzeile kommt danach dazu und zählt mit
+        token_budget = max(1, token_budget - estimate_tokens(f"{TITLE_PREFIX} {known_title}\n"))
+    if _context_strategy(config) == "bm25":
+        cleaned_text = retrieve_to_budget(cleaned_text, token_budget, _retrieval_top_k(config))
+    else:
+        cleaned_text = compress_to_budget(cleaned_text, token_budget)
+    if known_title:
+        cleaned_text = f"{TITLE_PREFIX} {known_title}\n{cleaned_text}"
     return cleaned_text
 
 
+# Bei Änderungen an Extraktion oder Vorverarbeitung hochzählen, sonst liefert Cache alte Texte
+_PREPARE_VERSION = 2
+
+
+def prepare_paper(data: bytes, file_name: str, config: Optional[dict] = None) -> str:
+    """
+    Datei-Bytes zu Analyse-Kontext, beide Stufen über Step-Cache.
+
+    PDF-Text per Datei-Hash, Kontext per Text-Hash + Budget. Cache ist eine
+    SQLite-Datei, darum teilen Worker-Prozesse und Service die Ergebnisse.
+    PDF-Parsen und Regex-Vorverarbeitung sind der CPU-Teil eines Laufs.
+    """
+    is_pdf = file_name.lower().endswith(".pdf")
+    raw_text, _ = run_step(
+        config,
+        "pdf_text",
+        {"sha256": hashlib.sha256(data).hexdigest(), "pdf": is_pdf},
+        {"version": _PREPARE_VERSION},
+        lambda: extract_file_text(data, file_name),
+    )
+    context, _ = run_step(
+        config,
+        "context",
+        {"text": text_hash(raw_text)},
+        {
+            "version": _PREPARE_VERSION,
+            "context_token_budget": _context_token_budget(config),
+            "context_strategy": _context_strategy(config),
+            "retrieval_top_k": _retrieval_top_k(config),
+        },
+        lambda: build_analysis_context(raw_text, config or {}),
+    )
+    return context
+
+
 _METRIC_KEYWORDS = [
     "table", "%", "p=", "p<", "±", "≈",
     "accuracy", "f1", "rouge", "bleu", "em", "auc"
 ]
 
 
+NO_METRICS_SENTENCE = "No quantitative metrics reported in provided text."
+_VALUE_PATTERN = re.compile(r"(?<![\w.\-])\d+(?:[.,]\d+)?(?![\w])")
+
+
 def _is_plausible_metric_number(number_text: str) -> bool:
     cleaned = re.sub(r"[^\d]", "", number_text or "")
     if not cleaned:
@@ -194,6 +560,21 @@ def detect_quantitative_signal(text: str) -> Dict[str, object]:
     }
 
 
+def extract_numbers(text: str) -> set[str]:
+    """
+    Zahlenwerte im Text, ohne Jahreszahlen.
+
+    Komma wird zu Punkt, damit "87,3" und "87.3" gleich sind. Für Vergleiche
+    wie "steht diese Zahl auch in NOTES?". Teile von Wörtern (GPT-4, F1)
+    zählen nicht.
+    """
+    return {
+        match.group(0).replace(",", ".")
+        for match in _VALUE_PATTERN.finditer(text or "")
+        if _is_plausible_metric_number(match.group(0))
+    }
+
+
 def _extract_results_block(notes_text: str) -> str:
     if not notes_text:
         return ""
@@ -227,8 +608,45 @@ def count_numeric_results(notes_text: str) -> int:
     return count
 
 
+_TITLE_LINE_PATTERN = re.compile(r"^([ \t#*-]*\**Title\**\s*:\**)[ \t]*([^\n]*)$", re.I | re.M)
+
+
+def read_title(text: str) -> str:
+    """Erste Title-Zeile aus Notes/Summary, ohne Markdown. Leer wenn keine."""
+    match = _TITLE_LINE_PATTERN.search(text or "")
+    return match.group(2).strip(" *") if match else ""
+
+
+def enforce_title(text: str, title: str) -> str:
+    """
+    Setzt Title-Zeile deterministisch auf bekannten Titel.
+
+    LLMs kürzen oder "verbessern" Titel gern. Ist Titel lokal bekannt,
+    überschreiben wir erste Title-Zeile (auch "**Title:**") oder stellen
+    sie voran. Ohne bekannten Titel bleibt Text unverändert.
+    """
+    if not title or not text:
+        return text
+    if _TITLE_LINE_PATTERN.search(text):
+        return _TITLE_LINE_PATTERN.sub(lambda m: f"{m.group(1)} {title}", text, count=1)
+    return f"{TITLE_PREFIX} {title}\n{text}"
+
+
 def extract_confidence_line(meta_text: str) -> str:
     if not meta_text:
         return ""
     match = re.search(r"Confidence\s*:\s*([^\n]+)", meta_text, re.I)
     return match.group(0).strip() if match else ""
+
+
+def extract_improvements(critic_text: str) -> str:
+    """
+    Improvements-Teil aus Critic-Text für Summarizer-Rework.
+
+    Alles nach "Improvements:", auch lokal angehängte Precritic-Punkte.
+    Ohne Abschnitt ganzer Text, Scores helfen Summarizer aber kaum.
+    """
+    if not critic_text:
+        return ""
+    match = re.search(r"Improvements\s*:\s*(.*)", critic_text, re.I | re.S)
+    return (match.group(1) if match else critic_text).strip()
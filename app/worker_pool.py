@@ -0,0 +1,139 @@
+"""
+Batch-Modus über mehrere Prozesse.
+
+Ein Prozess hängt am GIL: PDF-Parsen und Regex-Vorverarbeitung blockieren
+die anderen Läufe. Hier bekommt jedes Paper einen Worker-Prozess, die
+Queue ist die Pipe von ProcessPoolExecutor. Caches für PDF-Text,
+Vorverarbeitung und LLM-Antworten liegen in derselben SQLite-Datei
+(cache_store, WAL), alle Worker lesen und schreiben dort.
+
+Start (aus Projekt-Root):
+    python app/worker_pool.py --engine langgraph --processes 4 test_papers/*.pdf > results.jsonl
+
+Ausgabe: eine JSON-Zeile pro Paper auf stdout, Zusammenfassung auf stderr.
+Mit --synthesize folgt eine letzte Zeile {"synthesis": ...} über alle Paper
+(synthesis.py), berechnet im Elternprozess aus den Notes der Worker.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures as cf
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from engines import ENGINE_MODULES, run_engine
+
+_worker_config: Dict[str, Any] = {}
+
+
+def _init_worker(config: Dict[str, Any], processes: int) -> None:
+    """
+    Läuft einmal pro Worker-Prozess.
+
+    Rate-Limits zählt der Scheduler pro Prozess. Darum Limits durch Anzahl
+    Prozesse teilen, sonst schicken N Worker zusammen N-mal zu viel.
+    """
+    from scheduler import get_scheduler
+
+    global _worker_config
+    scheduler = get_scheduler()
+    _worker_config = dict(config)
+    _worker_config["rate_limit_rpm"] = max(1, int(config.get("rate_limit_rpm") or scheduler.rpm) // processes)
+    _worker_config["rate_limit_tpm"] = max(1, int(config.get("rate_limit_tpm") or scheduler.tpm) // processes)
+    _worker_config["max_concurrency"] = max(1, int(config.get("max_concurrency") or scheduler.max_concurrency) // processes)
+
+
+def _process_paper(path: str, engine: str) -> Dict[str, Any]:
+    # Engine erst im Worker importieren (run_engine): LangChain-Worker laden kein DSPy
+    from utils import prepare_paper
+
+    started = time.perf_counter()
+    analysis_context = prepare_paper(Path(path).read_bytes(), Path(path).name, _worker_config)
+    prepare_s = time.perf_counter() - started
+    if not analysis_context.strip():
+        raise ValueError("Document contains no text")
+    # Wie UI und Service über run_engine: --reuse greift, Lauf landet im Korpus
+    result = run_engine(engine, analysis_context, _worker_config)
+    return {
+        "path": path,
+        "engine": engine,
+        "pid": os.getpid(),
+        "prepare_s": round(prepare_s, 3),
+        "result": result,
+    }
+
+
+def run_batch(
+    paths: Iterable[str],
+    engine: str = "langchain",
+    config: Optional[dict] = None,
+    processes: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Verteilt Paper auf Worker-Prozesse. Liefert Ergebnisse in Fertig-Reihenfolge.
+
+    spawn statt fork: Elternprozess kann schon Threads haben (Scheduler,
+    HTTP-Client), fork kopiert deren Locks in halbem Zustand.
+    Fehler pro Paper kommen als {"path", "engine", "error"} zurück.
+    """
+    engine = engine.lower()
+    if engine not in ENGINE_MODULES:
+        raise ValueError(f"Unknown engine '{engine}', use one of: {', '.join(ENGINE_MODULES)}")
+    path_list = [str(path) for path in paths]
+    processes = max(1, min(processes or os.cpu_count() or 1, len(path_list) or 1))
+    with cf.ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(dict(config or {}), processes),
+    ) as pool:
+        futures = {pool.submit(_process_paper, path, engine): path for path in path_list}
+        for future in cf.as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as exc:
+                yield {"path": futures[future], "engine": engine, "error": f"{type(exc).__name__}: {exc}"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse many papers with a pool of worker processes")
+    parser.add_argument("paths", nargs="+", help="PDF or TXT files")
+    parser.add_argument("--engine", default="langchain", choices=sorted(ENGINE_MODULES))
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--config", default="{}", help="JSON config like in the UI, e.g. '{\"model\": \"gpt-4o-mini\"}'")
+    parser.add_argument("--fast", action="store_true", help="Fused fast mode: 2 LLM calls per paper instead of 4")
+    parser.add_argument("--synthesize", action="store_true", help="Cross-paper Meta Summary after all papers")
+    parser.add_argument("--reuse", action="store_true", help="Reuse stored results of the same or near-duplicate papers")
+    args = parser.parse_args()
+    batch_config = json.loads(args.config)
+    if args.fast:
+        batch_config["fast_mode"] = True
+    if args.reuse:
+        batch_config["reuse_prior_analyses"] = True
+
+    batch_started = time.perf_counter()
+    done = failed = 0
+    results: Dict[str, Dict[str, Any]] = {}
+    for item in run_batch(args.paths, args.engine, batch_config, args.processes):
+        print(json.dumps(item, ensure_ascii=False, default=str), flush=True)
+        failed += 1 if "error" in item else 0
+        done += 1
+        if "result" in item:
+            results[item["path"]] = item["result"]
+    if args.synthesize and len(results) > 1:
+        from synthesis import paper_sources, synthesize
+
+        # Reihenfolge wie auf Kommandozeile, nicht Fertig-Reihenfolge: gleiche Gruppen, Step-Cache greift
+        ordered = {path: results[path] for path in args.paths if path in results}
+        print(json.dumps(synthesize(paper_sources(ordered), batch_config), ensure_ascii=False), flush=True)
+    elapsed = time.perf_counter() - batch_started
+    print(
+        f"{done} papers ({failed} failed) in {elapsed:.1f}s, {done / elapsed if elapsed else 0:.2f} papers/s",
+        file=sys.stderr,
+    )
@@ -0,0 +1,833 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+from datetime import datetime
+import concurrent.futures as cf
+import json, os, re
+
+import dspy
+from dspy.utils.exceptions import AdapterParseError
+
+from agents.precritic import run as run_precritic
+from cache_store import prompt_fingerprint, run_step
+from coalescing import get_coalescer, request_key
+from scheduler import configure_scheduler, get_scheduler
+from tracing import configure_tracing, run_in_context, span
+from document import extract_title
+from agents.fused import CALLS_SAVED, FUSED_CALLS, FUSED_SCHEMAS, TRUNCATION_RETRY_FACTOR
+from agents.reader import PaperNotes, render_notes
+from llm import AGENT_STEPS, agent_config, fused_settings, schema_token_floor, structured_output_rejected
+from utils import count_numeric_results, enforce_title, estimate_tokens, extract_confidence_line, read_title
+
+# Use CSV telemetry
+try:
+    from telemetry import log_row
+except Exception:
+    def log_row(_row: dict):
+        pass
+
+
+# DSPy configuration
+def _configure_dspy(cfg: Optional[Dict[str, Any]] = None):
+    """
+    Konfiguriert DSPy. Nutzt LiteLLM für Provider.
+    
+    DSPy nutzt eigene LM-Abstraktion, nicht von LangChain. Wir
+    konfigurieren (Modell, Temperatur usw.), aber über dspy.LM.
+    LiteLLM-Integration erlaubt, gleiche API-Keys und Base-URLs zu nutzen.
+    
+    Wird einmal pro Lauf der Pipeline aufgerufen, wie bei LangChain configure().
+    LM wird zurückgegeben und per dspy.settings.context() gesetzt, nicht
+    global. Global darf nur der Thread ändern, der zuerst konfiguriert hat.
+    Parallele Läufe aus Worker-Threads scheitern sonst.
+    """
+    cfg = cfg or {}
+    model = cfg.get("model", "gpt-4.1")
+    base = cfg.get("api_base") or os.getenv("OPENAI_BASE_URL")
+    api_key = cfg.get("api_key") or os.getenv("OPENAI_API_KEY", "")
+    temperature = float(cfg.get("temperature", 0.0))
+    max_tokens = int(cfg.get("max_tokens", 4096))
+
+    lm = dspy.LM(
+        model=model,
+        api_base=base,
+        api_key=api_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        # Retries über unseren Scheduler, wie bei LangChain
+        num_retries=0,
+    )
+    configure_scheduler(cfg)
+    return lm
+
+
+def _sanitize(s: str) -> str:
+    """
+    Entfernt JSON-Fragmente und Leerzeilen aus Ausgabe von LLM.
+    
+    Manchmal Ausgabe in JSON wie {"result": "..."},
+    auch wenn wir nicht danach fragen. Dies entfernt das. Vorallem bei Ollama LLMs notwendig gewesen.
+    Manche Modelle sehr großzügig mit Leerzeichen.
+    
+    Wir versuchten aggressiver zu sein (JSON richtig parsen). Das brach,
+    wenn Ausgabe kein gültiges JSON war.
+    """
+    s = re.sub(r"^\s*[{[]\s*|\s*[}\]]\s*$", "", s or "", flags=re.S)
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    return s.strip()
+
+
+def _predict_traced(predictor, step: str, **inputs):
+    """
+    Ruft DSPy-Predictor als "llm.call"-Span auf.
+
+    DSPy geht über LiteLLM, nicht über unseren LangChain-Client. Tokens
+    kommen aus DSPy-Usage-Tracking dieses Calls (track_usage, pro Kontext).
+    Letzter History-Eintrag des LM reicht nicht: beim Teleprompting rufen
+    mehrere Threads dasselbe LM. Cache-Treffer von DSPy zählen keine Tokens,
+    landen als cache_hit im Span. Rate-Limits, Retries und Zusammenfassen
+    gleichzeitiger identischer Calls wie bei den LangChain-Agents.
+    """
+    # Agent-Override (set_lm) vor globalem LM
+    lm = predictor.lm or dspy.settings.lm
+    model_name = getattr(lm, "model", "")
+    lm_kwargs = dict(getattr(lm, "kwargs", {}) or {})
+    estimated_tokens = sum(estimate_tokens(str(v)) for v in inputs.values()) + int(lm_kwargs.get("max_tokens") or 0)
+    # Demos gehören zum Prompt: optimierter Summarizer darf nicht mit Basis-Summarizer zusammenfallen
+    demos = [dict(d) for d in getattr(predictor, "demos", []) or []]
+    key = request_key(step, predictor.signature.__name__, demos, inputs, model_name, lm_kwargs)
+    with span("llm.call", step=step, model=model_name) as llm_span:
+        out, coalesced = get_coalescer().run(
+            key,
+            lambda: get_scheduler().run(model_name, estimated_tokens, lambda: _predict_with_usage(predictor, inputs)),
+        )
+        llm_span.set_attribute("coalesced", coalesced)
+        if not coalesced:
+            usage = next(iter((out.get_lm_usage() or {}).values()), None) or {}
+            llm_span.set_attribute("prompt_tokens", int(usage.get("prompt_tokens") or 0))
+            llm_span.set_attribute("completion_tokens", int(usage.get("completion_tokens") or 0))
+            prompt_details = usage.get("prompt_tokens_details") or {}
+            if not isinstance(prompt_details, dict):
+                prompt_details = getattr(prompt_details, "__dict__", {}) or {}
+            llm_span.set_attribute("cached_tokens", int(prompt_details.get("cached_tokens") or 0))
+            llm_span.set_attribute("cache_hit", not usage)
+    return out
+
+
+def _predict_fused(predictor, step: str, **inputs):
+    """
+    Wie _predict_traced, bei Parse-Fehler einmal mit mehr max_tokens.
+
+    Fusionierte Signaturen tragen zwei Ausgaben. Ist Budget zu knapp, fehlt
+    das zweite Feld und der Adapter wirft AdapterParseError. Zweiter Versuch
+    auf Kopie des Predictors, set_lm des Originals bleibt unverändert.
+    """
+    try:
+        return _predict_traced(predictor, step, **inputs)
+    except AdapterParseError:
+        lm = predictor.lm or dspy.settings.lm
+        budget = int((getattr(lm, "kwargs", {}) or {}).get("max_tokens") or 0)
+        if not budget:
+            raise
+        retry = predictor.deepcopy()
+        retry.lm = lm.copy(max_tokens=TRUNCATION_RETRY_FACTOR * budget)
+        return _predict_traced(retry, step, **inputs)
+
+
+def _predict_with_usage(predictor, inputs: Dict[str, Any]):
+    with dspy.context(track_usage=True):
+        return predictor(**inputs)
+
+
+# Signatures
+class ReadNotes(dspy.Signature):
+    """Extract structured scientific notes from TEXT. Work ONLY with the provided TEXT.
+    If an item is not explicitly stated, write 'not reported'. Do NOT invent facts.
+    Do NOT include author names, emails, or affiliations.
+    Return structured notes following this schema:
+    Title: <copy the 'Title:' line at the start of TEXT, else the paper title or 'not reported'>
+    Objective: <1-2 sentences or 'not reported'>
+    Methods:
+    - <technique/model>
+    - <dataset or setup>
+    - <tools/frameworks>
+    Results:
+    <EITHER list quantitative outcomes as bullets OR, if none exist anywhere in the provided TEXT, write exactly this single sentence on its own line: No quantitative metrics reported in provided text.>
+    Limitations: <text or 'not reported'>
+    Takeaways:
+    - <bullet>
+    - <bullet>
+    - <bullet>
+    If the text contains the word 'Table', you MUST extract at least 2 numeric entries from the nearest table region.
+    If tables or metrics are present, extract numeric values exactly as written. If no numbers exist, write exactly: No quantitative metrics reported in provided text.
+    NEVER guess or interpolate metrics."""
+    TEXT: str = dspy.InputField(desc="The scientific paper text to extract notes from")
+    NOTES: str = dspy.OutputField(desc="Structured scientific notes following the schema above, no JSON, no extra prose")
+
+
+class ReadPaperNotes(dspy.Signature):
+    """Extract structured scientific notes from TEXT. Work ONLY with the provided TEXT.
+    If an item is not explicitly stated, write 'not reported' or leave the list empty. Do NOT invent facts.
+    Do NOT include author names, emails, or affiliations.
+    Title: copy the 'Title:' line at the start of TEXT, else the paper title or 'not reported'.
+    results: one item per quantitative outcome, split into task, metric and value. Copy values exactly as written.
+    If the text contains the word 'Table', extract at least 2 numeric entries from the nearest table region.
+    If no numbers exist, results is an empty list. NEVER guess or interpolate metrics."""
+    TEXT: str = dspy.InputField(desc="The scientific paper text to extract notes from")
+    NOTES: PaperNotes = dspy.OutputField(desc="Typed scientific notes")
+
+
+class Summarize(dspy.Signature):
+    """Produce a concise scientific summary from NOTES.
+    Cover in this order: Objective -> Method (what/how) -> Results (numbers if present; otherwise write exactly 'No quantitative metrics reported in provided text.')
+    -> Limitations -> 3-5 Practical Takeaways (bulleted).
+    Avoid speculation or citations. Do NOT invent metrics; if NOTES Results contains the exact sentence
+    'No quantitative metrics reported in provided text.', then the summary Results must use that exact sentence and contain no numbers."""
+    NOTES: str = dspy.InputField(desc="Structured scientific notes")
+    SUMMARY: str = dspy.OutputField(desc="Scientific summary covering objective, method, results, limitations, and takeaways")
+
+
+class Critique(dspy.Signature):
+    """Critique SUMMARY against NOTES. Judge for makes sense, accuracy, coverage, and details.
+    Return a rubric with scores 0-5 for each dimension, followed by improvement suggestions.
+    Format:
+    Makes sense: <0-5>
+    Accuracy: <0-5>
+    Coverage: <0-5>
+    Details: <0-5>
+    Improvements:
+    - <short fix #1>
+    - <short fix #2>
+    - <optional fix #3>"""
+    NOTES: str = dspy.InputField(desc="Original structured notes (ground truth)")
+    SUMMARY: str = dspy.InputField(desc="Summary to be critiqued")
+    CRITIC: str = dspy.OutputField(desc="Critique with rubric scores and improvement suggestions")
+
+
+class Integrate(dspy.Signature):
+    """Create an executive meta-summary by fusing SUMMARY with CRITIC feedback, grounded strictly in NOTES.
+    Do not invent metrics or citations. Provide a concise meta-summary covering:
+    Objective (one sentence), Method (one sentence), Results (one sentence), Limitations (one sentence),
+    Takeaways (3 bullets), Open Questions (2 questions), and Confidence level (High/Medium/Low).
+    Confidence: High if all rubric scores ≥4; Medium if any score is 3; Low if any score ≤2.
+
+    STRICT RESULTS RULE:
+    - If NOTES Results contains quantitative metrics/outcomes, Results MUST include at least one (preferably two) concrete numeric outcomes with context, copied from NOTES without changing the numbers.
+    - If NOTES Results contains the exact sentence 'No quantitative metrics reported in provided text.', then Results must be exactly: No quantitative metrics reported in provided text. (and contain no numbers)."""
+    NOTES: str = dspy.InputField(desc="Original structured notes (ground truth)")
+    SUMMARY: str = dspy.InputField(desc="Summary to integrate")
+    CRITIC: str = dspy.InputField(desc="Critique feedback with rubric scores")
+    META: str = dspy.OutputField(desc="Executive meta-summary with objective, method, results, limitations, takeaways, open questions, and confidence")
+
+
+# Fast-Mode: je zwei Signatures in einer. DSPy fordert mehrere Output-Felder
+# in einer Antwort an, das ist hier unser Structured Output.
+class ReadAndSummarize(dspy.Signature):
+    """Extract structured scientific notes from TEXT, then summarize your own notes. Work ONLY with the provided TEXT.
+    NOTES: typed notes. If an item is not explicitly stated, write 'not reported' or leave the list empty. Do NOT invent facts or include author info.
+    results: one item per quantitative outcome (task, metric, value), values exactly as written; empty if TEXT has no numbers.
+    NEVER guess or interpolate metrics.
+    SUMMARY: concise summary from NOTES in this order: Objective -> Method -> Results (numbers only if present in NOTES,
+    otherwise exactly 'No quantitative metrics reported in provided text.') -> Limitations -> 3-5 Practical Takeaways (bulleted)."""
+    TEXT: str = dspy.InputField(desc="The scientific paper text to extract notes from")
+    NOTES: PaperNotes = dspy.OutputField(desc="Typed scientific notes")
+    SUMMARY: str = dspy.OutputField(desc="Scientific summary of NOTES covering objective, method, results, limitations, and takeaways")
+
+
+class ReviewAndIntegrate(dspy.Signature):
+    """Critique SUMMARY against NOTES, then write an executive meta-summary that applies your critique.
+    CRITIC format:
+    Makes sense: <0-5>
+    Accuracy: <0-5>
+    Coverage: <0-5>
+    Details: <0-5>
+    Improvements:
+    - <short fix #1>
+    - <short fix #2>
+    META: grounded strictly in NOTES, no invented metrics or citations. Cover Objective, Method, Results, Limitations
+    (one sentence each), Takeaways (3 bullets), Open Questions (2 questions), and Confidence level (High/Medium/Low).
+    Confidence: High if all rubric scores ≥4; Medium if any score is 3; Low if any score ≤2.
+    Results must copy numeric outcomes from NOTES unchanged, or be exactly: No quantitative metrics reported in provided text."""
+    NOTES: str = dspy.InputField(desc="Original structured notes (ground truth)")
+    SUMMARY: str = dspy.InputField(desc="Summary to be critiqued")
+    CRITIC: str = dspy.OutputField(desc="Critique with rubric scores and improvement suggestions")
+    META: str = dspy.OutputField(desc="Executive meta-summary with objective, method, results, limitations, takeaways, open questions, and confidence")
+
+
+# jedes Module wickelt DSPy Signature in ein Module
+class ReaderM(dspy.Module):
+    """
+    Reader-Modul mit deklarativer Signature.
+    
+    DSPy erzeugt das Prompt aus der ReadNotes-Signature. Wir schreiben
+    keine Prompts manuell - beschreiben nur, was wir wollen. _sanitize()
+    bereinigt JSON-Formatierung, die das LLM hinzufügen könnte. Manche
+    Modelle wickeln Ausgabe in {} ein.
+
+    structured=True: ReadPaperNotes mit PaperNotes als Ausgabetyp. DSPy
+    parst und validiert, NOTES ist dann render_notes() wie bei LangChain.
+    Schlägt Parsen fehl (abgeschnittenes JSON) oder lehnt Provider das
+    Schema ab, läuft ReadNotes als Markdown-Reader.
+    """
+    def __init__(self, structured: bool = False):
+        super().__init__()
+        self.structured = structured
+        self.gen = dspy.Predict(ReadPaperNotes if structured else ReadNotes)
+        self.markdown = dspy.Predict(ReadNotes) if structured else self.gen
+
+    def forward(self, text: str):
+        notes = None
+        if self.structured:
+            try:
+                notes = render_notes(_predict_traced(self.gen, "reader", TEXT=text).NOTES)
+            except AdapterParseError:
+                notes = None
+            except Exception as exc:
+                if not structured_output_rejected(exc):
+                    raise
+        if notes is None:
+            notes = _sanitize(_predict_traced(self.markdown, "reader", TEXT=text).NOTES)
+        # Titel lokal bekannt: deterministisch setzen, wie im LangChain-Reader
+        return dspy.Prediction(NOTES=enforce_title(notes, extract_title(text)))
+
+
+class SummarizerM(dspy.Module):
+    """
+    Summarizer, der Zusammenfassungen aus Notizen mit
+    Signatures erstellt.
+    
+    Unterstützt sowohl 'notes' als auch 'NOTES' Parameternamen. Mancher Code
+    nutzt Kleinbuchstaben, manche Großbuchstaben. Akzeptieren beide für Flexibilität.
+    """
+    def __init__(self):
+        super().__init__()
+        self.gen = dspy.Predict(Summarize)
+
+    def forward(self, notes: str = None, NOTES: str = None):
+        input_notes = NOTES if NOTES is not None else notes
+        if input_notes is None:
+            raise ValueError("Either 'notes' or 'NOTES' must be provided")
+        out = _predict_traced(self.gen, "summarizer", NOTES=input_notes)
+        return dspy.Prediction(SUMMARY=enforce_title(_sanitize(out.SUMMARY), read_title(input_notes)))
+
+
+class CriticM(dspy.Module):
+    """Critic module that critiques summaries using declarative signatures."""
+    def __init__(self):
+        super().__init__()
+        self.gen = dspy.Predict(Critique)
+
+    def forward(self, notes: str, summary: str):
+        out = _predict_traced(self.gen, "critic", NOTES=notes, SUMMARY=summary)
+        return dspy.Prediction(CRITIC=_sanitize(out.CRITIC))
+
+
+class IntegratorM(dspy.Module):
+    """Integrator module that creates meta-summaries using declarative signatures."""
+    def __init__(self):
+        super().__init__()
+        self.gen = dspy.Predict(Integrate)
+
+    def forward(self, notes: str, summary: str, critic: str):
+        out = _predict_traced(self.gen, "integrator", NOTES=notes, SUMMARY=summary, CRITIC=critic)
+        return dspy.Prediction(META=enforce_title(_sanitize(out.META), read_title(notes)))
+
+
+class FusedReaderM(dspy.Module):
+    """Fast-Mode: Reader und Summarizer in einem LM-Call."""
+    def __init__(self):
+        super().__init__()
+        self.gen = dspy.Predict(ReadAndSummarize)
+
+    def forward(self, text: str):
+        out = _predict_fused(self.gen, "reader+summarizer", TEXT=text)
+        notes = enforce_title(render_notes(out.NOTES), extract_title(text))
+        return dspy.Prediction(NOTES=notes, SUMMARY=enforce_title(_sanitize(out.SUMMARY), read_title(notes)))
+
+
+class FusedReviewM(dspy.Module):
+    """Fast-Mode: Critic und Integrator in einem LM-Call."""
+    def __init__(self):
+        super().__init__()
+        self.gen = dspy.Predict(ReviewAndIntegrate)
+
+    def forward(self, notes: str, summary: str):
+        out = _predict_fused(self.gen, "critic+integrator", NOTES=notes, SUMMARY=summary)
+        return dspy.Prediction(CRITIC=_sanitize(out.CRITIC), META=enforce_title(_sanitize(out.META), read_title(notes)))
+
+
+# Pipeline für alle Module
+# Ähnlich wie LangChain sequenzieller Ansatz, aber Module sind deklarativ
+# (Signatures) statt (Prompt-Strings)
+def _cached_step(cfg: Dict[str, Any], step: str, module, inputs: Dict[str, Any], call):
+    """
+    Step-Cache wie in LangChain/LangGraph (cache_store.run_step).
+
+    Einstellungen kommen aus aktivem LM, Fingerprint aus Signature plus
+    Demos. Nach Teleprompting mit neuen Demos passt alter Eintrag nicht.
+    """
+    lm = module.gen.lm or dspy.settings.lm
+    lm_kwargs = {k: v for k, v in (getattr(lm, "kwargs", {}) or {}).items() if k != "api_key"}
+    settings = {"engine": "dspy", "model": getattr(lm, "model", ""), **lm_kwargs}
+    predictor = module.gen
+    demos = [dict(d) for d in getattr(predictor, "demos", []) or []]
+    fingerprint = prompt_fingerprint(json.dumps(
+        [predictor.signature.__name__, predictor.signature.instructions, demos],
+        sort_keys=True, default=str,
+    ))
+    value, _ = run_step(cfg, step, inputs, settings, call, fingerprint)
+    return value
+
+
+class PaperPipeline(dspy.Module):
+    def __init__(self, cfg: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.cfg = cfg or {}
+        # Lokaler Vor-Check wie in LangChain/LangGraph (agents.precritic)
+        self.precritic = self.cfg.get("precritic", True)
+        self.reader = ReaderM(structured=bool(self.cfg.get("structured_notes", True)))
+        self.summarizer = SummarizerM()
+        self.critic = CriticM()
+        self.integrator = IntegratorM()
+        # Eigenes LM für Agents mit Overrides in cfg["agents"], wie get_llm(step) bei LangChain
+        for step in self.cfg.get("agents") or {}:
+            if step in AGENT_STEPS:
+                getattr(self, step).set_lm(_configure_dspy(agent_config(self.cfg, step)))
+        if self.reader.structured:
+            # PaperNotes-JSON braucht mehr als kleine Presets, wie agents.reader.structured_max_tokens
+            reader_cfg = agent_config(self.cfg, "reader")
+            floor = schema_token_floor(PaperNotes)
+            if int(reader_cfg.get("max_tokens", 4096)) < floor:
+                self.reader.gen.lm = _configure_dspy({**reader_cfg, "max_tokens": floor})
+        self.fast_mode = bool(self.cfg.get("fast_mode"))
+        if self.fast_mode:
+            # Modell des ersten Agents, max_tokens für beide Ausgaben (llm.fused_settings)
+            self.fused_read = FusedReaderM()
+            self.fused_review = FusedReviewM()
+            for name, steps in FUSED_CALLS.items():
+                settings = fused_settings(self.cfg, steps, FUSED_SCHEMAS[name])
+                fused_cfg = {**agent_config(self.cfg, steps[0]), "max_tokens": settings["max_tokens"]}
+                getattr(self, f"fused_{name}").set_lm(_configure_dspy(fused_cfg))
+
+    def forward(self, input_text: str):
+        if self.fast_mode:
+            return self._forward_fast(input_text)
+        # Zeit messen über Spans, wie in LangChain und LangGraph
+        with span("reader", step="reader") as reader_span:
+            notes = _cached_step(self.cfg, "reader", self.reader, {"content": input_text},
+                                 lambda: self.reader(input_text).NOTES)
+        with span("summarizer", step="summarizer") as summarizer_span:
+            summary = _cached_step(self.cfg, "summarizer", self.summarizer, {"notes": notes},
+                                   lambda: self.summarizer(NOTES=notes).SUMMARY)
+        with span("critic", step="critic") as critic_span:
+            local_check = run_precritic(notes, summary)
+            if self.precritic and local_check["passed"]:
+                critic = local_check["critic"]
+                critic_span.set_attribute("critic_skipped", 1)
+            else:
+                critic = _cached_step(self.cfg, "critic", self.critic, {"notes": notes, "summary": summary},
+                                      lambda: self.critic(notes, summary).CRITIC)
+                if local_check["issues"]:
+                    critic = critic + "\n" + "\n".join(f"- {issue}" for issue in local_check["issues"])
+        with span("integrator", step="integrator") as integrator_span:
+            meta = _cached_step(self.cfg, "integrator", self.integrator,
+                                {"notes": notes, "summary": summary, "critic": critic},
+                                lambda: self.integrator(notes, summary, critic).META)
+
+        return dspy.Prediction(
+            NOTES=notes, SUMMARY=summary, CRITIC=critic, META=meta,
+            reader_s=round(reader_span.duration_s, 2),
+            summarizer_s=round(summarizer_span.duration_s, 2),
+            critic_s=round(critic_span.duration_s, 2),
+            integrator_s=round(integrator_span.duration_s, 2),
+        )
+
+    def _forward_fast(self, input_text: str):
+        with span("reader", step="reader+summarizer", fused=1) as reader_span:
+            read = _cached_step(self.cfg, "fused_read", self.fused_read, {"content": input_text},
+                                lambda: dict(self.fused_read(input_text).items()))
+        notes, summary = read["NOTES"], read["SUMMARY"]
+        with span("integrator", step="critic+integrator", fused=1) as integrator_span:
+            review = _cached_step(self.cfg, "fused_review", self.fused_review, {"notes": notes, "summary": summary},
+                                  lambda: dict(self.fused_review(notes, summary).items()))
+            critic = review["CRITIC"]
+            local_check = run_precritic(notes, summary)
+            if local_check["issues"]:
+                critic = critic + "\n" + "\n".join(f"- {issue}" for issue in local_check["issues"])
+        return dspy.Prediction(
+            NOTES=notes, SUMMARY=summary, CRITIC=critic, META=review["META"],
+            reader_s=round(reader_span.duration_s, 2),
+            summarizer_s=0.0,
+            critic_s=0.0,
+            integrator_s=round(integrator_span.duration_s, 2),
+        )
+
+
+# Optionale Teleprompting
+def _agent_models(cfg: Dict[str, Any]) -> Dict[str, str]:
+    return {f"{step}_model": agent_config(cfg, step).get("model", "gpt-4.1") for step in AGENT_STEPS}
+
+
+def _word_f1(pred: str, gold: str) -> float:
+    ps = set(w.lower() for w in re.findall(r"\w+", pred))
+    gs = set(w.lower() for w in re.findall(r"\w+", gold))
+    if not ps or not gs:
+        return 0.0
+    prec = len(ps & gs) / len(ps)
+    rec = len(ps & gs) / len(gs)
+    return 0.0 if (prec + rec) == 0 else (2 * prec * rec) / (prec + rec)
+
+
+def _load_devset(path: str) -> List[Dict[str, str]]:
+    if not os.path.exists(path):
+        return []
+    examples: List[Dict[str, str]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+                text = obj.get("text", "")
+                gold = obj.get("target_summary", "")
+                if text and gold:
+                    examples.append({
+                        "text": text,
+                        "target_summary": gold,
+                        "target_length": obj.get("target_length", "medium"),
+                        "prompt_focus": obj.get("prompt_focus", "Results"),
+                    })
+            except Exception:
+                continue
+    return examples
+
+
+# Teleprompt-Ziel. "f1": kompilierter Summarizer gewinnt, wie bisher.
+# "cost": Word-F1 minus Tokens und Latenz pro Call, bester Kandidat
+# innerhalb teleprompt_f1_tolerance zum besten F1.
+TELEPROMPT_OBJECTIVES = ("f1", "cost")
+# F1-Punkte Abzug pro 1000 Tokens (Prompt + Completion) bzw. pro Sekunde
+DEFAULT_TOKEN_WEIGHT = 0.05
+DEFAULT_LATENCY_WEIGHT = 0.02
+DEFAULT_F1_TOLERANCE = 0.02
+
+
+def _teleprompt_objective(cfg: Dict[str, Any]) -> str:
+    """Ziel aus Config (teleprompt_objective). Unbekannt heißt f1."""
+    value = str(cfg.get("teleprompt_objective") or "f1").lower()
+    return value if value in TELEPROMPT_OBJECTIVES else "f1"
+
+
+def _teleprompt_threads(cfg: Dict[str, Any]) -> int:
+    """Threads für Dev-Set-Durchläufe. Standard: so viele Calls, wie Scheduler gleichzeitig erlaubt."""
+    return max(1, int(cfg.get("teleprompt_threads") or get_scheduler().max_concurrency))
+
+
+def _parallel_map(function: Callable, items: Sequence, threads: int) -> list:
+    """
+    function über items im Thread-Pool, Reihenfolge bleibt.
+
+    Ein Kontext pro Aufgabe (run_in_context): dspy.context(lm=...) und
+    Spans gelten so auch in Worker-Threads. Wie bei DSPy Evaluate, nur
+    mit unseren Spans und Scheduler-Limits.
+    """
+    if threads <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    with cf.ThreadPoolExecutor(max_workers=min(threads, len(items))) as executor:
+        futures = [executor.submit(run_in_context(function), item) for item in items]
+        return [future.result() for future in futures]
+
+
+def _with_demos(program, demos: list):
+    candidate = program.deepcopy()
+    candidate.gen.demos = list(demos)
+    return candidate
+
+
+def _estimated_prompt_tokens(predictor, inputs: Dict[str, Any]) -> int:
+    """Prompt wie DSPy ihn baut (Signature, Demos, Eingaben), geschätzt. Braucht keinen Call."""
+    adapter = dspy.settings.adapter or dspy.ChatAdapter()
+    messages = adapter.format(predictor.signature, list(predictor.demos or []), inputs)
+    return sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+
+
+def _summary_cost(program, notes: str) -> Dict[str, Any]:
+    """
+    Summary plus Kosten dieses Calls.
+
+    Tokens aus Usage des LM-Calls. Bei LM-Cache-Treffer oder
+    zusammengefasstem Call gibt es keine, dann Schätzung aus Prompt und
+    Ausgabe. Latenz nur bei echtem Call (inkl. Wartezeit im Scheduler).
+    """
+    with span("teleprompt.eval", step="summarizer", demos=len(program.gen.demos or [])) as eval_span:
+        summary = program(NOTES=notes).SUMMARY
+    prompt_tokens = int(eval_span.subtotal("prompt_tokens"))
+    billed = prompt_tokens > 0
+    return {
+        "summary": summary,
+        "prompt_tokens": prompt_tokens if billed else _estimated_prompt_tokens(program.gen, {"NOTES": notes}),
+        "completion_tokens": int(eval_span.subtotal("completion_tokens")) if billed else estimate_tokens(summary),
+        "latency_s": round(eval_span.duration_s, 3) if billed else None,
+    }
+
+
+def _candidate_stats(program, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mittelwerte pro Call über Dev-Set."""
+    count = len(rows) or 1
+    latencies = [row["latency_s"] for row in rows if row.get("latency_s") is not None]
+    return {
+        "demos": len(program.gen.demos or []),
+        "f1": sum(row["f1"] for row in rows) / count,
+        "prompt_tokens": sum(row["prompt_tokens"] for row in rows) / count,
+        "completion_tokens": sum(row["completion_tokens"] for row in rows) / count,
+        "latency_s": sum(latencies) / len(latencies) if latencies else None,
+    }
+
+
+def _select_program(candidates: List[Dict[str, Any]], objective: str, cfg: Dict[str, Any]) -> int:
+    """
+    Setzt "objective" pro Kandidat, liefert Index des gewählten.
+
+    Latenz zählt nur, wenn jeder Kandidat gemessen ist. Kam einer aus
+    LM-Cache, wäre er sonst unfair schnell. Im Toleranzband gewinnt
+    höchster Objective-Wert, bei Gleichstand weniger Demos.
+    """
+    token_weight = float(cfg.get("teleprompt_token_weight", DEFAULT_TOKEN_WEIGHT))
+    latency_weight = float(cfg.get("teleprompt_latency_weight", DEFAULT_LATENCY_WEIGHT))
+    use_latency = all(candidate["latency_s"] is not None for candidate in candidates)
+    for candidate in candidates:
+        tokens = candidate["prompt_tokens"] + candidate["completion_tokens"]
+        latency_cost = latency_weight * candidate["latency_s"] if use_latency else 0.0
+        candidate["objective"] = candidate["f1"] - token_weight * tokens / 1000.0 - latency_cost
+    if objective == "f1":
+        # Wie bisher: kompiliertes Programm, steht immer zuletzt
+        return len(candidates) - 1
+    tolerance = float(cfg.get("teleprompt_f1_tolerance", DEFAULT_F1_TOLERANCE))
+    best_f1 = max(candidate["f1"] for candidate in candidates)
+    eligible = [i for i, candidate in enumerate(candidates) if candidate["f1"] >= best_f1 - tolerance]
+    return max(eligible, key=lambda i: (candidates[i]["objective"], -candidates[i]["demos"]))
+
+
+def _teleprompt_if_requested(pipeline: PaperPipeline, cfg: Dict[str, Any]):
+    """
+    Optimiert Pipeline mit BootstrapFewShot.
+    
+    Statt Prompts manuell zu tunen, liefern wir Beispiele. DSPy findet
+    dann bessere Strategien. BootstrapFewShot probiert verschiedene Few-Shot-
+    Kombinationen. Es wählt das Beste nach Wort-F1. Wir optimieren nur
+    Summarizer als Beispiel. Zwar versuchten wir alle Modules zu optimieren aber
+    Summarizer hat größten Einfluss. Vollständige Optimierung zu langsam.
+    
+    max_bootstrapped_demos=3 Grenze ist daher Kompromiss. Mehr Demos =
+    bessere Optimierung, aber exponentiell langsamer. Wir probierten
+    5 und 10. Die Gewinne waren das lange Warten nicht wert daher 3.
+
+    Reader-Notizen fürs Dev-Set und Bewertung der Kandidaten laufen
+    parallel (teleprompt_threads) und über Step-Cache, Schlüssel ist
+    Beispieltext. Zweiter Lauf mit gleichem Dev-Set kostet dafür keine Calls.
+
+    BootstrapFewShot nimmt jede Demo, die Metrik besteht. Jede Demo macht
+    aber jeden Summarizer-Call länger. teleprompt_objective="cost"
+    bewertet darum auch kürzere Demo-Listen (Basis ohne Demos, 1..n) nach
+    F1, Tokens und Latenz pro Call. Ergebnis meldet Tokens pro Call und
+    Mehrkosten gegenüber Basis, auch bei objective="f1".
+    """
+    if not cfg.get("dspy_teleprompt"):
+        return
+    dev_path = cfg.get("dspy_dev_path", "dev-set/dev.jsonl")
+    dev = _load_devset(dev_path)
+    if not dev:
+        return
+
+    # Metriken
+    # Wort-F1 ist einfach aber effektiv.
+    def _metric(gold, pred, trace=None):
+        pred_text = ""
+        if hasattr(pred, "SUMMARY"):
+            pred_text = str(pred.SUMMARY)
+        elif isinstance(pred, dict):
+            pred_text = str(pred.get("SUMMARY", ""))
+        else:
+            pred_text = str(pred)
+        gold_text = str(gold) if gold else ""
+        return _word_f1(pred_text, gold_text)
+
+    tp = dspy.teleprompt.BootstrapFewShot(
+        metric=_metric,
+        max_bootstrapped_demos=3, # mit 3 eher klein wegen Geschwindigkeit
+        max_labeled_demos=3, # hier auch
+    )
+    threads = _teleprompt_threads(cfg)
+
+    # Reader ausführen, für Notizen. Das sieht Summarizer tatsächlich
+    def _dev_notes(text: str) -> str:
+        return _cached_step(cfg, "reader", pipeline.reader, {"content": text}, lambda: pipeline.reader(text).NOTES)
+
+    dev_notes = _parallel_map(_dev_notes, [entry["text"] for entry in dev], threads)
+    trainset = []
+    note_gold_pairs: List[Tuple[str, str]] = []
+    target_lengths: set[str] = set()
+    prompt_focuses: set[str] = set()
+    for entry, notes in zip(dev, dev_notes):
+        gold = entry["target_summary"]
+        trainset.append(dspy.Example(NOTES=notes, SUMMARY=gold).with_inputs("NOTES"))
+        note_gold_pairs.append((notes, gold))
+        # Metadaten für Reporting, was Dev-Set abdeckt
+        target_lengths.add(entry.get("target_length") or "medium")
+        prompt_focuses.add(entry.get("prompt_focus") or "Results")
+
+    if not trainset:
+        return
+
+    objective = _teleprompt_objective(cfg)
+    # Hier findet DSPy bessere Prompt-Beispiele
+    optimized_summarizer = tp.compile(pipeline.summarizer, trainset=trainset)
+    demos = list(optimized_summarizer.gen.demos or [])
+    demo_counts = range(1, len(demos) + 1) if objective == "cost" else [len(demos)]
+    # Basis zuerst, kompiliertes Programm zuletzt
+    programs = [pipeline.summarizer] + [_with_demos(optimized_summarizer, demos[:count]) for count in demo_counts]
+
+    # Kandidaten bewerten, alle Paare in einem Durchlauf. Testen auf demselben Dev-Set,
+    # auf dem wir trainieren. Ziel: bessere Prompts finden, nicht Generalisierung zu messen.
+    def _evaluate(job: Tuple[int, Tuple[str, str]]) -> Tuple[int, Dict[str, Any]]:
+        index, (notes, gold) = job
+        program = programs[index]
+        record = _cached_step(cfg, "teleprompt_eval", program, {"notes": notes}, lambda: _summary_cost(program, notes))
+        return index, {**record, "f1": _metric(gold, record["summary"])}
+
+    jobs = [(index, pair) for index in range(len(programs)) for pair in note_gold_pairs]
+    evaluated = _parallel_map(_evaluate, jobs, threads)
+    candidates = [
+        _candidate_stats(program, [row for row_index, row in evaluated if row_index == index])
+        for index, program in enumerate(programs)
+    ]
+    chosen_index = _select_program(candidates, objective, cfg)
+    pipeline.summarizer = programs[chosen_index]
+
+    base, chosen = candidates[0], candidates[chosen_index]
+    base_score, optimized_score = base["f1"], chosen["f1"]
+    gain = optimized_score - base_score
+    tokens_per_call = round(chosen["prompt_tokens"] + chosen["completion_tokens"])
+    token_overhead = tokens_per_call - round(base["prompt_tokens"] + base["completion_tokens"])
+    choice = f"BootstrapFewShot(demos={chosen['demos']}, objective={objective})"
+
+    summary_line = (
+        f"Teleprompt gain {gain:+.3f} (baseline {base_score:.3f} → optimized {optimized_score:.3f}); "
+        f"{tokens_per_call} tokens/call ({token_overhead:+d} vs baseline); "
+        f"{len(trainset)} dev examples; lengths={sorted(target_lengths)}; focus={sorted(prompt_focuses)}."
+    )
+
+    return {
+        "gain": round(gain, 3),
+        "base_score": round(base_score, 3),
+        "optimized_score": round(optimized_score, 3),
+        "choice": choice,
+        "summary": summary_line,
+        "examples": len(trainset),
+        "target_lengths": sorted(target_lengths),
+        "prompt_focus": sorted(prompt_focuses),
+        "objective": objective,
+        "tokens_per_call": tokens_per_call,
+        "token_overhead": token_overhead,
+        "candidates": [
+            {key: (round(value, 3) if isinstance(value, float) else value) for key, value in candidate.items()}
+            for candidate in candidates
+        ],
+    }
+
+
+# Public API
+def run_pipeline(input_text: str, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    cfg = cfg or {}
+    lm = _configure_dspy(cfg)
+    configure_tracing(cfg)
+
+    pipe = PaperPipeline(cfg)
+    with dspy.settings.context(lm=lm):
+        teleprompt_info = None
+        # Teleprompting optimiert Summarizer, den Fast-Mode nicht nutzt
+        if cfg.get("dspy_teleprompt") and not pipe.fast_mode:
+            with span("teleprompt", engine="dspy"):
+                teleprompt_info = _teleprompt_if_requested(pipe, cfg)
+
+        # Pipeline-Span misst Latenz direkt. Teleprompting läuft als eigener
+        # Trace davor und zählt nicht mit.
+        with span("pipeline", engine="dspy") as pipeline_span:
+            out = pipe(input_text=input_text)
+    metrics_count = count_numeric_results(out.NOTES)
+    confidence_line = extract_confidence_line(out.META)
+    final_latency = pipeline_span.duration_s
+
+    result = {
+        "structured": out.NOTES,
+        "summary": out.SUMMARY,
+        "critic": out.CRITIC,
+        "meta": out.META,
+        "reader_s": out.reader_s,
+        "summarizer_s": out.summarizer_s,
+        "critic_s": out.critic_s,
+        "integrator_s": out.integrator_s,
+        "latency_s": round(final_latency, 2),
+        "input_chars": len(input_text or ""),
+        "graph_dot": None,
+        "dspy_available": True,
+        "execution_trace": ["reader", "summarizer", "critic", "integrator"],
+        "trace_id": pipeline_span.trace_id,
+        "span_timeline": pipeline_span.timeline(),
+        "extracted_metrics_count": metrics_count,
+        "critic_skipped": pipeline_span.total("critic_skipped"),
+        "steps_cached": pipeline_span.total("step_cached"),
+        "fast_mode": pipe.fast_mode,
+        "calls_saved": CALLS_SAVED if pipe.fast_mode else 0,
+        **_agent_models(cfg),
+        "confidence": confidence_line,
+    }
+    if teleprompt_info:
+        result.update({
+            "teleprompt_gain": teleprompt_info["gain"],
+            "teleprompt_choice": teleprompt_info["choice"],
+            "teleprompt_base_score": teleprompt_info["base_score"],
+            "teleprompt_optimized_score": teleprompt_info["optimized_score"],
+            "teleprompt_dev_examples": teleprompt_info["examples"],
+            "teleprompt_target_lengths": teleprompt_info["target_lengths"],
+            "teleprompt_prompt_focus": teleprompt_info["prompt_focus"],
+            "teleprompt_summary": teleprompt_info["summary"],
+            "teleprompt_objective": teleprompt_info["objective"],
+            "teleprompt_tokens_per_call": teleprompt_info["tokens_per_call"],
+            "teleprompt_token_overhead": teleprompt_info["token_overhead"],
+            "teleprompt_candidates": teleprompt_info["candidates"],
+        })
+        result["meta"] = result["meta"] + "\n\n" + teleprompt_info["summary"]
+
+    if cfg.get("csv_telemetry", True):
+        try:
+            log_row({
+                "engine": "dspy",
+                "model": cfg.get("model", ""),
+                **_agent_models(cfg),
+                "max_tokens": cfg.get("max_tokens", 0),
+                "temperature": cfg.get("temperature", 0.0),
+                "timestamp": datetime.now().isoformat(),
+                "input_chars": len(input_text or ""),
+                "summary_len": len(result["summary"]),
+                "meta_len": len(result["meta"]),
+                "latency_s": result["latency_s"],
+                "reader_s": result["reader_s"],
+                "summarizer_s": result["summarizer_s"],
+                "critic_s": result["critic_s"],
+                "integrator_s": result["integrator_s"],
+                "extracted_metrics_count": metrics_count,
+                "confidence": confidence_line,
+                "prompt_tokens": pipeline_span.total("prompt_tokens"),
+                "completion_tokens": pipeline_span.total("completion_tokens"),
+                "cached_tokens": pipeline_span.total("cached_tokens"),
+                "critic_skipped": pipeline_span.total("critic_skipped"),
+                "steps_cached": pipeline_span.total("step_cached"),
+                "fast_mode": int(pipe.fast_mode),
+                "calls_saved": result["calls_saved"],
+                "teleprompt_objective": result.get("teleprompt_objective", ""),
+                "teleprompt_token_overhead": result.get("teleprompt_token_overhead", ""),
+                "trace_id": pipeline_span.trace_id,
+            })
+        except Exception:
+            pass
+
+    return result
@@ -2,15 +2,25 @@
 from __future__ import annotations
 
 from datetime import datetime
-from time import perf_counter
 from typing import Any, Dict, Optional
 
-from agents.critic import run as run_critic
-from agents.integrator import run as run_integrator
-from agents.reader import run as run_reader
-from agents.summarizer import run as run_summarizer
-from llm import configure
+from agents.critic import CRITIC_PROMPT, run as run_critic
+from agents.fused import (
+    CALLS_SAVED,
+    FUSED_CALLS,
+    FUSED_READ_PROMPT,
+    FUSED_REVIEW_PROMPT,
+    FUSED_SCHEMAS,
+    run_read as run_fused_read,
+    run_review as run_fused_review,
+)
+from agents.integrator import INTEGRATOR_PROMPT, run as run_integrator
+from agents.reader import reader_prompt, run as run_reader
+from agents.summarizer import SUMMARIZER_PROMPT, run as run_summarizer
+from cache_store import prompt_fingerprint, run_step
+from llm import agent_models, configure, fused_settings, step_settings
 from telemetry import log_row
+from tracing import configure_tracing, span
 from utils import (
     build_analysis_context,
     count_numeric_results,
@@ -23,6 +33,8 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
     LangChain Pipeline sequenziell.
     
     Linearer Ablauf: reader -> summarizer -> critic -> integrator.
+    fast_mode=True: reader+summarizer und critic+integrator als je ein
+    Call. Halb so viele Round Trips, NOTES nur einmal gesendet statt dreimal.
     Kein bedingtes Routing oder Schleifen. Wir dachten über Fehlerbehandlung
     zwischen Schritten nach. Allerding minimal, um Muster zu zeigen.
     Das ist absichtlich einfach. Retry-Logik oder Fallbacks nach würden es schwerer machen
@@ -31,52 +43,103 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
     """
     config_dict = config or {}
     configure(config_dict)
+    configure_tracing(config_dict)
     
-    execution_trace = ["retriever"]
-    analysis_context = build_analysis_context(input_text, config_dict)
-    
-    # Um keine API-Aufrufe zu verschwenden direkt Plausibilitätsprüfung wenn wir praktisch nichts bekommen,
-    # Schwellwert von 100 Zeichen ist niedrig, fängt z. B.  PDF-Parsing-Fehler ab.
-    if not analysis_context or len(analysis_context.strip()) < 100:
-        return _create_error_response(
-            "No valid text detected. Try disabling truncation or re-uploading the PDF."
-        )
-    
-    start_time_reader = perf_counter()
-    execution_trace.append("reader")
-    structured_notes = run_reader(analysis_context)
-    end_time_reader = perf_counter()
-    reader_duration = round(end_time_reader - start_time_reader, 2)
-    metrics_count = count_numeric_results(structured_notes)
-    
-    start_time_summarizer = perf_counter()
-    execution_trace.append("summarizer")
-    summary = run_summarizer(structured_notes)
-    end_time_summarizer = perf_counter()
-    summarizer_duration = round(end_time_summarizer - start_time_summarizer, 2)
+    # Ein Span pro Schritt statt perf_counter-Paaren. Gleiche Spans wie in
+    # LangGraph und DSPy, so ist kritischer Pfad über Engines vergleichbar.
+    with span("pipeline", engine="langchain") as pipeline_span:
+        execution_trace = ["retriever"]
+        with span("retriever", step="retriever"):
+            analysis_context = build_analysis_context(input_text, config_dict)
+        
+        # Um keine API-Aufrufe zu verschwenden direkt Plausibilitätsprüfung wenn wir praktisch nichts bekommen,
+        # Schwellwert von 100 Zeichen ist niedrig, fängt z. B.  PDF-Parsing-Fehler ab.
+        if not analysis_context or len(analysis_context.strip()) < 100:
+            return _create_error_response(
+                "No valid text detected. Try disabling truncation or re-uploading the PDF."
+            )
+        
+        if config_dict.get("fast_mode"):
+            # Vier Agents in zwei Calls (agents/fused.py)
+            with span("reader", step="reader+summarizer", fused=1) as reader_span:
+                execution_trace += ["reader", "summarizer"]
+                read_settings = fused_settings(config_dict, FUSED_CALLS["read"], FUSED_SCHEMAS["read"])
+                fused_read, _ = run_step(
+                    config_dict, "fused_read", {"content": analysis_context}, read_settings,
+                    lambda: run_fused_read(analysis_context, read_settings["max_tokens"]),
+                    prompt_fingerprint(FUSED_READ_PROMPT),
+                )
+            structured_notes, summary = fused_read["notes"], fused_read["summary"]
+            metrics_count = count_numeric_results(structured_notes)
+            with span("integrator", step="critic+integrator", fused=1) as integrator_span:
+                execution_trace += ["critic", "integrator"]
+                review_settings = fused_settings(config_dict, FUSED_CALLS["review"], FUSED_SCHEMAS["review"])
+                fused_review, _ = run_step(
+                    config_dict, "fused_review", {"notes": structured_notes, "summary": summary}, review_settings,
+                    lambda: run_fused_review(structured_notes, summary, review_settings["max_tokens"]),
+                    prompt_fingerprint(FUSED_REVIEW_PROMPT),
+                )
+            critic_text, meta_summary = fused_review["critic"], fused_review["meta"]
+            calls_saved = CALLS_SAVED
+            timing_statistics = {
+                "reader_s": round(reader_span.duration_s, 2),
+                "summarizer_s": 0.0,
+                "critic_s": 0.0,
+                "integrator_s": round(integrator_span.duration_s, 2),
+            }
+        else:
+            # Jeder Schritt über Step-Cache: gleiche Eingabe + gleiche Einstellungen
+            # dieses Schritts liefern gespeichertes Ergebnis (cache_store.run_step)
+            with span("reader", step="reader") as reader_span:
+                execution_trace.append("reader")
+                # PaperNotes per Structured Output, downstream kompakte Textform (agents/reader.py)
+                schema_notes = bool(config_dict.get("structured_notes", True))
+                structured_notes, _ = run_step(
+                    config_dict, "reader", {"content": analysis_context}, step_settings(config_dict, "reader"),
+                    lambda: run_reader(analysis_context, schema_notes), prompt_fingerprint(reader_prompt(schema_notes)),
+                )
+            metrics_count = count_numeric_results(structured_notes)
+        
+            with span("summarizer", step="summarizer") as summarizer_span:
+                execution_trace.append("summarizer")
+                summary, _ = run_step(
+                    config_dict, "summarizer", {"notes": structured_notes}, step_settings(config_dict, "summarizer"),
+                    lambda: run_summarizer(structured_notes), prompt_fingerprint(SUMMARIZER_PROMPT),
+                )
+        
+            with span("critic", step="critic") as critic_span:
+                execution_trace.append("critic")
+                # Lokaler Vor-Check spart LLM-Critic, wenn Summary alle festen Regeln erfüllt
+                precheck = config_dict.get("precritic", True)
+                critic_result, _ = run_step(
+                    config_dict, "critic", {"notes": structured_notes, "summary": summary, "precheck": precheck},
+                    step_settings(config_dict, "critic"),
+                    lambda: run_critic(notes=structured_notes, summary=summary, precheck=precheck),
+                    prompt_fingerprint(CRITIC_PROMPT),
+                )
+                if critic_result.get("skipped"):
+                    critic_span.set_attribute("critic_skipped", 1)
+                critic_text = critic_result.get("critic") or critic_result.get("critique") or ""
+        
+            with span("integrator", step="integrator") as integrator_span:
+                execution_trace.append("integrator")
+                meta_summary, _ = run_step(
+                    config_dict, "integrator", {"notes": structured_notes, "summary": summary, "critic": critic_text},
+                    step_settings(config_dict, "integrator"),
+                    lambda: run_integrator(notes=structured_notes, summary=summary, critic=critic_text),
+                    prompt_fingerprint(INTEGRATOR_PROMPT),
+                )
+            calls_saved = 0
+            timing_statistics = {
+                "reader_s": round(reader_span.duration_s, 2),
+                "summarizer_s": round(summarizer_span.duration_s, 2),
+                "critic_s": round(critic_span.duration_s, 2),
+                "integrator_s": round(integrator_span.duration_s, 2),
+            }
+        confidence_line = extract_confidence_line(meta_summary)
     
-    start_time_critic = perf_counter()
-    execution_trace.append("critic")
-    critic_result = run_critic(notes=structured_notes, summary=summary)
-    critic_text = critic_result.get("critic") or critic_result.get("critique") or ""
-    end_time_critic = perf_counter()
-    critic_duration = round(end_time_critic - start_time_critic, 2)
-    
-    start_time_integrator = perf_counter()
-    execution_trace.append("integrator")
-    meta_summary = run_integrator(notes=structured_notes, summary=summary, critic=critic_text)
-    end_time_integrator = perf_counter()
-    integrator_duration = round(end_time_integrator - start_time_integrator, 2)
-    confidence_line = extract_confidence_line(meta_summary)
-    
-    total_duration = round(end_time_integrator - start_time_reader, 2)
+    total_duration = round(pipeline_span.duration_s, 2)
     input_chars = len(analysis_context)
-    timing_statistics = {
-        "reader_s": reader_duration,
-        "summarizer_s": summarizer_duration,
-        "critic_s": critic_duration,
-        "integrator_s": integrator_duration,
-    }
     
     # In CSV loggen für Analyse. Wir erfassen alles: Zeiten, Längen, Metrik-Anzahl.
     # Hilft zu sehen welcher Schritt langsam ist, welche Papers Ergebnisse
@@ -86,6 +149,7 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
         log_row({
             "engine": "langchain",
             "model": config_dict.get("model", ""),
+            **agent_models(config_dict),
             "max_tokens": config_dict.get("max_tokens", 0),
             "temperature": config_dict.get("temperature", 0.0),
             "timestamp": datetime.now().isoformat(),
@@ -96,6 +160,15 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
             **timing_statistics,
             "extracted_metrics_count": metrics_count,
             "confidence": confidence_line,
+            "prompt_tokens": pipeline_span.total("prompt_tokens"),
+            "completion_tokens": pipeline_span.total("completion_tokens"),
+            "cached_tokens": pipeline_span.total("cached_tokens"),
+            "critic_skipped": pipeline_span.total("critic_skipped"),
+            "steps_cached": pipeline_span.total("step_cached"),
+            "fast_mode": int(bool(config_dict.get("fast_mode"))),
+            "context_strategy": config_dict.get("context_strategy") or "compress",
+            "calls_saved": calls_saved,
+            "trace_id": pipeline_span.trace_id,
         })
     
     return {
@@ -107,7 +180,14 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
         "input_chars": input_chars,
         **timing_statistics,
         "execution_trace": execution_trace,
+        "trace_id": pipeline_span.trace_id,
+        "span_timeline": pipeline_span.timeline(),
         "extracted_metrics_count": metrics_count,
+        "critic_skipped": pipeline_span.total("critic_skipped"),
+        "steps_cached": pipeline_span.total("step_cached"),
+        "fast_mode": bool(config_dict.get("fast_mode")),
+        "calls_saved": calls_saved,
+        **agent_models(config_dict),
         "confidence": confidence_line or "",
     }
 
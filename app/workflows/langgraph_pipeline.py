@@ -2,30 +2,55 @@
 from __future__ import annotations
 
 import concurrent.futures as cf
+import os
 import re
+import sqlite3
+import threading
 from datetime import datetime
-from time import perf_counter
+from pathlib import Path
 from typing import Any, Callable, Dict, Optional, TypedDict
 
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 
-from agents.critic import run as run_critic
-from agents.integrator import run as run_integrator
-from agents.reader import run as run_reader
-from agents.summarizer import run as run_summarizer
-from llm import configure
+from agents.critic import CRITIC_PROMPT, run as run_critic
+from agents.fused import (
+    CALLS_SAVED,
+    FUSED_CALLS,
+    FUSED_READ_PROMPT,
+    FUSED_REVIEW_PROMPT,
+    FUSED_SCHEMAS,
+    run_read as run_fused_read,
+    run_review as run_fused_review,
+)
+from agents.integrator import INTEGRATOR_PROMPT, run as run_integrator
+from agents.reader import reader_prompt, run as run_reader
+from agents.summarizer import SUMMARIZER_PROMPT, SUMMARIZER_REWORK_PROMPT, run as run_summarizer
+from cache_store import prompt_fingerprint, run_step
+from coalescing import request_key
+from document import document_text, has_document, hold_document, release_document, text_hash
+from llm import AGENT_STEPS, agent_models, configure, fused_settings, step_settings
 from telemetry import log_row
+from tracing import configure_tracing, run_in_context, span
 from utils import (
     build_analysis_context,
     count_numeric_results,
     extract_confidence_line,
+    extract_improvements,
 )
 
 
 class PipelineState(TypedDict):
-    """State of LangGraph workflow."""
-    input_text: str
-    analysis_context: str
+    """
+    State of LangGraph workflow.
+
+    Paper-Text nur als Handle (document.py): vor Retriever roher Text,
+    danach Analysis Context. Checkpoints schreiben State nach jeder Node,
+    mit Text wären das zwei Paper-Kopien pro Node und Lauf. Config und
+    Timeout stehen in config["configurable"], siehe _run_settings.
+    """
+    document: str
+    input_chars: int
     notes: str
     summary: str
     critic: str
@@ -36,11 +61,14 @@ class PipelineState(TypedDict):
     integrator_s: float
     critic_score: float
     critic_loops: int
+    summary_hash: str
+    previous_summary: str
+    previous_critic: str
+    previous_score: float
+    loop_stop: str
     execution_trace: list[str]
     routing_trace: list[str]
     confidence: str
-    _timeout: int
-    _config: Dict[str, Any]
 
 
 def _append_trace(state: PipelineState, label: str) -> None:
@@ -84,24 +112,72 @@ def _execute_with_timeout(
     auf None prüfen.
     """
     with cf.ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(function)
+        # Kontext mitgeben, damit LLM-Spans unter dem Node-Span landen
+        future = executor.submit(run_in_context(function))
         try:
             return future.result(timeout=max(1, int(timeout_seconds)))
         except cf.TimeoutError:
             return timeout_default_value
 
 
-def _execute_retriever_node(state: PipelineState) -> PipelineState:
-    """Preprocesses input text and builds analysis context."""
+class NodeTimeoutError(TimeoutError):
+    """Node lief in Timeout, Lauf ist per Checkpoint fortsetzbar."""
+
+
+def _run_settings(config: Optional[RunnableConfig]) -> Dict[str, Any]:
+    """
+    Laufeinstellungen aus RunnableConfig: config, timeout, checkpointing,
+    documents (gehaltene Handles). Gehören nicht zu Pipeline-Daten, darum
+    nicht im State. Checkpointer speichert aus configurable nur einfache
+    Werte als Metadaten, dieses Dict nicht.
+    """
+    return ((config or {}).get("configurable") or {}).get("pipeline") or {}
+
+
+def _pipeline_config(config: Optional[RunnableConfig]) -> Dict[str, Any]:
+    return _run_settings(config).get("config") or {}
+
+
+def _node_call(config: RunnableConfig, function: Callable) -> Any:
+    """
+    Agent-Aufruf einer Node mit Timeout.
+
+    Ohne Checkpointing wie bisher: "__TIMEOUT__" als Ergebnis, Graph läuft
+    weiter. Mit Checkpointing brechen wir ab. Checkpoint hält letzte fertige
+    Node, nächster Lauf mit gleicher thread_id macht dort weiter, statt
+    Timeout-Text durch restliche Nodes zu schieben.
+    """
+    settings = _run_settings(config)
+    timeout_seconds = settings.get("timeout", 45)
+    result = _execute_with_timeout(function, timeout_seconds)
+    if result == "__TIMEOUT__" and settings.get("checkpointing"):
+        raise NodeTimeoutError(f"Node timed out after {timeout_seconds}s. Re-run to resume from checkpoint.")
+    return result
+
+
+def _execute_retriever_node(state: PipelineState, config: RunnableConfig) -> PipelineState:
+    """
+    Preprocesses input text and builds analysis context.
+
+    Danach zeigt Handle auf Context, roher Text wird sofort freigegeben.
+    Spätere Nodes brauchen nur Context.
+    """
     _append_trace(state, "retriever")
-    config = state.get("_config", {}) or {}
-    raw_input = state.get("input_text", "") or ""
-    analysis_context = build_analysis_context(raw_input, config)
-    state["analysis_context"] = analysis_context
+    settings = _run_settings(config)
+    raw_handle = state.get("document", "")
+    with span("retriever", step="retriever"):
+        analysis_context = build_analysis_context(document_text(raw_handle), _pipeline_config(config))
+    held = settings["documents"]
+    context_handle = hold_document(analysis_context)
+    held.append(context_handle)
+    held.remove(raw_handle)
+    release_document(raw_handle)
+    state["document"] = context_handle
+    state["input_chars"] = len(analysis_context)
     return state
 
 
-def _execute_reader_node(state: PipelineState) -> PipelineState:
+def _execute_reader_node(state: PipelineState, config: RunnableConfig) -> PipelineState:
     """
     Führt Reader-Agent aus.
     
@@ -110,37 +186,71 @@ def _execute_reader_node(state: PipelineState) -> PipelineState:
     Der Timeout-Wrapper verhindert Hänger. Dauert der LLM-Aufruf zu lange,
     geben wir einen Timeout-Wert zurück statt ewig zu blockieren.
     
-    Wir bevorzugen analysis_context gegenüber input_text. analysis_context ist
+    Reader bekommt Analysis Context über Handle aus Retriever. Context ist
     vorverarbeitet. Metadaten wurden entfernt. Das liefert bessere Ergebnisse.
-    Falls analysis_context nicht gesetzt ist, nutzen wir rohen Input als Fallback.
     """
     _append_trace(state, "reader")
-    start_time = perf_counter()
-    timeout_seconds = state.get("_timeout", 45)
-    input_for_reader = state.get("analysis_context") or state.get("input_text") or ""
-    notes_output = _execute_with_timeout(lambda: run_reader(input_for_reader), timeout_seconds)
+    input_for_reader = document_text(state["document"])
+    pipeline_config = _pipeline_config(config)
+    schema_notes = bool(pipeline_config.get("structured_notes", True))
+    with span("reader", step="reader") as node_span:
+        # Step-Cache außen: Timeouts werden so nicht gespeichert
+        notes_output, _ = run_step(
+            pipeline_config, "reader", {"content": input_for_reader}, step_settings(pipeline_config, "reader"),
+            lambda: _node_call(config, lambda: run_reader(input_for_reader, schema_notes)),
+            prompt_fingerprint(reader_prompt(schema_notes)),
+        )
     state["notes"] = notes_output
-    state["reader_s"] = round(perf_counter() - start_time, 2)
+    state["reader_s"] = round(node_span.duration_s, 2)
     return state
 
 
-def _execute_summarizer_node(state: PipelineState) -> PipelineState:
+def _execute_summarizer_node(state: PipelineState, config: RunnableConfig) -> PipelineState:
     """
-    Kann mehrmals laufen, wenn Critic hierher zurückroutet. Bei jedem
-    Lauf bekommt er gleiche Notizen. Er kann aber eine andere Zusammenfassung
-    produzieren. LLMs nicht deterministisch, außer temperature=0.
+    Kann mehrmals laufen, wenn Critic hierher zurückroutet.
+
+    Erster Lauf nur mit Notizen. Rework bekommt alte Summary und
+    Improvements vom Critic. Mit gleichen Notizen allein kam bei
+    temperature=0 meist dieselbe Summary raus, und wir zahlten noch einen
+    Critic-Call dafür. Ist neue Summary identisch (Hash), gehen wir direkt
+    zum Integrator, alte Kritik gilt ja weiter.
     Zeitmessung erfasst jede Ausführung separat. So sehen wir, wie oft es lief.
     """
     _append_trace(state, "summarizer")
-    start_time = perf_counter()
-    timeout_seconds = state.get("_timeout", 45)
-    summary_output = _execute_with_timeout(lambda: run_summarizer(state["notes"]), timeout_seconds)
+    pipeline_config = _pipeline_config(config)
+    loop = state.get("critic_loops", 0)
+    rework = loop > 0 and bool(state.get("summary"))
+    previous_summary = state["summary"] if rework else ""
+    improvements = extract_improvements(state.get("critic", "")) if rework else ""
+    with span("summarizer", step="summarizer", loop=loop, rework=int(rework)) as node_span:
+        # Alte Summary + Improvements im Schlüssel, Rework-Ergebnis hängt davon ab
+        summary_output, _ = run_step(
+            pipeline_config, "summarizer",
+            {"notes": state["notes"], "previous_summary": previous_summary, "improvements": improvements},
+            step_settings(pipeline_config, "summarizer"),
+            lambda: _node_call(config, lambda: run_summarizer(state["notes"], previous_summary, improvements)),
+            prompt_fingerprint(SUMMARIZER_REWORK_PROMPT if rework else SUMMARIZER_PROMPT),
+        )
+    summary_hash = text_hash(str(summary_output))
+    if rework:
+        state["previous_summary"] = previous_summary
+        state["previous_critic"] = state.get("critic", "")
+        state["previous_score"] = state.get("critic_score", 0.0)
+        if summary_hash == state.get("summary_hash"):
+            state["loop_stop"] = "unchanged"
+            _append_route(state, "integrator")
     state["summary"] = summary_output
-    state["summarizer_s"] = round(perf_counter() - start_time, 2)
+    state["summary_hash"] = summary_hash
+    state["summarizer_s"] = round(node_span.duration_s, 2)
     return state
 
 
-def _execute_critic_node(state: PipelineState) -> PipelineState:
+def _summarizer_post_path(state: PipelineState) -> str:
+    """Unveränderte Rework-Summary muss nicht nochmal zum Critic."""
+    return "integrator" if state.get("loop_stop") == "unchanged" else "critic_node"
+
+
+def _execute_critic_node(state: PipelineState, config: RunnableConfig) -> PipelineState:
     """
     Führt Critic-Agent aus.
     
@@ -150,12 +260,19 @@ def _execute_critic_node(state: PipelineState) -> PipelineState:
     ob zurückgeloopt oder vorwärts läuft.
     """
     _append_trace(state, "critic")
-    start_time = perf_counter()
-    timeout_seconds = state.get("_timeout", 45)
-    critic_result = _execute_with_timeout(
-        lambda: run_critic(notes=state["notes"], summary=state["summary"]),
-        timeout_seconds
-    )
+    pipeline_config = _pipeline_config(config)
+    precheck = pipeline_config.get("precritic", True)
+    with span("critic", step="critic", loop=state.get("critic_loops", 0)) as node_span:
+        critic_result, _ = run_step(
+            pipeline_config, "critic", {"notes": state["notes"], "summary": state["summary"], "precheck": precheck},
+            step_settings(pipeline_config, "critic"),
+            lambda: _node_call(
+                config, lambda: run_critic(notes=state["notes"], summary=state["summary"], precheck=precheck)
+            ),
+            prompt_fingerprint(CRITIC_PROMPT),
+        )
+        if isinstance(critic_result, dict) and critic_result.get("skipped"):
+            node_span.set_attribute("critic_skipped", 1)
     
     # Critic gibt Dictionary oder String zurück daher beide behandeln
     if isinstance(critic_result, dict):
@@ -164,12 +281,24 @@ def _execute_critic_node(state: PipelineState) -> PipelineState:
         critic_text = str(critic_result)
     
     state["critic"] = critic_text
-    state["critic_s"] = round(perf_counter() - start_time, 2)
+    state["critic_s"] = round(node_span.duration_s, 2)
+    state["critic_score"] = _extract_critic_score(critic_text)
+    _decide_rework(state, max(0, int(pipeline_config.get("max_critic_loops", 2))))
     return state
 
 
-def _extract_critic_score(state: PipelineState) -> float:
-    text = state.get("critic", "") or ""
+_CRITIC_SCORE_LINE = re.compile(r"^\W*(?:Makes sense|Accuracy|Coverage|Details)\W*:\W*([0-5](?:\.[0-9]+)?)", re.I | re.M)
+
+
+def _extract_critic_score(text: str) -> float:
+    """
+    Mittel der vier 0-5-Scores, auf 0-1. Für Rework-Vergleich brauchen wir
+    alle vier: nur erste Zahl machte aus "Makes sense: 1" eine 1.0.
+    Ohne Score-Zeilen alte Heuristik (erste Zahl).
+    """
+    scores = [float(value) for value in _CRITIC_SCORE_LINE.findall(text)]
+    if scores:
+        return round(sum(scores) / (5.0 * len(scores)), 3)
     match = re.search(r"([0-9]+(?:\.[0-9]+)?)", text)
     if match:
         score = float(match.group(1))
@@ -178,14 +307,13 @@ def _extract_critic_score(state: PipelineState) -> float:
     if score > 1.0:
         score = min(score / 5.0, 1.0)
     score = max(0.0, min(score, 1.0))
-    state["critic_score"] = round(score, 3)
-    return state["critic_score"]
+    return round(score, 3)
 
 
-def _critic_post_path(state: PipelineState) -> str:
+def _decide_rework(state: PipelineState, max_loops: int) -> None:
     """
-    Routet basierend auf Critic-Bewertung.
-    
+    Entscheidet nach Critic: Rework oder weiter zum Integrator.
+
     Liegt Bewertung unter 0.5, geht es zurück zum Summarizer. System
     kann schlechte Zusammenfassungen automatisch korrigieren. Begrenzen
     Schleifen, um Endlosschleifen zu vermeiden. Zuerst versuchten wir feste
@@ -197,44 +325,118 @@ def _critic_post_path(state: PipelineState) -> str:
     vielleicht behebbare Probleme. Höher bedeutet mehr Schleifen und höhere
     Kosten. 0.5 schien wie gute Balance. Ggf auch konfigurierbar
     machen
+
+    Hat Rework Bewertung nicht verbessert, hören wir auf. Weiterer Versuch
+    kostet zwei Calls und bringt selten mehr. Vorherige Summary war
+    mindestens so gut, die behalten wir samt ihrer Kritik.
+
+    Läuft in Critic-Node, nicht im Router: LangGraph verwirft Änderungen,
+    die eine Routing-Funktion am State macht. critic_loops blieb darum
+    immer 0, Schleife lief bis recursion_limit.
     """
-    _extract_critic_score(state)
     loops = state.get("critic_loops", 0)
-    cfg = state.get("_config", {}) or {}
-    max_loops = max(0, int(cfg.get("max_critic_loops", 2)))
-    
-    # Niedrige Bewertung und noch nicht zu oft geloopt? Summarizer bekommt noch eine Chance. 
-    # Das ist Hauptunterschied zu LangChain wir können schlechte Ausgaben tatsächlich korrigieren.
-    if state["critic_score"] < 0.5 and loops < max_loops:
+
+    if loops > 0 and state["critic_score"] <= state.get("previous_score", 0.0):
+        state["summary"] = state.get("previous_summary", "") or state["summary"]
+        state["critic"] = state.get("previous_critic", "") or state["critic"]
+        state["critic_score"] = state.get("previous_score", 0.0)
+        state["loop_stop"] = "no_improvement"
+    elif state["critic_score"] >= 0.5:
+        state["loop_stop"] = "passed"
+    elif loops >= max_loops:
+        state["loop_stop"] = "max_loops"
+    else:
+        # Niedrige Bewertung und noch nicht zu oft geloopt? Summarizer bekommt noch eine Chance.
+        # Das ist Hauptunterschied zu LangChain wir können schlechte Ausgaben tatsächlich korrigieren.
         state["critic_loops"] = loops + 1
+        state["loop_stop"] = ""
         _append_route(state, "summarizer")
-        return "summarizer"
-    
-    # Gut genug oder genug Versuche. Weiter zum Integrator.
+        return
     _append_route(state, "integrator")
-    return "integrator"
 
 
-def _execute_integrator_node(state: PipelineState) -> PipelineState:
+def _critic_post_path(state: PipelineState) -> str:
+    """Routet nach Entscheidung aus _decide_rework. Nur lesen, siehe dort."""
+    routes = state.get("routing_trace") or []
+    return routes[-1] if routes else "integrator"
+
+
+def _execute_integrator_node(state: PipelineState, config: RunnableConfig) -> PipelineState:
     """Executes Integrator agent."""
     _append_trace(state, "integrator")
-    start_time = perf_counter()
-    timeout_seconds = state.get("_timeout", 45)
-    meta_output = _execute_with_timeout(
-        lambda: run_integrator(notes=state["notes"], summary=state["summary"], critic=state["critic"]),
-        timeout_seconds
-    )
+    pipeline_config = _pipeline_config(config)
+    with span("integrator", step="integrator") as node_span:
+        meta_output, _ = run_step(
+            pipeline_config, "integrator", {"notes": state["notes"], "summary": state["summary"], "critic": state["critic"]},
+            step_settings(pipeline_config, "integrator"),
+            lambda: _node_call(
+                config, lambda: run_integrator(notes=state["notes"], summary=state["summary"], critic=state["critic"])
+            ),
+            prompt_fingerprint(INTEGRATOR_PROMPT),
+        )
     state["meta"] = meta_output
-    state["integrator_s"] = round(perf_counter() - start_time, 2)
+    state["integrator_s"] = round(node_span.duration_s, 2)
+    return state
+
+
+def _execute_fused_read_node(state: PipelineState, config: RunnableConfig) -> PipelineState:
+    """Fast-Mode: Reader und Summarizer in einem Call (agents/fused.py)."""
+    _append_trace(state, "reader")
+    _append_trace(state, "summarizer")
+    input_for_reader = document_text(state["document"])
+    pipeline_config = _pipeline_config(config)
+    settings = fused_settings(pipeline_config, FUSED_CALLS["read"], FUSED_SCHEMAS["read"])
+    with span("reader", step="reader+summarizer", fused=1) as node_span:
+        fused_read, _ = run_step(
+            pipeline_config, "fused_read", {"content": input_for_reader}, settings,
+            lambda: _node_call(config, lambda: run_fused_read(input_for_reader, settings["max_tokens"])),
+            prompt_fingerprint(FUSED_READ_PROMPT),
+        )
+    if fused_read == "__TIMEOUT__":
+        fused_read = {"notes": fused_read, "summary": fused_read}
+    state["notes"] = fused_read["notes"]
+    state["summary"] = fused_read["summary"]
+    state["reader_s"] = round(node_span.duration_s, 2)
+    return state
+
+
+def _execute_fused_review_node(state: PipelineState, config: RunnableConfig) -> PipelineState:
+    """
+    Fast-Mode: Critic und Integrator in einem Call.
+
+    Keine Rework-Schleife. Rework bräuchte zwei weitere Calls, Fast-Mode
+    ist für Massenläufe, wo Round Trips zählen.
+    """
+    _append_trace(state, "critic")
+    _append_trace(state, "integrator")
+    pipeline_config = _pipeline_config(config)
+    settings = fused_settings(pipeline_config, FUSED_CALLS["review"], FUSED_SCHEMAS["review"])
+    with span("integrator", step="critic+integrator", fused=1) as node_span:
+        fused_review, _ = run_step(
+            pipeline_config, "fused_review", {"notes": state["notes"], "summary": state["summary"]}, settings,
+            lambda: _node_call(
+                config, lambda: run_fused_review(state["notes"], state["summary"], settings["max_tokens"])
+            ),
+            prompt_fingerprint(FUSED_REVIEW_PROMPT),
+        )
+    if fused_review == "__TIMEOUT__":
+        fused_review = {"critic": fused_review, "meta": fused_review}
+    state["critic"] = fused_review["critic"]
+    state["meta"] = fused_review["meta"]
+    state["critic_score"] = _extract_critic_score(state["critic"])
+    state["loop_stop"] = "fast_mode"
+    state["integrator_s"] = round(node_span.duration_s, 2)
     return state
 
 
-def _generate_graph_visualization_dot(state: Optional[PipelineState] = None) -> str:
+def graph_dot(state: Optional[Dict[str, Any]] = None) -> str:
     """
     Erzeugt Graphviz-Darstellung des Workflows.
     
-    Erstellt DOT-Datei, die als Graph dargestellt wird.  Ist State vorhanden,
-    fügen wir Informationen zur Zeit und Bewertungen hinzu.
+    Erstellt DOT-Datei, die als Graph dargestellt wird.  Ist State oder
+    Ergebnis von run_pipeline vorhanden, fügen wir Informationen zur Zeit und
+    Bewertungen hinzu. Ergebnis enthält DOT nur mit graph_dot=True, UI baut
+    ihn bei Anzeige hier.
     
     Farben und das Styling waren etwas willkürlich. Wir wollten, dass es
     in der UI gut aussieht. Man könnte es konfigurierbar machen
@@ -254,18 +456,23 @@ digraph G {
   output     [label="Output (notes, summary, critic, meta)"];
 
   input -> retriever -> reader -> summarizer -> critic_node;
-  critic_node -> summarizer [label="rework (low critic)", style="dotted"];
-  critic_node -> integrator [label="ok"];
+  critic_node -> summarizer [label="rework with improvements (low critic)", style="dotted"];
+  critic_node -> integrator [label="ok / no improvement"];
+  summarizer -> integrator [label="unchanged", style="dotted"];
   integrator -> output;
 }
 """.strip()
 
+    if state.get("loop_stop") == "fast_mode":
+        return _fast_graph_dot(state)
+
     reader_time = state.get("reader_s", 0.0)
     summarizer_time = state.get("summarizer_s", 0.0)
     critic_time = state.get("critic_s", 0.0)
     integrator_time = state.get("integrator_s", 0.0)
     critic_score = state.get("critic_score", 0.0)
     loops = state.get("critic_loops", 0)
+    loop_stop = state.get("loop_stop", "") or "passed"
 
     reader_label = f"Reader - Notes\\n{reader_time:.2f}s"
     summarizer_label = f"Summarizer - Summary\\n{summarizer_time:.2f}s"
@@ -288,13 +495,110 @@ digraph G {{
 
   input -> retriever -> reader -> summarizer -> critic_node;
   critic_node -> summarizer [label="rework (score < 0.5, loops: {loops})", style="dotted"];
-  critic_node -> integrator [label="ok (score >= 0.5)"];
+  critic_node -> integrator [label="stop: {loop_stop}"];
+  summarizer -> integrator [label="unchanged", style="dotted"];
   integrator -> output;
 }}
 """.strip()
 
 
-def _build_langgraph_workflow() -> Any:
+def _fast_graph_dot(state: Dict[str, Any]) -> str:
+    """Graph im Fast-Mode: zwei fusionierte Nodes, keine Schleife."""
+    read_label = f"Reader + Summarizer\\n(1 call) {state.get('reader_s', 0.0):.2f}s"
+    review_label = (
+        f"Critic + Integrator\\n(1 call) Score: {state.get('critic_score', 0.0):.2f}\\n"
+        f"{state.get('integrator_s', 0.0):.2f}s"
+    )
+    return f"""
+digraph G {{
+  rankdir=LR;
+  node [shape=box, style="rounded,filled", color="#667eea", fillcolor="#f0f4ff", fontname="Inter"];
+  edge [color="#9ca3af"];
+
+  input       [label="Input\\n(raw text/PDF)", fillcolor="#e0e7ff", color="#667eea"];
+  retriever   [label="Retriever/Preprocess\\nAnalysis Context", fillcolor="#f0f4ff"];
+  fused_read  [label="{read_label}", fillcolor="#dbeafe"];
+  fused_review [label="{review_label}", fillcolor="#dbeafe"];
+  output      [label="Output\\n(all results)", fillcolor="#e0e7ff", color="#667eea"];
+
+  input -> retriever -> fused_read -> fused_review -> output;
+}}
+""".strip()
+
+
+# Checkpoints neben Step-Cache. Per Env oder Config (checkpoint_path) änderbar.
+_CHECKPOINT_PATH = os.getenv(
+    "LANGGRAPH_CHECKPOINT_PATH",
+    str(Path(__file__).resolve().parents[2] / "local_cache" / "langgraph.sqlite"),
+)
+_checkpointers: Dict[str, Any] = {}
+_checkpointers_lock = threading.Lock()
+
+
+def _get_checkpointer(config: Dict[str, Any]) -> Any:
+    """
+    SQLite-Checkpointer, wenn checkpointing=True und Paket installiert.
+
+    langgraph-checkpoint-sqlite ist optional. Fehlt es, laufen wir ohne
+    Checkpoints, wie bisher. Ein Saver pro Datei, check_same_thread=False,
+    weil LangGraph aus Worker-Threads schreibt. SqliteSaver lockt selbst.
+    """
+    if not config.get("checkpointing"):
+        return None
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        return None
+    path = config.get("checkpoint_path") or _CHECKPOINT_PATH
+    with _checkpointers_lock:
+        saver = _checkpointers.get(path)
+        if saver is None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            saver = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+            _checkpointers[path] = saver
+        return saver
+
+
+def _thread_id(input_text: str, config: Dict[str, Any]) -> str:
+    """
+    Ein Thread pro Paper und Einstellungen.
+
+    Gleiches Paper mit gleichen Einstellungen trifft alten Checkpoint und
+    kann weitermachen. Andere Einstellungen starten neuen Thread, sonst
+    würden wir halbfertigen Lauf mit alten Settings fortsetzen.
+    """
+    if config.get("thread_id"):
+        return str(config["thread_id"])
+    settings_hash = request_key(
+        [step_settings(config, step) for step in AGENT_STEPS],
+        config.get("max_critic_loops", 2),
+        bool(config.get("fast_mode")),
+        bool(config.get("structured_notes", True)),
+    )[:8]
+    return f"paper-{text_hash(input_text)[:16]}-{settings_hash}"
+
+
+def _clear_thread(workflow: Any, run_config: Dict[str, Any]) -> None:
+    """Checkpoints eines Threads löschen. Ältere Saver ohne delete_thread behalten sie."""
+    delete_thread = getattr(workflow.checkpointer, "delete_thread", None)
+    if delete_thread is not None:
+        delete_thread(run_config["configurable"]["thread_id"])
+
+
+def _build_fast_workflow(checkpointer: Any = None) -> Any:
+    """Fast-Mode: retriever -> fused_read -> fused_review. Gleicher State, zwei LLM-Calls."""
+    graph = StateGraph(PipelineState)
+    graph.add_node("retriever", _execute_retriever_node)
+    graph.add_node("fused_read", _execute_fused_read_node)
+    graph.add_node("fused_review", _execute_fused_review_node)
+    graph.set_entry_point("retriever")
+    graph.add_edge("retriever", "fused_read")
+    graph.add_edge("fused_read", "fused_review")
+    graph.add_edge("fused_review", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _build_langgraph_workflow(checkpointer: Any = None) -> Any:
     """
     LangGraph Workflow.
     
@@ -320,11 +624,32 @@ def _build_langgraph_workflow() -> Any:
     graph.set_entry_point("retriever")
     graph.add_edge("retriever", "reader")
     graph.add_edge("reader", "summarizer")
-    graph.add_edge("summarizer", "critic_node")
+    graph.add_conditional_edges("summarizer", _summarizer_post_path)
     # Das ist interessanter Teil: Critic kann zurück zum Summarizer oder zum Integrator routen
     graph.add_conditional_edges("critic_node", _critic_post_path)
     graph.add_edge("integrator", END)
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _restore_document(handle: str, input_text: str, config: Dict[str, Any], held: list) -> bool:
+    """
+    Resume: Handle aus Checkpoint wieder mit Text belegen.
+
+    Nach Retriever zeigt Handle auf Context, den Store dieses Prozesses
+    schon freigegeben hat (oder nie kannte, Resume nach Crash). Context
+    neu bauen, ist deterministisch. Passt Hash nicht (z.B. anderes
+    Kontext-Budget), False: dann lieber neu starten.
+    """
+    if not handle:
+        return False
+    if handle in held:
+        return True
+    if has_document(handle):
+        held.append(hold_document(document_text(handle)))
+        return True
+    context_handle = hold_document(build_analysis_context(input_text, config))
+    held.append(context_handle)
+    return context_handle == handle
 
 
 def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -334,20 +659,62 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
     Workflow-Graph wird gebaut, richten initialen State ein und rufen ihn auf. LangGraph übernimmt die Ausführung: führt Nodes in Reihenfolge aus, folgt conditional Nodes und verwaltet
     State. Wir müssen nur initialen State bereitstellen, Rest passiert automatisch.
     
-     _timeout und _config im State sind "privat", gehören nicht
-    zu eigentlichen Daten von Pipeline. Sie dienen nur der Konfiguration.
+    Config, Timeout und Checkpointing gehen per config["configurable"] an
+    Nodes, gehören nicht zu eigentlichen Daten von Pipeline. Text steht
+    im Dokument-Store, State trägt nur Handle. Handles dieses Laufs geben
+    wir am Ende frei, auch bei Fehler.
+
+    checkpointing=True: State nach jeder Node in SQLite (thread_id pro
+    Paper). Brach letzter Lauf ab (Crash, Timeout), geht es bei nächster
+    offener Node weiter. Bezahlte Reader/Summarizer/Critic-Ausgaben bleiben.
+    Fertige Läufe löschen ihren Thread, die Datei hält nur offene Läufe.
+
+    fast_mode=True: kleiner Graph mit zwei fusionierten Nodes, ohne Rework.
+    graph_dot=True: DOT-Graph im Ergebnis, sonst None (graph_dot() baut ihn).
     """
     config_dict = config or {}
     configure(config_dict)
-    timeout_seconds = int(config_dict.get("timeout", 45))
-    start_total = perf_counter()
+    configure_tracing(config_dict)
+    input_text = input_text or ""
     
-    workflow = _build_langgraph_workflow()
+    checkpointer = _get_checkpointer(config_dict)
+    fast_mode = bool(config_dict.get("fast_mode"))
+    workflow = (_build_fast_workflow if fast_mode else _build_langgraph_workflow)(checkpointer)
+    held = [hold_document(input_text)]
+    run_config: Dict[str, Any] = {"configurable": {"pipeline": {
+        "config": config_dict,
+        "timeout": int(config_dict.get("timeout", 45)),
+        "checkpointing": checkpointer is not None,
+        "documents": held,
+    }}}
+    if checkpointer is not None:
+        run_config["configurable"]["thread_id"] = _thread_id(input_text, config_dict)
+    try:
+        return _invoke_workflow(workflow, run_config, input_text, config_dict, fast_mode)
+    finally:
+        for handle in held:
+            release_document(handle)
+
+
+def _invoke_workflow(
+    workflow: Any, run_config: Dict[str, Any], input_text: str, config_dict: Dict[str, Any], fast_mode: bool
+) -> Dict[str, Any]:
+    held = run_config["configurable"]["pipeline"]["documents"]
+    resumed_from = ""
+    if run_config["configurable"]["pipeline"]["checkpointing"]:
+        # Offene Nodes im letzten Checkpoint: Lauf wurde unterbrochen
+        snapshot = workflow.get_state(run_config)
+        if snapshot.next and _restore_document(snapshot.values.get("document", ""), input_text, config_dict, held):
+            resumed_from = snapshot.next[0]
+        elif snapshot.values:
+            # Fertiger oder nicht fortsetzbarer Lauf: alte Checkpoints weg, sonst
+            # hängt neuer Lauf an alten Thread an und Datei wächst mit jedem Re-Run
+            _clear_thread(workflow, run_config)
     # State initialisieren alle Felder starten leer/null. Nodes füllen sie
-    # während der Ausführung. _timeout und _config sind Metadaten, keine Daten.
+    # während der Ausführung. Retriever tauscht Handle gegen Context.
     initial_state = {
-        "input_text": input_text or "",
-        "analysis_context": "",
+        "document": held[0],
+        "input_chars": len(input_text),
         "notes": "",
         "summary": "",
         "critic": "",
@@ -358,18 +725,26 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
         "integrator_s": 0.0,
         "critic_score": 0.0,
         "critic_loops": 0,
+        "summary_hash": "",
+        "previous_summary": "",
+        "previous_critic": "",
+        "previous_score": 0.0,
+        "loop_stop": "",
         "execution_trace": [],
         "routing_trace": [],
         "confidence": "",
-        "_timeout": timeout_seconds,
-        "_config": config_dict,
     }
     
     # LangGraph führt Graph aus
-    # Folgt Kanten, führt Nodes aus, behandelt Bedingungen, verwaltet Schleifen
-    final_state = workflow.invoke(initial_state)
-    total_duration = round(perf_counter() - start_total, 2)
-    input_chars = len(final_state.get("analysis_context") or input_text or "")
+    # Folgt Kanten, führt Nodes aus, behandelt Bedingungen, verwaltet Schleifen.
+    # Resume: invoke(None) setzt am Checkpoint fort statt neu zu starten.
+    with span("pipeline", engine="langgraph", resumed_from=resumed_from) as pipeline_span:
+        final_state = workflow.invoke(None if resumed_from else initial_state, run_config)
+    if run_config["configurable"]["pipeline"]["checkpointing"]:
+        # Checkpoints braucht nur ein abgebrochener Lauf. Fertiger Thread wird geleert.
+        _clear_thread(workflow, run_config)
+    total_duration = round(pipeline_span.duration_s, 2)
+    input_chars = final_state.get("input_chars", 0)
     confidence_line = extract_confidence_line(final_state.get("meta", "") or "") or ""
     final_state["confidence"] = confidence_line or final_state.get("confidence", "")
     metrics_count = count_numeric_results(final_state.get("notes", ""))
@@ -378,6 +753,7 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
         log_row({
             "engine": "langgraph",
             "model": config_dict.get("model", ""),
+            **agent_models(config_dict),
             "max_tokens": config_dict.get("max_tokens", 0),
             "temperature": config_dict.get("temperature", 0.0),
             "timestamp": datetime.now().isoformat(),
@@ -391,8 +767,19 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
             "integrator_s": final_state.get("integrator_s", 0.0),
             "critic_score": final_state.get("critic_score", 0.0),
             "critic_loops": final_state.get("critic_loops", 0),
+            "loop_stop": final_state.get("loop_stop", ""),
             "extracted_metrics_count": metrics_count,
             "confidence": final_state.get("confidence", ""),
+            "prompt_tokens": pipeline_span.total("prompt_tokens"),
+            "completion_tokens": pipeline_span.total("completion_tokens"),
+            "cached_tokens": pipeline_span.total("cached_tokens"),
+            "critic_skipped": pipeline_span.total("critic_skipped"),
+            "steps_cached": pipeline_span.total("step_cached"),
+            "resumed_from": resumed_from,
+            "fast_mode": int(fast_mode),
+            "context_strategy": config_dict.get("context_strategy") or "compress",
+            "calls_saved": CALLS_SAVED if fast_mode else 0,
+            "trace_id": pipeline_span.trace_id,
         })
     
     return {
@@ -406,10 +793,20 @@ def run_pipeline(input_text: str, config: Optional[Dict[str, Any]] = None) -> Di
         "integrator_s": final_state.get("integrator_s", 0.0),
         "critic_score": final_state.get("critic_score", 0.0),
         "critic_loops": final_state.get("critic_loops", 0),
+        "loop_stop": final_state.get("loop_stop", ""),
         "latency_s": total_duration,
         "input_chars": input_chars,
-        "graph_dot": _generate_graph_visualization_dot(final_state),
+        "graph_dot": graph_dot(final_state) if config_dict.get("graph_dot") else None,
         "execution_trace": final_state.get("execution_trace", []) or [],
         "routing_trace": final_state.get("routing_trace", []) or [],
+        "trace_id": pipeline_span.trace_id,
+        "span_timeline": pipeline_span.timeline(),
+        "critic_skipped": pipeline_span.total("critic_skipped"),
+        "steps_cached": pipeline_span.total("step_cached"),
+        **agent_models(config_dict),
+        "fast_mode": fast_mode,
+        "calls_saved": CALLS_SAVED if fast_mode else 0,
+        "resumed_from": resumed_from,
+        "thread_id": run_config["configurable"].get("thread_id", ""),
         "confidence": final_state.get("confidence", "") or confidence_line or "",
     }
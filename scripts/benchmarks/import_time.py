@@ -0,0 +1,101 @@
+"""
+Import-Zeit-Budget für App, Engines, Service und Worker.
+
+Misst mit `python -X importtime` in frischem Prozess (kein Modul-Cache),
+Median über mehrere Läufe. Ohne OPENAI_API_KEY: Import darf keinen Key
+brauchen, Client entsteht erst beim ersten LLM-Call.
+
+Start (aus Projekt-Root):
+    python scripts/benchmarks/import_time.py            # Tabelle
+    python scripts/benchmarks/import_time.py --check    # Exit 1, wenn Budget überschritten
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Set
+
+APP_DIR = Path(__file__).resolve().parents[2] / "app"
+
+# (Name, Import-Anweisung, Budget in ms). Budgets mit Luft für langsamere Rechner.
+TARGETS = [
+    ("app startup", "import streamlit, coalescing, document, engines, jobs, utils", 1200),
+    ("llm", "import llm", 500),
+    ("langchain engine", "import workflows.langchain_pipeline", 1200),
+    ("langgraph engine", "import workflows.langgraph_pipeline", 1500),
+    ("dspy facade", "import workflows.dspy_pipeline", 50),
+    ("dspy engine", "import workflows._dspy_impl", 5000),
+    ("service", "import service", 300),
+    ("worker_pool", "import worker_pool", 150),
+]
+
+
+def _importtime_lines(statement: str) -> List[tuple]:
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"'{statement}' failed:\n{completed.stderr[-2000:]}")
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self> | <cumulative> | <Einrückung><Modul>", Einrückung 2 pro Ebene
+        _, cumulative_us, name = line.split("|")
+        rows.append((name.rstrip(), int(cumulative_us)))
+    return rows
+
+
+def _startup_modules() -> Set[str]:
+    # Was der Interpreter ohnehin lädt (site, encodings, ...), zählt nicht
+    return {name.strip() for name, _ in _importtime_lines("pass") if not name.startswith("  ")}
+
+
+def measure(statement: str, baseline: Set[str]) -> float:
+    """Summe der Top-Level-Importe in ms. Eingerückte Zeilen sind schon in cumulative drin."""
+    total_us = sum(
+        cumulative for name, cumulative in _importtime_lines(statement)
+        if name.startswith(" ") and not name.startswith("  ") and name.strip() not in baseline
+    )
+    return total_us / 1000.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="exit 1 if a target exceeds its budget")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    baseline = _startup_modules()
+    report: List[Dict[str, object]] = []
+    for name, statement, budget_ms in TARGETS:
+        samples = [measure(statement, baseline) for _ in range(max(1, args.runs))]
+        median_ms = statistics.median(samples)
+        report.append({
+            "target": name,
+            "import": statement,
+            "median_ms": round(median_ms, 1),
+            "budget_ms": budget_ms,
+            "ok": median_ms <= budget_ms,
+        })
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'target':<18} {'median ms':>10} {'budget ms':>10}  status")
+        for row in report:
+            print(f"{row['target']:<18} {row['median_ms']:>10.1f} {row['budget_ms']:>10}  {'ok' if row['ok'] else 'OVER'}")
+    return 1 if args.check and not all(row["ok"] for row in report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
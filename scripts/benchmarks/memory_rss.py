@@ -0,0 +1,149 @@
+"""
+Speicher pro Pipeline-Lauf bei parallelen Läufen.
+
+Jede Stufe (Anzahl gleichzeitiger Läufe) in frischem Prozess: Peak-RSS
+gilt pro Prozess und sinkt nie. Im Kindprozess erst ein Aufwärmlauf
+(Importe, LLM-Client), dann Basis messen, dann N Läufe gleichzeitig.
+Gemeldet wird Peak-RSS über Basis und Python-Peak (tracemalloc), je
+gesamt und pro Lauf. Ohne /proc/self/clear_refs (nicht Linux) enthält
+Peak-RSS den Aufwärmlauf, dann nur Python-Peak vergleichen. Eingabe ist roher Paper-Text wie vom Service, jede
+Kopie mit eigener Markierung. Sonst fasst der Coalescer Calls zusammen.
+Step- und LLM-Cache sind aus, jeder Lauf rechnet wirklich.
+
+Braucht einen OpenAI-kompatiblen Endpunkt (OPENAI_API_KEY, optional
+OPENAI_BASE_URL, z.B. lokaler vLLM/Ollama). Mit echter API kostet jeder
+Lauf Tokens.
+
+Start (aus Projekt-Root):
+    python scripts/benchmarks/memory_rss.py test_papers/paper3_dspy.pdf --engine langgraph --concurrency 1 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures as cf
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+APP_DIR = Path(__file__).resolve().parents[2] / "app"
+
+
+def _current_rss_kb() -> int:
+    """Aktueller RSS. /proc nur unter Linux, sonst Peak als Näherung."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return _peak_rss_kb()
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Peak nach Aufwärmlauf zurücksetzen (Linux: clear_refs 5 setzt VmHWM).
+    Sonst zählt Spitze vom Aufwärmlauf mit, bei einem Lauf ist das fast alles.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS meldet Bytes, Linux KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _child(engine: str, paper: str, concurrency: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    sys.path.insert(0, str(APP_DIR))
+    from document import extract_file_text
+    from engines import get_runner
+
+    run_pipeline = get_runner(engine)
+    raw_text = extract_file_text(Path(paper).read_bytes(), Path(paper).name)
+    run_config = {"step_cache": False, "llm_cache": False, "csv_telemetry": False, "corpus_index": False, **config}
+
+    run_pipeline(raw_text + "\n\n[warmup]", run_config)
+    peak_reset = _reset_peak_rss()
+    baseline_kb = _current_rss_kb()
+    tracemalloc.start()
+
+    def one_run(index: int) -> int:
+        result = run_pipeline(raw_text + f"\n\n[run {index}]", run_config)
+        return len(json.dumps(result, default=str))
+
+    with cf.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        result_bytes = list(pool.map(one_run, range(concurrency)))
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_delta_kb = max(0, _peak_rss_kb() - baseline_kb)
+    return {
+        "engine": engine,
+        "concurrency": concurrency,
+        "input_kb": round(len(raw_text.encode("utf-8")) / 1024, 1),
+        "baseline_mb": round(baseline_kb / 1024, 1),
+        "peak_delta_mb": round(peak_delta_kb / 1024, 1),
+        "per_run_mb": round(peak_delta_kb / 1024 / concurrency, 2),
+        "python_peak_mb": round(traced_peak / 1024 / 1024, 1),
+        "python_per_run_mb": round(traced_peak / 1024 / 1024 / concurrency, 2),
+        "result_kb": round(sum(result_bytes) / 1024 / concurrency, 1),
+        "peak_reset": peak_reset,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paper", help="PDF or TXT file")
+    parser.add_argument("--engine", default="langgraph", choices=["langchain", "langgraph", "dspy"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--config", default="{}", help="JSON config like in the UI, e.g. '{\"model\": \"gpt-4o-mini\"}'")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    parser.add_argument("--child", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    config = json.loads(args.config)
+
+    if args.child:
+        print(json.dumps(_child(args.engine, args.paper, args.child, config)))
+        return 0
+
+    report: List[Dict[str, Any]] = []
+    for concurrency in args.concurrency:
+        completed = subprocess.run(
+            [sys.executable, __file__, str(Path(args.paper).resolve()), "--engine", args.engine, "--config", args.config, "--child", str(concurrency)],
+            cwd=APP_DIR, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            print(completed.stderr[-2000:], file=sys.stderr)
+            return 1
+        report.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'engine':<10} {'runs':>5} {'input KB':>9} {'base MB':>8} {'peak +MB':>9} {'MB/run':>7} {'py peak MB':>11} {'py MB/run':>10} {'result KB':>10}")
+        for row in report:
+            print(
+                f"{row['engine']:<10} {row['concurrency']:>5} {row['input_kb']:>9} {row['baseline_mb']:>8} "
+                f"{row['peak_delta_mb']:>9} {row['per_run_mb']:>7} {row['python_peak_mb']:>11} "
+                f"{row['python_per_run_mb']:>10} {row['result_kb']:>10}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
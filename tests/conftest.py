@@ -0,0 +1,53 @@
+"""Module liegen flach in app/ und werden ohne Paketpräfix importiert."""
+
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+class FakeChat:
+    """
+    Nimmt Antworten aus Liste, danach immer default. Zählt Calls.
+    Attribute wie ChatOpenAI, soweit invoke_prompt sie braucht.
+    """
+
+    def __init__(self, responses, temperature=0.0, default=None, model_name="fake"):
+        self.responses = list(responses)
+        self.default = default
+        self.calls = []
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = 100
+        self.openai_api_base = None
+
+    def invoke(self, messages, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0) if self.responses or self.default is None else self.default
+
+
+@pytest.fixture
+def fake_llm(tmp_path, monkeypatch):
+    """Ersetzt LLM-Client durch FakeChat, LLM-Cache in tmp_path."""
+    import llm
+
+    def install(responses, temperature=0.0):
+        chat = FakeChat(responses, temperature)
+        monkeypatch.setattr(llm, "_create_openai_llm", lambda **kwargs: chat)
+        llm.configure({"step_cache_path": str(tmp_path / "steps.sqlite")})
+        return chat
+
+    return install
+
+
+@pytest.fixture(autouse=True)
+def _reset_llm_clients():
+    """configure() setzt Clients im Kontext des Test-Threads, nicht in nächsten Test mitnehmen."""
+    yield
+    import llm
+
+    llm._run_clients.set(None)
@@ -0,0 +1,51 @@
+from langchain_core.messages import AIMessage
+
+import llm
+from cache_store import run_step
+from conftest import FakeChat
+from workflows.langchain_pipeline import run_pipeline
+
+PAPER = "Title: A Cached Paper\nAbstract\n" + "We evaluate a method on QA and reach an F1 of 87.3 on the test split.\n" * 20
+
+
+def _counting_step(config, settings):
+    calls = []
+
+    def function():
+        calls.append(1)
+        return f"sample {len(calls)}"
+
+    values = [run_step(config, "summarizer", {"notes": "n"}, settings, function)[0] for _ in range(2)]
+    return values, len(calls)
+
+
+def test_deterministic_step_is_replayed(tmp_path):
+    config = {"step_cache_path": str(tmp_path / "steps.sqlite")}
+    values, calls = _counting_step(config, {"model": "m", "temperature": 0.0})
+    assert calls == 1
+    assert values == ["sample 1", "sample 1"]
+
+
+def test_sampled_step_is_not_replayed(tmp_path):
+    config = {"step_cache_path": str(tmp_path / "steps.sqlite")}
+    values, calls = _counting_step(config, {"model": "m", "temperature": 0.7})
+    assert calls == 2
+    assert values == ["sample 1", "sample 2"]
+
+
+def test_sampled_pipeline_run_is_not_served_from_cache(tmp_path, monkeypatch):
+    # LLM-Cache lässt Stichproben schon aus, darum zählt hier nur Step-Cache
+    monkeypatch.chdir(tmp_path)
+    chat = FakeChat([], temperature=0.7, default=AIMessage(
+        content="Title: A Cached Paper\nResults:\n- QA: F1=87.3", response_metadata={"finish_reason": "stop"},
+    ))
+    monkeypatch.setattr(llm, "_create_openai_llm", lambda **kwargs: chat)
+    config = {
+        "temperature": 0.7, "structured_notes": False, "precritic": False, "corpus_index": False,
+        "step_cache_path": str(tmp_path / "steps.sqlite"), "trace_export": False,
+    }
+    run_pipeline(PAPER, config)
+    first_calls = len(chat.calls)
+    assert first_calls
+    run_pipeline(PAPER, config)
+    assert len(chat.calls) == 2 * first_calls
@@ -0,0 +1,35 @@
+import pytest
+
+from corpus import CorpusIndex, find_prior_analysis, near_duplicate_threshold, record_result
+from fingerprint import signature, similarity
+from test_fingerprint import PAPER, _revision
+
+RESULT = {"structured": "Title: A Retrieval Paper\nResults:\n- QA: F1=87.3", "summary": "Title: A Retrieval Paper\nIt works."}
+
+
+@pytest.mark.parametrize("value, expected", [(None, 0.8), (0.9, 0.9), (1.5, 1.0), (-1, 0.0), ("x", 0.8)])
+def test_threshold_is_clamped(value, expected):
+    config = {} if value is None else {"near_duplicate_threshold": value}
+    assert near_duplicate_threshold(config) == expected
+
+
+def test_find_similar_respects_threshold(tmp_path):
+    index = CorpusIndex(str(tmp_path / "corpus.sqlite"))
+    index.add("v1", "langchain", "m", RESULT, signature(PAPER))
+    revised = signature(_revision(PAPER))
+    score = similarity(signature(PAPER), revised)
+    assert 0.8 <= score < 1.0
+    found = index.find_similar(revised, "langchain", "m", threshold=0.8)
+    assert found["doc_hash"] == "v1"
+    assert found["similarity"] == score
+    assert found["result"]["summary"] == RESULT["summary"]
+    assert index.find_similar(revised, "langchain", "m", threshold=min(1.0, score + 0.01)) is None
+    assert index.find_similar(revised, "langgraph", "m", threshold=0.8) is None
+
+
+def test_prior_analysis_uses_configured_threshold(tmp_path):
+    config = {"corpus_index_path": str(tmp_path / "corpus.sqlite"), "model": "m"}
+    record_result("langchain", PAPER, config, RESULT)
+    assert find_prior_analysis("langchain", PAPER, config)["similarity"] == 1.0
+    assert find_prior_analysis("langchain", _revision(PAPER), config)["similarity"] < 1.0
+    assert find_prior_analysis("langchain", _revision(PAPER), {**config, "near_duplicate_threshold": 1.0}) is None
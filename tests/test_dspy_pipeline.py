@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("dspy")
+
+from workflows._dspy_impl import _select_program  # noqa: E402
+
+
+def _candidate(f1, tokens, demos, latency_s=None):
+    return {"f1": f1, "prompt_tokens": tokens, "completion_tokens": 0, "latency_s": latency_s, "demos": demos}
+
+
+def _candidates():
+    # Basis ohne Demos, dann 1-3 Demos: jede Demo kostet Prompt-Tokens
+    return [
+        _candidate(0.50, 1000, 0),
+        _candidate(0.605, 2000, 1),
+        _candidate(0.61, 3000, 2),
+        _candidate(0.62, 4000, 3),
+    ]
+
+
+def test_f1_objective_keeps_compiled_program():
+    assert _select_program(_candidates(), "f1", {}) == 3
+
+
+def test_cheaper_candidate_wins_inside_tolerance():
+    # 0.605 liegt knapp im Band (0.02 unter bestem F1), spart 2000 Tokens
+    assert _select_program(_candidates(), "cost", {}) == 1
+
+
+def test_candidates_outside_tolerance_are_not_eligible():
+    # Bei hohem Token-Gewicht wäre Basis am besten, liegt aber 0.12 unter bestem F1
+    cfg = {"teleprompt_token_weight": 0.2}
+    assert _select_program(_candidates(), "cost", cfg) == 1
+    assert _select_program(_candidates(), "cost", {**cfg, "teleprompt_f1_tolerance": 0.0}) == 3
+    assert _select_program(_candidates(), "cost", {**cfg, "teleprompt_f1_tolerance": 0.2}) == 0
+
+
+def test_tie_prefers_fewer_demos():
+    candidates = [_candidate(0.6, 1000, 2), _candidate(0.6, 1000, 1)]
+    assert _select_program(candidates, "cost", {}) == 1
+
+
+def test_latency_counts_only_when_every_candidate_was_measured():
+    candidates = [_candidate(0.6, 1000, 1, latency_s=None), _candidate(0.6, 1000, 2, latency_s=0.1)]
+    _select_program(candidates, "cost", {})
+    assert candidates[0]["objective"] == candidates[1]["objective"] == pytest.approx(0.55)
+    candidates = [_candidate(0.6, 1000, 1, latency_s=5.0), _candidate(0.6, 1000, 2, latency_s=0.1)]
+    assert _select_program(candidates, "cost", {}) == 1
@@ -0,0 +1,28 @@
+from fingerprint import LSH_BANDS, lsh_buckets, signature, similarity
+
+PAPER = " ".join(
+    f"Sentence {i} describes how the retrieval model reaches an F1 of {80 + i % 10}.{i % 7} on split {i % 3}."
+    for i in range(120)
+)
+
+
+def _revision(text: str) -> str:
+    # arXiv v2: paar Wörter geändert, Umbrüche aus anderer PDF-Extraktion
+    return text.replace("Sentence 7 ", "Sentence seven ").replace("split 2.", "split two.").replace(" the ", "\nthe ")
+
+
+def test_whitespace_and_punctuation_do_not_matter():
+    assert similarity(signature(PAPER), signature(PAPER.replace(" ", "\n").replace(".", ","))) == 1.0
+
+
+def test_revision_is_near_duplicate_and_other_paper_is_not():
+    original = signature(PAPER)
+    assert similarity(original, signature(_revision(PAPER))) >= 0.8
+    other = " ".join(f"Chapter {i} surveys protein folding with {i} residues." for i in range(120))
+    assert similarity(original, signature(other)) < 0.2
+
+
+def test_empty_text_has_no_signature_or_buckets():
+    assert signature("  \n ") is None
+    assert lsh_buckets([]) == []
+    assert len(lsh_buckets(signature(PAPER))) == LSH_BANDS
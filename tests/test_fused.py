@@ -0,0 +1,31 @@
+import json
+
+from langchain_core.messages import AIMessage
+
+from agents.fused import FUSED_CALLS, FUSED_SCHEMAS, TRUNCATION_RETRY_FACTOR, run_read
+from agents.reader import PaperNotes
+from llm import fused_settings, schema_token_floor
+
+NOTES = {
+    "title": "A Paper", "objective": "Study things.", "methods": ["m"], "datasets": ["d"],
+    "results": [{"task": "QA", "metric": "F1", "value": "87.3"}], "metrics": ["F1"],
+    "contributions": ["c"], "limitations": "l", "applications": "a", "notes": "n",
+}
+
+
+def test_fused_budget_covers_schema_with_small_presets():
+    settings = fused_settings({"max_tokens": 160}, FUSED_CALLS["read"], FUSED_SCHEMAS["read"])
+    assert settings["max_tokens"] >= schema_token_floor(PaperNotes) > 320
+    # Große Presets bleiben Summe der Agents
+    assert fused_settings({"max_tokens": 1024}, FUSED_CALLS["read"], FUSED_SCHEMAS["read"])["max_tokens"] == 2048
+
+
+def test_truncated_fused_read_retries_with_larger_budget(fake_llm):
+    complete = json.dumps({"notes": NOTES, "summary": "Summary of A Paper."})
+    chat = fake_llm([
+        AIMessage(content=complete[:120], response_metadata={"finish_reason": "length"}),
+        AIMessage(content=complete, response_metadata={"finish_reason": "stop"}),
+    ])
+    result = run_read("Title: A Paper\nText", max_tokens=700)
+    assert "F1=87.3" in result["notes"]
+    assert [call.get("max_tokens") for call in chat.calls] == [700, TRUNCATION_RETRY_FACTOR * 700]
@@ -0,0 +1,96 @@
+import sqlite3
+
+from langchain_core.messages import AIMessage
+
+import llm
+from conftest import FakeChat
+from workflows.langgraph_pipeline import (
+    _decide_rework,
+    _execute_summarizer_node,
+    _summarizer_post_path,
+    run_pipeline,
+)
+
+PAPER = "Title: A Graph Paper\nAbstract\n" + "We evaluate a method on QA and reach an F1 of 87.3 on the test split.\n" * 20
+NOTES = "Title: A Graph Paper\nResults:\n- QA: F1=87.3\nMakes sense: 5\nAccuracy: 5\nCoverage: 5\nDetails: 5\nConfidence: High"
+
+
+def _config(tmp_path, **extra):
+    return {
+        "structured_notes": False, "trace_export": False, "corpus_index": False,
+        "step_cache_path": str(tmp_path / "steps.sqlite"), **extra,
+    }
+
+
+def test_finished_checkpoint_threads_are_cleared(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chat = FakeChat([], default=AIMessage(content=NOTES, response_metadata={"finish_reason": "stop"}))
+    monkeypatch.setattr(llm, "_create_openai_llm", lambda **kwargs: chat)
+    path = tmp_path / "checkpoints.sqlite"
+    config = _config(tmp_path, checkpointing=True, checkpoint_path=str(path), step_cache=False, llm_cache=False)
+    for _ in range(3):
+        result = run_pipeline(PAPER, config)
+        assert result["summary"]
+        with sqlite3.connect(path) as connection:
+            assert connection.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] == 0
+
+
+def _rework_state(score, previous_score):
+    return {
+        "summary": "new summary", "critic": "new critique", "critic_score": score, "critic_loops": 1,
+        "previous_summary": "old summary", "previous_critic": "old critique", "previous_score": previous_score,
+    }
+
+
+def test_rework_without_improvement_restores_previous_summary():
+    state = _rework_state(0.3, 0.4)
+    _decide_rework(state, max_loops=2)
+    assert state["loop_stop"] == "no_improvement"
+    assert (state["summary"], state["critic"], state["critic_score"]) == ("old summary", "old critique", 0.4)
+    assert state["routing_trace"] == ["integrator"]
+
+
+def test_improved_rework_keeps_new_summary():
+    state = _rework_state(0.6, 0.4)
+    _decide_rework(state, max_loops=2)
+    assert state["loop_stop"] == "passed"
+    assert state["summary"] == "new summary"
+
+
+def test_low_score_loops_until_max_loops():
+    state = {"summary": "s", "critic": "c", "critic_score": 0.2, "critic_loops": 0}
+    _decide_rework(state, max_loops=1)
+    assert (state["critic_loops"], state["routing_trace"]) == (1, ["summarizer"])
+    state["previous_score"] = 0.1
+    _decide_rework(state, max_loops=1)
+    assert state["loop_stop"] == "max_loops"
+    assert state["routing_trace"] == ["summarizer", "integrator"]
+
+
+def test_unchanged_rework_summary_skips_critic(fake_llm):
+    summary = AIMessage(content="Title: A Graph Paper\nThe method reaches F1=87.3 on QA.", response_metadata={"finish_reason": "stop"})
+    chat = fake_llm([summary, summary])
+    config = {"configurable": {"pipeline": {"config": {"step_cache": False, "llm_cache": False}, "timeout": 5}}}
+    state = _execute_summarizer_node({"notes": NOTES, "critic_loops": 0}, config)
+    assert _summarizer_post_path(state) == "critic_node"
+    state.update(critic="Makes sense: 1\nImprovements:\n- Add the dataset.", critic_score=0.2, critic_loops=1)
+    state = _execute_summarizer_node(state, config)
+    assert state["loop_stop"] == "unchanged"
+    assert state["routing_trace"] == ["integrator"]
+    assert _summarizer_post_path(state) == "integrator"
+    assert len(chat.calls) == 2
+
+
+def test_changed_rework_summary_goes_to_critic(fake_llm):
+    chat = fake_llm([
+        AIMessage(content="Title: A Graph Paper\nFirst summary.", response_metadata={"finish_reason": "stop"}),
+        AIMessage(content="Title: A Graph Paper\nReworked summary with F1=87.3.", response_metadata={"finish_reason": "stop"}),
+    ])
+    config = {"configurable": {"pipeline": {"config": {"step_cache": False, "llm_cache": False}, "timeout": 5}}}
+    state = _execute_summarizer_node({"notes": NOTES, "critic_loops": 0}, config)
+    state.update(critic="Makes sense: 1", critic_score=0.2, critic_loops=1)
+    state = _execute_summarizer_node(state, config)
+    assert not state.get("loop_stop")
+    assert state["previous_summary"].endswith("First summary.")
+    assert _summarizer_post_path(state) == "critic_node"
+    assert len(chat.calls) == 2
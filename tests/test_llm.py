@@ -0,0 +1,55 @@
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel
+
+import llm
+
+
+class _Answer(BaseModel):
+    value: int
+
+
+PROMPT = ChatPromptTemplate.from_messages([("human", "{question}")])
+
+
+def _message(content, finish_reason="stop"):
+    return AIMessage(content=content, response_metadata={"finish_reason": finish_reason})
+
+
+def test_deterministic_response_is_cached(fake_llm):
+    chat = fake_llm([_message("a"), _message("b")])
+    assert llm.invoke_prompt(PROMPT, {"question": "q"}, "reader").content == "a"
+    assert llm.invoke_prompt(PROMPT, {"question": "q"}, "reader").content == "a"
+    assert len(chat.calls) == 1
+
+
+def test_sampled_response_is_not_cached(fake_llm):
+    chat = fake_llm([_message("a"), _message("b")], temperature=0.7)
+    llm.invoke_prompt(PROMPT, {"question": "q"}, "reader")
+    assert llm.invoke_prompt(PROMPT, {"question": "q"}, "reader").content == "b"
+    assert len(chat.calls) == 2
+
+
+def test_truncated_response_is_not_cached(fake_llm):
+    chat = fake_llm([_message("half", "length"), _message("full")])
+    llm.invoke_prompt(PROMPT, {"question": "q"}, "reader")
+    assert llm.invoke_prompt(PROMPT, {"question": "q"}, "reader").content == "full"
+    assert len(chat.calls) == 2
+
+
+def test_invalid_json_is_not_cached(fake_llm):
+    chat = fake_llm([_message('{"value": '), _message('{"value": 3}')])
+    with pytest.raises(ValueError):
+        llm.invoke_prompt(PROMPT, {"question": "q"}, "reader", schema=_Answer)
+    assert llm.invoke_prompt(PROMPT, {"question": "q"}, "reader", schema=_Answer).value == 3
+    assert len(chat.calls) == 2
+
+
+def test_explicit_zero_settings_beat_env(monkeypatch):
+    monkeypatch.setenv("OPENAI_TEMPERATURE", "0.7")
+    monkeypatch.setenv("OPENAI_MAX_TOKENS", "2048")
+    settings = llm.step_settings({"temperature": 0.0, "max_tokens": 0}, "reader")
+    assert settings["temperature"] == 0.0
+    assert settings["max_tokens"] == 0
+    assert llm.step_settings({}, "reader")["temperature"] == 0.7
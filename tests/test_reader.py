@@ -0,0 +1,73 @@
+import json
+
+import httpx
+import openai
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm
+from agents.reader import PaperNotes, run
+from conftest import FakeChat
+from llm import schema_token_floor
+
+NOTES = {
+    "title": "A Paper", "objective": "Study things.", "methods": ["m"], "datasets": ["d"],
+    "results": [{"task": "QA", "metric": "F1", "value": "87.3"}], "metrics": ["F1"],
+    "contributions": ["c"], "limitations": "l", "applications": "a", "notes": "n",
+}
+
+
+def test_structured_reader_gets_schema_budget(fake_llm):
+    chat = fake_llm([AIMessage(content=json.dumps(NOTES), response_metadata={"finish_reason": "stop"})])
+    notes = run("Title: A Paper\nText", structured=True)
+    assert "- QA: F1=87.3" in notes
+    assert chat.calls[0]["max_tokens"] == schema_token_floor(PaperNotes)
+
+
+def test_truncated_structured_reader_falls_back_to_markdown(fake_llm):
+    chat = fake_llm([
+        AIMessage(content=json.dumps(NOTES)[:90], response_metadata={"finish_reason": "length"}),
+        AIMessage(content="Title: A Paper\nResults:\n- QA: F1=87.3", response_metadata={"finish_reason": "stop"}),
+    ])
+    notes = run("Title: A Paper\nText", structured=True)
+    assert notes.startswith("Title: A Paper")
+    assert "F1=87.3" in notes
+    assert "response_format" not in chat.calls[1]
+    # Zweiter Lauf: nur Markdown-Antwort im Cache, abgeschnittenes JSON nicht
+    chat.responses.append(AIMessage(content=json.dumps(NOTES), response_metadata={"finish_reason": "stop"}))
+    run("Title: A Paper\nText", structured=True)
+    assert "response_format" in chat.calls[2]
+
+
+class _NoSchemaChat(FakeChat):
+    """Provider ohne Structured Output: 400 auf response_format."""
+
+    def invoke(self, messages, **kwargs):
+        if "response_format" in kwargs:
+            self.calls.append(kwargs)
+            request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+            raise openai.BadRequestError(
+                "response_format json_schema is not supported", response=httpx.Response(400, request=request), body=None,
+            )
+        return super().invoke(messages, **kwargs)
+
+
+def test_rejected_schema_falls_back_to_markdown(monkeypatch):
+    chat = _NoSchemaChat([AIMessage(content="Title: A Paper\nResults:\n- QA: F1=87.3", response_metadata={"finish_reason": "stop"})])
+    monkeypatch.setattr(llm, "_create_openai_llm", lambda **kwargs: chat)
+    llm.configure({"step_cache": False})
+    notes = run("Title: A Paper\nText", structured=True)
+    assert "F1=87.3" in notes
+    assert "response_format" in chat.calls[0]
+    assert "response_format" not in chat.calls[1]
+
+
+def test_other_errors_are_not_swallowed(monkeypatch):
+    class _BrokenChat(FakeChat):
+        def invoke(self, messages, **kwargs):
+            raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(llm, "_create_openai_llm", lambda **kwargs: _BrokenChat([]))
+    llm.configure({"step_cache": False})
+    with pytest.raises(RuntimeError):
+        run("Title: A Paper\nText", structured=True)
@@ -0,0 +1,26 @@
+from retrieval import BM25Index, rank_for_fields, tokenize
+
+BLOCKS = [
+    "We propose a transformer model with a new attention layer and a contrastive training objective.",
+    "Experiments use the SQuAD dataset and a new annotated corpus with train and test splits.",
+    "Table 2 reports results: our model achieves 87.3% accuracy and F1 of 91.2, outperforming the baseline.",
+    "A limitation is that the approach fails on long documents. Future work should address this drawback.",
+    "We thank the reviewers for their comments.",
+]
+
+
+def test_tokenize_stems_plurals_and_drops_stopwords():
+    assert tokenize("The datasets and results") == tokenize("dataset result")
+    assert "87.3%" in tokenize("reaches 87.3% accuracy")
+
+
+def test_each_field_finds_its_block():
+    rankings = rank_for_fields(BLOCKS, top_k=1)
+    assert rankings == {"methods": [0], "datasets": [1], "results": [2], "limitations": [3]}
+
+
+def test_blocks_without_match_are_not_ranked():
+    index = BM25Index(BLOCKS)
+    ranked = [doc for doc, _ in index.top("limitation future work drawback", 5)]
+    assert ranked[0] == 3
+    assert 4 not in ranked
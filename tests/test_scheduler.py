@@ -0,0 +1,38 @@
+import random
+
+from scheduler import AdaptiveLimiter
+
+
+def test_mixed_call_sizes_do_not_collapse_limit():
+    # Kurze und lange Calls gemischt, Provider gesund: ~1 s pro 1k Tokens
+    random.seed(7)
+    limiter = AdaptiveLimiter(4, 8)
+    for _ in range(400):
+        tokens = random.choice([200, 300, 4000, 6000])
+        limiter.on_success(tokens / 1000.0 * random.uniform(0.8, 1.2), tokens)
+    assert limiter.limit >= 6
+
+
+def test_unnormalized_mixed_latencies_recover():
+    # Ohne Token-Schätzung: Basiswert darf nicht am schnellsten Call kleben bleiben
+    limiter = AdaptiveLimiter(4, 8)
+    for _ in range(50):
+        limiter.on_success(0.1)
+    for index in range(400):
+        limiter.on_success(0.1 if index % 2 else 3.0)
+    assert limiter.limit >= 4
+
+
+def test_real_slowdown_still_lowers_limit():
+    limiter = AdaptiveLimiter(8, 8)
+    for _ in range(20):
+        limiter.on_success(1.0, 1000)
+    for _ in range(5):
+        limiter.on_success(5.0, 1000)
+    assert limiter.limit < 8
+
+
+def test_throttle_halves_limit():
+    limiter = AdaptiveLimiter(8, 8)
+    limiter.on_throttle()
+    assert limiter.limit == 4
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm
+from conftest import FakeChat
+from service import submit_paper
+
+PAPER = "Title: A Service Paper\nAbstract\n" + "We evaluate a method on QA and reach an F1 of 87.3 on the test split.\n" * 20
+
+
+class _SlowChat(FakeChat):
+    """Antwortet mit eigenem Modellnamen, langsam genug, dass sich zwei Jobs überlappen."""
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(0.1)
+        self.calls.append(kwargs)
+        return AIMessage(
+            content=f"Title: A Service Paper\nResults:\n- QA: F1=87.3\nAnswered by {self.model_name}",
+            response_metadata={"finish_reason": "stop"},
+        )
+
+
+@pytest.mark.parametrize("engine", ["langchain", "langgraph"])
+def test_concurrent_jobs_keep_their_own_clients(engine, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(llm, "_create_openai_llm", lambda **kwargs: _SlowChat([], model_name=kwargs["model_name"]))
+    base = {
+        "structured_notes": False, "precritic": False, "corpus_index": False,
+        "step_cache_path": str(tmp_path / "steps.sqlite"), "trace_export": False,
+    }
+    jobs = {
+        model: submit_paper(engine, PAPER.encode(), "paper.txt", {**base, "model": model})
+        for model in ("model-a", "model-b")
+    }
+    for model, job in jobs.items():
+        assert job.done.wait(30)
+        assert job.status == "done", job.error_trace
+        other = "model-b" if model == "model-a" else "model-a"
+        for field in ("structured", "summary", "critic", "meta"):
+            assert f"Answered by {model}" in job.result[field]
+            assert other not in job.result[field]
@@ -0,0 +1,25 @@
+import pytest
+
+import tracing
+from tracing import configure_tracing, span
+
+
+@pytest.mark.parametrize("value", [False, None, "", "none", "OFF"])
+def test_disabled_export_writes_no_trace(value, tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_TRACE_EXPORT", "file")
+    monkeypatch.setattr(tracing, "_TRACE_PATH", tracing._TRACE_PATH)
+    path = tmp_path / "traces.jsonl"
+    configure_tracing({"trace_export": value, "trace_path": str(path)})
+    with span("run"):
+        pass
+    assert not path.exists()
+
+
+def test_file_export_writes_trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_TRACE_EXPORT", "")
+    monkeypatch.setattr(tracing, "_TRACE_PATH", tracing._TRACE_PATH)
+    path = tmp_path / "traces.jsonl"
+    configure_tracing({"trace_export": "file", "trace_path": str(path)})
+    with span("run"):
+        pass
+    assert path.exists()
@@ -0,0 +1,43 @@
+from langchain_core.messages import AIMessage
+
+import llm
+import worker_pool
+from conftest import FakeChat
+
+PAPER = "Title: A Batch Paper\nAbstract\n" + "We evaluate a method on QA and reach an F1 of 87.3 on the test split.\n" * 20
+NOTES = "Title: A Batch Paper\nObjective: Evaluate a method.\nResults:\n- QA: F1=87.3\nConfidence: High"
+
+
+def _batch(tmp_path, monkeypatch, **config):
+    chat = FakeChat([], default=AIMessage(content=NOTES, response_metadata={"finish_reason": "stop"}))
+    monkeypatch.setattr(llm, "_create_openai_llm", lambda **kwargs: chat)
+    # telemetry.csv landet im Arbeitsverzeichnis
+    monkeypatch.chdir(tmp_path)
+    paper = tmp_path / "paper.txt"
+    paper.write_text(PAPER)
+    base = {
+        "structured_notes": False, "step_cache_path": str(tmp_path / "steps.sqlite"),
+        "corpus_index_path": str(tmp_path / "corpus.sqlite"), "trace_export": False,
+    }
+    worker_pool._init_worker({**base, **config}, 1)
+    return chat, worker_pool._process_paper(str(paper), "langchain")
+
+
+def test_batch_run_is_recorded_in_corpus(tmp_path, monkeypatch):
+    from corpus import get_corpus_index
+
+    chat, item = _batch(tmp_path, monkeypatch)
+    assert chat.calls
+    index = get_corpus_index({"corpus_index_path": str(tmp_path / "corpus.sqlite")})
+    assert index.count() == 1
+    assert "reused_from" not in item["result"]
+
+
+def test_batch_rerun_with_reuse_makes_no_llm_calls(tmp_path, monkeypatch):
+    # Step- und LLM-Cache aus: ohne --reuse müsste zweiter Lauf neu fragen
+    first_chat, first = _batch(tmp_path, monkeypatch, step_cache=False, llm_cache=False)
+    assert first_chat.calls
+    chat, item = _batch(tmp_path, monkeypatch, step_cache=False, llm_cache=False, reuse_prior_analyses=True)
+    assert chat.calls == []
+    assert item["result"]["reused_from"]["similarity"] == 1.0
+    assert item["result"]["summary"] == first["result"]["summary"]